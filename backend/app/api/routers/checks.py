@@ -1,14 +1,19 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from typing import List, Dict, Any
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional
+import asyncio
 import os
 import shutil
 import tempfile
 
+from app.api.sse import sse_event, sse_response
 from app.core.config import settings
-from app.models import Ruleset, CheckRunRequest, CheckRunResponse
-from app.services.check_service import CheckService
+from app.models import Ruleset, CheckRunRequest, CheckRunResponse, CheckRunListItem, CheckBatchItem, CheckBatchResponse
+from app.services.check_service import CheckService, RUN_STATE_RUNNING
 from app.services.doc_service import DocService
+from app.services.llm_usage import collect_usage
 from app.services.ruleset_store import list_rulesets, get_ruleset, upsert_ruleset
+from app.services.run_store import list_runs
 
 
 router = APIRouter()
@@ -58,9 +63,12 @@ def put_ruleset(template_id: str, ruleset: Ruleset):
 
 
 @router.post("/check/run", response_model=CheckRunResponse)
-def run_checks(req: CheckRunRequest):
+async def run_checks(req: CheckRunRequest):
     try:
-        return check_service.run(req.templateId, req.rightBlocks, req.aiEnabled)
+        if req.asyncMode:
+            return await run_in_threadpool(check_service.start_run, req.templateId, req.rightBlocks, req.aiEnabled, req.baseRunId)
+        with collect_usage("/api/check/run"):
+            return await check_service.arun(req.templateId, req.rightBlocks, req.aiEnabled, req.baseRunId)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -69,6 +77,8 @@ def run_checks(req: CheckRunRequest):
 async def run_checks_docx(
     templateId: str = Form(...),
     aiEnabled: bool = Form(False),
+    asyncMode: bool = Form(False),
+    baseRunId: Optional[str] = Form(None),
     file: UploadFile = File(...),
 ):
     filename = (file.filename or "").lower()
@@ -84,8 +94,11 @@ async def run_checks_docx(
             raise HTTPException(status_code=413, detail="File too large")
         if not _is_probably_docx(tmp_path):
             raise HTTPException(status_code=400, detail="Invalid .docx file")
-        blocks = DocService.parse_docx(tmp_path)
-        return check_service.run(templateId, blocks, aiEnabled)
+        blocks = await run_in_threadpool(DocService.parse_docx, tmp_path)
+        if asyncMode:
+            return await run_in_threadpool(check_service.start_run, templateId, blocks, aiEnabled, baseRunId)
+        with collect_usage("/api/check/run_docx"):
+            return await check_service.arun(templateId, blocks, aiEnabled, baseRunId)
     except HTTPException:
         raise
     except Exception as e:
@@ -95,9 +108,100 @@ async def run_checks_docx(
             os.remove(tmp_path)
 
 
+@router.post("/check/run_batch", response_model=CheckBatchResponse)
+async def run_checks_batch(
+    templateId: str = Form(...),
+    aiEnabled: bool = Form(False),
+    files: List[UploadFile] = File(...),
+):
+    if not files:
+        raise HTTPException(status_code=400, detail="files required")
+    if len(files) > settings.CHECK_BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail="Too many files")
+
+    tmp_dir = tempfile.mkdtemp(prefix="check_batch_")
+    try:
+        accepted = []
+        rejected = []
+        for i, file in enumerate(files):
+            name = file.filename or f"file_{i}.docx"
+            if not name.lower().endswith(".docx"):
+                rejected.append((name, "Only .docx files are supported"))
+                continue
+            path = os.path.join(tmp_dir, f"{i}.docx")
+            with open(path, "wb") as out:
+                shutil.copyfileobj(file.file, out)
+            if os.path.getsize(path) > _max_upload_bytes():
+                rejected.append((name, "File too large"))
+                continue
+            if not _is_probably_docx(path):
+                rejected.append((name, "Invalid .docx file"))
+                continue
+            accepted.append((name, path))
+
+        with collect_usage("/api/check/run_batch"):
+            result = await run_in_threadpool(check_service.run_batch, templateId, accepted, aiEnabled)
+        for name, reason in rejected:
+            result.items.append(CheckBatchItem(filename=name, ok=False, error=reason))
+        result.summary["documents"] = len(result.items)
+        result.summary["failed"] = sum(1 for x in result.items if not x.ok)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@router.get("/check/runs", response_model=List[CheckRunListItem])
+def get_check_runs(
+    templateId: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+):
+    try:
+        return list_runs(template_id=templateId, state=status, since=since, until=until, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/check/run/{run_id}", response_model=Dict[str, Any])
 def get_check_run(run_id: str):
     payload = check_service.get_run(run_id)
     if payload is None:
         raise HTTPException(status_code=404, detail="run not found")
     return payload
+
+
+@router.get("/check/run/{run_id}/events")
+async def stream_check_run(run_id: str):
+    first = await run_in_threadpool(check_service.get_run, run_id)
+    if first is None:
+        raise HTTPException(status_code=404, detail="run not found")
+
+    async def _events():
+        payload = first
+        last_summary = None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.CHECK_EVENTS_TIMEOUT_S
+        while True:
+            summary = payload.get("summary") or {}
+            if summary != last_summary:
+                last_summary = summary
+                yield sse_event("progress", {"runId": run_id, "summary": summary})
+            if summary.get("state") != RUN_STATE_RUNNING:
+                yield sse_event("done", payload)
+                return
+            if loop.time() >= deadline:
+                yield sse_event("timeout", {"runId": run_id})
+                return
+            await asyncio.sleep(settings.CHECK_EVENTS_POLL_S)
+            payload = await run_in_threadpool(check_service.get_run, run_id) or payload
+
+    return sse_response(_events())
@@ -4,15 +4,17 @@ import os
 import shutil
 import tempfile
 
+from app.api.sse import sse_event, sse_response
 from app.core.config import settings
 from app.models import Block, AlignmentRow
 from app.services.doc_service import DocService
 from app.services.diff_service import align_blocks
-from app.services.llm_service import LLMService
+from app.services.llm_client import get_llm_service
+from app.services.llm_usage import collect_usage
 
 
 router = APIRouter()
-llm_service = LLMService()
+llm_service = get_llm_service()
 
 
 def _max_upload_bytes() -> int:
@@ -57,12 +59,28 @@ async def parse_document(file: UploadFile = File(...)):
 @router.post("/analyze", response_model=Dict[str, Any])
 async def analyze_document(blocks: List[Block], query: str = Body(..., embed=True)):
     try:
-        result = llm_service.analyze_risk(blocks, query)
-        return result
+        with collect_usage("/api/analyze") as usage:
+            result = await llm_service.aanalyze_risk(blocks, query)
+        return {**result, "usage": usage.summary()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/analyze/stream")
+async def analyze_document_stream(blocks: List[Block], query: str = Body(..., embed=True)):
+    async def _events():
+        try:
+            with collect_usage("/api/analyze/stream") as usage:
+                async for event, data in llm_service.astream_analyze_risk(blocks, query):
+                    if event == "done":
+                        data = {**data, "usage": usage.summary()}
+                    yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"message": str(e)})
+
+    return sse_response(_events())
+
+
 @router.post("/diff", response_model=List[AlignmentRow])
 async def diff_documents(
     left_blocks: List[Block] = Body(..., embed=True),
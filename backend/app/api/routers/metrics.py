@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+
+from app.services.llm_client import get_llm_service
+from app.services.llm_usage import usage_totals
+
+
+router = APIRouter()
+
+
+@router.get("/metrics/llm", response_model=Dict[str, Any])
+def get_llm_metrics():
+    return {**get_llm_service().metrics_snapshot(), "usage": usage_totals()}
@@ -1,13 +1,16 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Dict, Any
 
+from app.api.sse import sse_event, sse_response
 from app.models import GlobalPromptConfig, GlobalAnalyzeRequest, GlobalAnalyzeResponse
-from app.services.llm_service import LLMService
+from app.services.llm_client import get_llm_service
+from app.services.llm_usage import collect_usage
 from app.services.prompt_store import get_global_prompt_config, upsert_global_prompt_config
 
 
 router = APIRouter()
-llm_service = LLMService()
+llm_service = get_llm_service()
 
 
 @router.get("/prompts/global", response_model=GlobalPromptConfig)
@@ -27,34 +30,62 @@ def put_global_prompt(cfg: GlobalPromptConfig):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _global_payload(req: GlobalAnalyzeRequest) -> Dict[str, Any]:
+    blocks_payload: List[Dict[str, Any]] = []
+    for b in req.rightBlocks or []:
+        t = (b.text or "").strip()
+        if not t:
+            continue
+        blocks_payload.append(
+            {
+                "blockId": b.blockId,
+                "kind": str(getattr(b.kind, "value", b.kind)),
+                "text": t,
+            }
+        )
+    return {
+        "templateId": req.templateId,
+        "blocks": blocks_payload,
+        "diffRows": [x.model_dump() for x in req.diffRows],
+        "checkRun": req.checkRun.model_dump() if req.checkRun is not None else None,
+    }
+
+
+async def _global_prompt(req: GlobalAnalyzeRequest) -> str:
+    prompt = (req.promptOverride or "").strip()
+    if not prompt:
+        cfg = await run_in_threadpool(get_global_prompt_config)
+        prompt = (cfg.byTemplateId.get(req.templateId) or cfg.defaultPrompt or "").strip()
+    return prompt
+
+
 @router.post("/analyze/global", response_model=GlobalAnalyzeResponse)
-def analyze_global(req: GlobalAnalyzeRequest):
+async def analyze_global(req: GlobalAnalyzeRequest):
     try:
-        cfg = get_global_prompt_config()
-        prompt = (req.promptOverride or "").strip()
-        if not prompt:
-            prompt = (cfg.byTemplateId.get(req.templateId) or cfg.defaultPrompt or "").strip()
-        blocks_payload: List[Dict[str, Any]] = []
-        for b in req.rightBlocks or []:
-            t = (b.text or "").strip()
-            if not t:
-                continue
-            if len(t) > 1600:
-                t = t[:1600] + "…"
-            blocks_payload.append(
-                {
-                    "blockId": b.blockId,
-                    "kind": str(getattr(b.kind, "value", b.kind)),
-                    "text": t,
-                }
-            )
-        payload = {
-            "templateId": req.templateId,
-            "blocks": blocks_payload,
-            "diffRows": [x.model_dump() for x in req.diffRows],
-            "checkRun": req.checkRun.model_dump() if req.checkRun is not None else None,
-        }
-        result = llm_service.global_review(payload=payload, prompt=prompt)
-        return GlobalAnalyzeResponse(raw=result)
+        prompt = await _global_prompt(req)
+        with collect_usage("/api/analyze/global") as usage:
+            result = await llm_service.aglobal_review(payload=_global_payload(req), prompt=prompt)
+        return GlobalAnalyzeResponse(raw=result, usage=usage.summary())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze/global/stream")
+async def analyze_global_stream(req: GlobalAnalyzeRequest):
+    try:
+        prompt = await _global_prompt(req)
+        payload = _global_payload(req)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def _events():
+        try:
+            with collect_usage("/api/analyze/global/stream") as usage:
+                async for event, data in llm_service.astream_global_review(payload=payload, prompt=prompt):
+                    if event == "done":
+                        data = {**data, "usage": usage.summary()}
+                    yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"message": str(e)})
+
+    return sse_response(_events())
@@ -6,6 +6,7 @@ import tempfile
 
 from app.core.config import settings
 from app.models import Ruleset, TemplateSnapshot, TemplateListItem, TemplateMatchRequest, TemplateMatchResponse
+from app.services import blob_store
 from app.services.doc_service import DocService
 from app.services.ruleset_store import get_ruleset, upsert_ruleset
 from app.services.template_store import (
@@ -13,7 +14,9 @@ from app.services.template_store import (
     compute_signature,
     upsert_template,
     match_templates,
+    match_templates_docx,
     get_latest_template,
+    get_template_list_item,
     rename_template,
     delete_template,
     save_template_docx,
@@ -64,7 +67,7 @@ async def generate_template(
             raise HTTPException(status_code=413, detail="File too large")
         if not _is_probably_docx(tmp_path):
             raise HTTPException(status_code=400, detail="Invalid .docx file")
-        blocks = DocService.parse_docx(tmp_path)
+        blocks = blob_store.parse_cached(tmp_path, DocService.parse_docx)
         signature, _ = compute_signature(blocks)
         snapshot = TemplateSnapshot(
             templateId=templateId,
@@ -103,9 +106,10 @@ def put_template_name(template_id: str, payload: Dict[str, Any] = Body(...)):
         raise HTTPException(status_code=400, detail="name required")
     try:
         ok = rename_template(template_id, name)
-        if not ok:
+        item = get_template_list_item(template_id) if ok else None
+        if item is None:
             raise HTTPException(status_code=404, detail="template not found")
-        return TemplateListItem(templateId=template_id, name=name, versions=[])
+        return item
     except HTTPException:
         raise
     except Exception as e:
@@ -131,3 +135,28 @@ def match_template(req: TemplateMatchRequest):
         return match_templates(req.blocks)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/templates/match_docx", response_model=TemplateMatchResponse)
+def match_template_docx(file: UploadFile = File(...)):
+    filename = (file.filename or "").lower()
+    if not filename.endswith(".docx"):
+        raise HTTPException(status_code=400, detail="Only .docx files are supported")
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
+        shutil.copyfileobj(file.file, tmp)
+        tmp_path = tmp.name
+
+    try:
+        if os.path.getsize(tmp_path) > _max_upload_bytes():
+            raise HTTPException(status_code=413, detail="File too large")
+        if not _is_probably_docx(tmp_path):
+            raise HTTPException(status_code=400, detail="Invalid .docx file")
+        return match_templates_docx(tmp_path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
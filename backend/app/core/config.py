@@ -10,6 +10,26 @@ class Settings(BaseModel):
 
     DOC_COMPARISON_MAX_UPLOAD_MB: int = int(os.getenv("DOC_COMPARISON_MAX_UPLOAD_MB", "20") or "20")
     CHECK_AI_CHUNK_SIZE: int = int(os.getenv("DOC_COMPARISON_CHECK_AI_CHUNK_SIZE", "10") or "10")
+    CHECK_AI_CONCURRENCY: int = int(os.getenv("DOC_COMPARISON_CHECK_AI_CONCURRENCY", "4") or "4")
+    CHECK_BATCH_WORKERS: int = int(os.getenv("DOC_COMPARISON_CHECK_BATCH_WORKERS", "0") or "0")
+    CHECK_BATCH_MAX_FILES: int = int(os.getenv("DOC_COMPARISON_CHECK_BATCH_MAX_FILES", "500") or "500")
+    CHECK_EVENTS_POLL_S: float = float(os.getenv("DOC_COMPARISON_CHECK_EVENTS_POLL_S", "0.5") or "0.5")
+    CHECK_EVENTS_TIMEOUT_S: float = float(os.getenv("DOC_COMPARISON_CHECK_EVENTS_TIMEOUT_S", "600") or "600")
+    CHECK_RUN_RETENTION_DAYS: int = int(os.getenv("DOC_COMPARISON_CHECK_RUN_RETENTION_DAYS", "90") or "0")
+    CHECK_RUN_MAX_PER_TEMPLATE: int = int(os.getenv("DOC_COMPARISON_CHECK_RUN_MAX_PER_TEMPLATE", "5000") or "0")
+    CHECK_RUN_PRUNE_INTERVAL_S: float = float(os.getenv("DOC_COMPARISON_CHECK_RUN_PRUNE_INTERVAL_S", "300") or "300")
+    CHECK_RUN_STALE_S: float = float(os.getenv("DOC_COMPARISON_CHECK_RUN_STALE_S", "21600") or "0")
+    ANALYZE_RETRIEVAL_TOP_K: int = int(os.getenv("DOC_COMPARISON_ANALYZE_TOP_K", "12") or "12")
+    ANALYZE_RETRIEVAL_NEIGHBORS: int = int(os.getenv("DOC_COMPARISON_ANALYZE_NEIGHBORS", "1") or "0")
+    ANALYZE_RETRIEVAL_MIN_BLOCKS: int = int(os.getenv("DOC_COMPARISON_ANALYZE_MIN_BLOCKS", "40") or "0")
+    ANALYZE_INDEX_CACHE_SIZE: int = int(os.getenv("DOC_COMPARISON_ANALYZE_INDEX_CACHE_SIZE", "32") or "32")
+    GLOBAL_REVIEW_MODE: str = os.getenv("DOC_COMPARISON_GLOBAL_REVIEW_MODE", "auto")
+    GLOBAL_REVIEW_SECTION_MAX_CHARS: int = int(os.getenv("DOC_COMPARISON_GLOBAL_REVIEW_SECTION_MAX_CHARS", "24000") or "24000")
+    GLOBAL_REVIEW_CONCURRENCY: int = int(os.getenv("DOC_COMPARISON_GLOBAL_REVIEW_CONCURRENCY", "4") or "4")
+    STORE_CACHE_ENABLED: bool = (os.getenv("DOC_COMPARISON_STORE_CACHE", "1") or "1").strip().lower() in ("1", "true", "yes", "on")
+    STORE_CACHE_MAX_TEMPLATES: int = int(os.getenv("DOC_COMPARISON_STORE_CACHE_MAX_TEMPLATES", "256") or "256")
+    STORE_BACKEND: str = os.getenv("DOC_COMPARISON_STORE_BACKEND", "json")
+    STORE_JOURNAL_COMPACT_RECORDS: int = int(os.getenv("DOC_COMPARISON_STORE_JOURNAL_COMPACT_RECORDS", "500") or "500")
 
     TEMPLATE_MATCH_OUTLINE_MIN_SCORE: float = float(os.getenv("DOC_COMPARISON_TM_OUTLINE_MIN_SCORE", "0.72") or "0.72")
     TEMPLATE_MATCH_OUTLINE_MIN_GAP: float = float(os.getenv("DOC_COMPARISON_TM_OUTLINE_MIN_GAP", "0.06") or "0.06")
@@ -32,6 +52,36 @@ class Settings(BaseModel):
     QWEN_API_KEY: str = os.getenv("QWEN_API_KEY", "")
     QWEN_BASE_URL: str = os.getenv("QWEN_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
     QWEN_MODEL: str = os.getenv("QWEN_MODEL", "")
+
+    # Shared LLM HTTP client
+    LLM_TIMEOUT_S: float = float(os.getenv("LLM_TIMEOUT_S", "120") or "120")
+    LLM_POOL_MAX_CONNECTIONS: int = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100") or "100")
+    LLM_POOL_MAX_KEEPALIVE: int = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20") or "20")
+    LLM_POOL_KEEPALIVE_EXPIRY_S: float = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY_S", "30") or "30")
+    LLM_HTTP2: str = os.getenv("LLM_HTTP2", "auto")
+
+    # LLM call resilience
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3") or "0")
+    LLM_BACKOFF_BASE_S: float = float(os.getenv("LLM_BACKOFF_BASE_S", "0.5") or "0.5")
+    LLM_BACKOFF_MAX_S: float = float(os.getenv("LLM_BACKOFF_MAX_S", "8") or "8")
+    LLM_HEDGE_ENABLED: bool = (os.getenv("LLM_HEDGE_ENABLED", "0") or "0").strip().lower() in ("1", "true", "yes", "on")
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20") or "20")
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5") or "5")
+    LLM_BREAKER_RESET_S: float = float(os.getenv("LLM_BREAKER_RESET_S", "30") or "30")
+    LLM_PRICE_PROMPT_PER_1K: float = float(os.getenv("LLM_PRICE_PROMPT_PER_1K", "0") or "0")
+    LLM_PRICE_COMPLETION_PER_1K: float = float(os.getenv("LLM_PRICE_COMPLETION_PER_1K", "0") or "0")
+    LLM_SINGLE_FLIGHT: bool = (os.getenv("LLM_SINGLE_FLIGHT", "1") or "1").strip().lower() in ("1", "true", "yes", "on")
+
+    # Per-task model routing; empty means LLM_MODEL. When LLM_FALLBACK_P95_S > 0 and a task's model
+    # has a p95 latency above it, requests go to LLM_MODEL_FALLBACK until a probe sees it recover.
+    LLM_MODEL_CHECK_BATCH: str = os.getenv("LLM_MODEL_CHECK_BATCH", "")
+    LLM_MODEL_CHECK_POINT: str = os.getenv("LLM_MODEL_CHECK_POINT", "")
+    LLM_MODEL_ANALYZE: str = os.getenv("LLM_MODEL_ANALYZE", "")
+    LLM_MODEL_GLOBAL_REVIEW: str = os.getenv("LLM_MODEL_GLOBAL_REVIEW", "")
+    LLM_MODEL_FALLBACK: str = os.getenv("LLM_MODEL_FALLBACK", "")
+    LLM_FALLBACK_P95_S: float = float(os.getenv("LLM_FALLBACK_P95_S", "0") or "0")
+    LLM_FALLBACK_MIN_SAMPLES: int = int(os.getenv("LLM_FALLBACK_MIN_SAMPLES", "20") or "20")
+    LLM_FALLBACK_PROBE_S: float = float(os.getenv("LLM_FALLBACK_PROBE_S", "30") or "30")
     
     class Config:
         env_file = ".env"
@@ -42,9 +92,55 @@ class Settings(BaseModel):
             mb = 1
         return mb * 1024 * 1024
 
+    def batch_workers(self) -> int:
+        n = self.CHECK_BATCH_WORKERS
+        if n < 1:
+            n = os.cpu_count() or 1
+        return n
+
     def clamp(self) -> "Settings":
         self.DOC_COMPARISON_MAX_UPLOAD_MB = max(1, int(self.DOC_COMPARISON_MAX_UPLOAD_MB or 1))
         self.CHECK_AI_CHUNK_SIZE = max(1, int(self.CHECK_AI_CHUNK_SIZE or 1))
+        self.CHECK_AI_CONCURRENCY = max(1, int(self.CHECK_AI_CONCURRENCY or 1))
+        self.CHECK_BATCH_WORKERS = max(0, int(self.CHECK_BATCH_WORKERS or 0))
+        self.CHECK_BATCH_MAX_FILES = max(1, int(self.CHECK_BATCH_MAX_FILES or 1))
+        self.CHECK_EVENTS_POLL_S = max(0.05, float(self.CHECK_EVENTS_POLL_S or 0.5))
+        self.CHECK_EVENTS_TIMEOUT_S = max(1.0, float(self.CHECK_EVENTS_TIMEOUT_S or 600))
+        self.CHECK_RUN_RETENTION_DAYS = max(0, int(self.CHECK_RUN_RETENTION_DAYS or 0))
+        self.CHECK_RUN_MAX_PER_TEMPLATE = max(0, int(self.CHECK_RUN_MAX_PER_TEMPLATE or 0))
+        self.CHECK_RUN_PRUNE_INTERVAL_S = max(0.0, float(self.CHECK_RUN_PRUNE_INTERVAL_S or 0))
+        self.CHECK_RUN_STALE_S = max(0.0, float(self.CHECK_RUN_STALE_S or 0))
+        self.ANALYZE_RETRIEVAL_TOP_K = max(1, int(self.ANALYZE_RETRIEVAL_TOP_K or 1))
+        self.ANALYZE_RETRIEVAL_NEIGHBORS = max(0, int(self.ANALYZE_RETRIEVAL_NEIGHBORS or 0))
+        self.ANALYZE_RETRIEVAL_MIN_BLOCKS = max(0, int(self.ANALYZE_RETRIEVAL_MIN_BLOCKS or 0))
+        self.ANALYZE_INDEX_CACHE_SIZE = max(1, int(self.ANALYZE_INDEX_CACHE_SIZE or 1))
+        self.GLOBAL_REVIEW_MODE = (self.GLOBAL_REVIEW_MODE or "auto").strip().lower()
+        if self.GLOBAL_REVIEW_MODE not in ("auto", "single", "map_reduce"):
+            self.GLOBAL_REVIEW_MODE = "auto"
+        self.GLOBAL_REVIEW_SECTION_MAX_CHARS = max(2000, int(self.GLOBAL_REVIEW_SECTION_MAX_CHARS or 2000))
+        self.GLOBAL_REVIEW_CONCURRENCY = max(1, int(self.GLOBAL_REVIEW_CONCURRENCY or 1))
+        self.STORE_CACHE_MAX_TEMPLATES = max(1, int(self.STORE_CACHE_MAX_TEMPLATES or 1))
+        self.STORE_BACKEND = (self.STORE_BACKEND or "json").strip().lower()
+        if self.STORE_BACKEND not in ("json", "sqlite"):
+            self.STORE_BACKEND = "json"
+        self.STORE_JOURNAL_COMPACT_RECORDS = max(1, int(self.STORE_JOURNAL_COMPACT_RECORDS or 1))
+        self.LLM_TIMEOUT_S = max(1.0, float(self.LLM_TIMEOUT_S or 120))
+        self.LLM_POOL_MAX_CONNECTIONS = max(1, int(self.LLM_POOL_MAX_CONNECTIONS or 1))
+        self.LLM_POOL_MAX_KEEPALIVE = max(0, min(self.LLM_POOL_MAX_CONNECTIONS, int(self.LLM_POOL_MAX_KEEPALIVE or 0)))
+        self.LLM_POOL_KEEPALIVE_EXPIRY_S = max(0.0, float(self.LLM_POOL_KEEPALIVE_EXPIRY_S or 0))
+        self.LLM_MAX_RETRIES = max(0, int(self.LLM_MAX_RETRIES or 0))
+        self.LLM_BACKOFF_BASE_S = max(0.0, float(self.LLM_BACKOFF_BASE_S or 0))
+        self.LLM_BACKOFF_MAX_S = max(self.LLM_BACKOFF_BASE_S, float(self.LLM_BACKOFF_MAX_S or 0))
+        self.LLM_HEDGE_MIN_SAMPLES = max(1, int(self.LLM_HEDGE_MIN_SAMPLES or 1))
+        self.LLM_BREAKER_FAILURES = max(1, int(self.LLM_BREAKER_FAILURES or 1))
+        self.LLM_BREAKER_RESET_S = max(0.0, float(self.LLM_BREAKER_RESET_S or 0))
+        self.LLM_PRICE_PROMPT_PER_1K = max(0.0, float(self.LLM_PRICE_PROMPT_PER_1K or 0))
+        self.LLM_PRICE_COMPLETION_PER_1K = max(0.0, float(self.LLM_PRICE_COMPLETION_PER_1K or 0))
+        for name in ("LLM_MODEL_CHECK_BATCH", "LLM_MODEL_CHECK_POINT", "LLM_MODEL_ANALYZE", "LLM_MODEL_GLOBAL_REVIEW", "LLM_MODEL_FALLBACK"):
+            setattr(self, name, (getattr(self, name) or "").strip())
+        self.LLM_FALLBACK_P95_S = max(0.0, float(self.LLM_FALLBACK_P95_S or 0))
+        self.LLM_FALLBACK_MIN_SAMPLES = max(1, int(self.LLM_FALLBACK_MIN_SAMPLES or 1))
+        self.LLM_FALLBACK_PROBE_S = max(0.0, float(self.LLM_FALLBACK_PROBE_S or 0))
         self.TEMPLATE_MATCH_OUTLINE_MIN_SCORE = float(self.TEMPLATE_MATCH_OUTLINE_MIN_SCORE or 0.72)
         self.TEMPLATE_MATCH_OUTLINE_MIN_GAP = float(self.TEMPLATE_MATCH_OUTLINE_MIN_GAP or 0.06)
         self.TEMPLATE_MATCH_OUTLINE_BOOST_BASE = float(self.TEMPLATE_MATCH_OUTLINE_BOOST_BASE or 0.9)
@@ -122,6 +122,8 @@ class CheckRunRequest(BaseModel):
     templateId: str
     rightBlocks: List[Block]
     aiEnabled: bool = False
+    asyncMode: bool = False
+    baseRunId: Optional[str] = None
 
 class CheckRunResponse(BaseModel):
     runId: str
@@ -131,11 +133,39 @@ class CheckRunResponse(BaseModel):
     items: List[CheckResultItem]
 
 
-class TemplateSnapshot(BaseModel):
+class CheckBatchItem(BaseModel):
+    filename: str
+    runId: Optional[str] = None
+    ok: bool = True
+    error: Optional[str] = None
+    counts: Dict[str, int] = {}
+
+
+class CheckBatchResponse(BaseModel):
+    batchId: str
+    templateId: str
+    templateVersion: str
+    summary: Dict[str, Any]
+    items: List[CheckBatchItem]
+
+
+class CheckRunListItem(BaseModel):
+    runId: str
+    templateId: str
+    templateVersion: str
+    state: str
+    createdAt: str
+    counts: Dict[str, int] = {}
+
+
+class TemplateMeta(BaseModel):
     templateId: str
     name: str
     version: str
     signature: str
+
+
+class TemplateSnapshot(TemplateMeta):
     blocks: List[Block]
 
 
@@ -176,3 +206,15 @@ class GlobalAnalyzeRequest(BaseModel):
 
 class GlobalAnalyzeResponse(BaseModel):
     raw: str
+    usage: Optional[Dict[str, Any]] = None
+
+
+class GlobalReviewResult(BaseModel):
+    overallRiskLevel: str
+    summary: str
+    keyFindings: List[Dict[str, Any]] = []
+    improvementSuggestions: List[Dict[str, Any]] = []
+    missingInformation: List[str] = []
+    confidence: Optional[float] = None
+    sections: List[Dict[str, Any]] = []
+    blockReviews: List[Dict[str, Any]] = []
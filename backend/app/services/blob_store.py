@@ -0,0 +1,149 @@
+import hashlib
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.models import Block
+from app.services.file_lock import exclusive_lock
+from app.services.journal import JournaledMap, fsync_dir
+
+
+def _blobs_dir() -> str:
+    root = os.getenv("DOC_COMPARISON_DATA_DIR", "").strip()
+    if root:
+        d = os.path.join(root, "assets", "blobs")
+    else:
+        app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        backend_dir = os.path.abspath(os.path.join(app_dir, ".."))
+        d = os.path.join(backend_dir, "data", "assets", "blobs")
+    os.makedirs(d, exist_ok=True)
+    return d
+
+
+def _refs_file_path() -> str:
+    return os.path.join(_blobs_dir(), "refs.json")
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def blob_path(digest: str) -> str:
+    return os.path.join(_blobs_dir(), digest[:2], digest)
+
+
+# refs.json is the snapshot of ref name -> {"sha256", "size"}; changes append to refs.json.journal.
+# A blob's reference count is the number of refs pointing at it, so counts cannot drift from the
+# pointers themselves.
+_refs_journal = JournaledMap(lambda p: dict(p.get("refs") or {}), lambda items: {"refs": items})
+
+
+def _write_blob(digest: str, data: bytes) -> None:
+    p = blob_path(digest)
+    if os.path.exists(p):
+        return
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    tmp = p + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, p)
+    fsync_dir(p)
+
+
+def _remove_blob(digest: str) -> None:
+    p = blob_path(digest)
+    try:
+        os.remove(p)
+    except FileNotFoundError:
+        return
+    try:
+        os.rmdir(os.path.dirname(p))
+    except OSError:
+        pass
+
+
+def refcounts() -> Dict[str, int]:
+    return dict(Counter(r["sha256"] for r in _refs_journal.items(_refs_file_path()).values()))
+
+
+def get_ref(name: str) -> Optional[str]:
+    """The blob path a ref points at, or None."""
+    ref = _refs_journal.items(_refs_file_path()).get(name)
+    if ref is None:
+        return None
+    p = blob_path(ref["sha256"])
+    return p if os.path.exists(p) else None
+
+
+def put_ref(name: str, data: bytes) -> str:
+    """
+    Point ref name at data. Identical bytes are stored once; a blob the ref pointed at before is
+    removed when nothing else references it. Returns the blob path.
+    """
+    digest = sha256_bytes(data)
+    path = _refs_file_path()
+    with exclusive_lock(path):
+        refs = _refs_journal.items(path)
+        prev = refs.get(name)
+        _write_blob(digest, data)
+        if prev is None or prev.get("sha256") != digest:
+            _refs_journal.apply(path, [(name, {"sha256": digest, "size": len(data)})], locked=True)
+        if prev is not None and prev.get("sha256") != digest:
+            _collect(path, [prev["sha256"]])
+    return blob_path(digest)
+
+
+def release_refs(prefix: str) -> int:
+    """Drop every ref whose name starts with prefix and garbage-collect blobs left unreferenced."""
+    path = _refs_file_path()
+    with exclusive_lock(path):
+        refs = _refs_journal.items(path)
+        names = [n for n in refs if n.startswith(prefix)]
+        digests = [refs[n]["sha256"] for n in names]
+        _refs_journal.apply(path, [(n, None) for n in names], locked=True)
+        _collect(path, digests)
+    return len(names)
+
+
+def _collect(path: str, digests: List[str]) -> None:
+    """Caller holds exclusive_lock(path); removes the given blobs if no ref still points at them."""
+    live = {r["sha256"] for r in _refs_journal.items(path).values()}
+    for d in set(digests) - live:
+        _remove_blob(d)
+
+
+# Content hash -> parsed blocks. Keyed by bytes rather than path, so uploading the same template
+# file again (typically a new version whose source did not change) skips parsing.
+_parse_cache: "OrderedDict[str, List[Block]]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def parse_cached(path: str, parse: Callable[[str], List[Block]]) -> List[Block]:
+    """parse(path), reused for files with identical bytes. The blocks are copies the caller may modify."""
+    digest = sha256_file(path)
+    with _parse_cache_lock:
+        blocks = _parse_cache.get(digest) if settings.STORE_CACHE_ENABLED else None
+        if blocks is not None:
+            _parse_cache.move_to_end(digest)
+    if blocks is None:
+        blocks = parse(path)
+        if settings.STORE_CACHE_ENABLED:
+            with _parse_cache_lock:
+                _parse_cache[digest] = [b.model_copy(deep=True) for b in blocks]
+                _parse_cache.move_to_end(digest)
+                while len(_parse_cache) > settings.STORE_CACHE_MAX_TEMPLATES:
+                    _parse_cache.popitem(last=False)
+        return blocks
+    return [b.model_copy(deep=True) for b in blocks]
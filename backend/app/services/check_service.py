@@ -1,55 +1,68 @@
-import json
+import asyncio
+import hashlib
 import html
-import os
+import json
 import re
+import multiprocessing
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
 from datetime import datetime, timezone
+from functools import cached_property
 from typing import List, Optional, Dict, Any, Tuple
 
+from app.core.config import settings
 from app.models import (
     Block,
     Ruleset,
+    CheckBatchItem,
+    CheckBatchResponse,
     CheckRunResponse,
     CheckResultItem,
     CheckEvidence,
     CheckAiResult,
     CheckSeverity,
     CheckStatus,
+    CheckPoint,
     CheckRule,
     RuleType,
     AiPolicy,
 )
+from app.services.doc_service import DocService
+from app.services.llm_client import get_llm_service, run_on_llm_loop, run_sync, submit
+from app.services.llm_resilience import is_retryable
 from app.services.llm_service import LLMService
+from app.services.llm_usage import collect_usage
 from app.services.ruleset_store import get_ruleset
+from app.services.run_store import get_run, save_run
 
 
 def _utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def _primary_check_runs_dir() -> str:
-    root = os.getenv("DOC_COMPARISON_DATA_DIR", "").strip()
-    if root:
-        d = os.path.join(root, "artifacts", "check_runs")
-        os.makedirs(d, exist_ok=True)
-        return d
+def _sha1_json(obj: Any) -> str:
+    return hashlib.sha1(json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
 
-    artifacts_root = os.getenv("ARTIFACTS_DIR", "").strip()
-    if artifacts_root:
-        d = os.path.join(artifacts_root, "check_runs")
-        os.makedirs(d, exist_ok=True)
-        return d
 
-    app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    backend_dir = os.path.abspath(os.path.join(app_dir, ".."))
-    d = os.path.join(backend_dir, "data", "artifacts", "check_runs")
-    os.makedirs(d, exist_ok=True)
-    return d
+def _block_hash(b: Block) -> str:
+    kind = getattr(b.kind, "value", str(b.kind))
+    return _sha1_json([kind, b.text or "", b.htmlFragment or ""])
 
 
-def _legacy_check_runs_dir() -> str:
-    app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    return os.path.join(app_dir, "artifacts", "check_runs")
+def _block_keys(blocks: List[Block]) -> Dict[str, str]:
+    """blockId -> stableKey, made unique by occurrence (repeated headings share a stableKey)."""
+    seen: Dict[str, int] = {}
+    out: Dict[str, str] = {}
+    for b in blocks:
+        n = seen.get(b.stableKey, 0) + 1
+        seen[b.stableKey] = n
+        out[b.blockId] = b.stableKey if n == 1 else f"{b.stableKey}#{n}"
+    return out
+
+
+# AI results that carry no verdict; an incremental run asks again instead of copying them forward.
+_AI_NOT_RUN_PREFIXES = ("AI failed", "AI skipped")
 
 
 def _normalize_ws(s: str) -> str:
@@ -60,6 +73,14 @@ def _excerpt(s: str, n: int = 220) -> str:
     s2 = _normalize_ws(s)
     return s2[:n] + ("…" if len(s2) > n else "")
 
+
+_DEFAULT_AI_INSTRUCTION = "请解释该检查点的风险与建议修订，结合证据与规则结果，输出简短可执行建议。"
+
+
+def _ai_instruction(prompt: Optional[str]) -> str:
+    return (prompt or "").strip() or _DEFAULT_AI_INSTRUCTION
+
+
 def _truncate_for_ai(s: str, n: int = 1800) -> str:
     s2 = _normalize_ws(s)
     return s2[:n] + ("…" if len(s2) > n else "")
@@ -130,9 +151,12 @@ def _looks_like_next_label(val: str) -> bool:
     return False
 
 
-def _value_after_label(text: str, label_regex: Optional[str]) -> Optional[str]:
+def _text_lines(text: str) -> List[str]:
     t = text or ""
-    lines = t.splitlines() or [t]
+    return t.splitlines() or [t]
+
+
+def _value_after_label_in_lines(lines: List[str], label_regex: Optional[str]) -> Optional[str]:
     if label_regex:
         for line in lines:
             try:
@@ -152,9 +176,7 @@ def _value_after_label(text: str, label_regex: Optional[str]) -> Optional[str]:
     return None
 
 
-def _value_after_label_strict(text: str, label_regex: Optional[str]) -> Optional[str]:
-    t = text or ""
-    lines = t.splitlines() or [t]
+def _value_after_label_strict_in_lines(lines: List[str], label_regex: Optional[str]) -> Optional[str]:
     if not label_regex:
         return None
 
@@ -222,11 +244,11 @@ def _find_block(blocks: List[Block], anchor_type: str, anchor_value: str) -> Opt
 
 
 def _block_has_label_value(b: Block, label_regex: str) -> bool:
-    return _value_after_label(b.text or "", label_regex) is not None
+    return _features(b).value_after_label(label_regex) is not None
 
 
 def _block_has_label_value_strict(b: Block, label_regex: str) -> bool:
-    return _value_after_label_strict(b.text or "", label_regex) is not None
+    return _features(b).value_after_label_strict(label_regex) is not None
 
 
 def _looks_like_section_heading(text: str) -> bool:
@@ -241,17 +263,120 @@ def _looks_like_section_heading(text: str) -> bool:
     return "、" in head
 
 
+_YEAR_MONTH_RE = re.compile(r"(\d{4})\s*[年/\-\.]\s*(\d{1,2})\s*(?:月)?")
+_MISSING = object()
+
+
+class _BlockFeatures:
+    """
+    Derived facts about one block, each computed at most once.
+    Obtain instances through _features() so they are shared for the duration of a run.
+    """
+
+    def __init__(self, block: Block):
+        self.block = block
+        self._label_values: Dict[Tuple[bool, Optional[str]], Optional[str]] = {}
+
+    @cached_property
+    def text(self) -> str:
+        return self.block.text or ""
+
+    @cached_property
+    def lines(self) -> List[str]:
+        return _text_lines(self.text)
+
+    @cached_property
+    def has_underline_placeholder(self) -> bool:
+        return _has_underline_placeholder(self.block.htmlFragment or "")
+
+    @cached_property
+    def has_table(self) -> bool:
+        b = self.block
+        try:
+            if str(b.kind) == "BlockKind.TABLE" or (hasattr(b.kind, "value") and b.kind.value == "table") or b.kind == "table":
+                return True
+        except Exception:
+            pass
+        return "<table" in ((b.htmlFragment or "").lower())
+
+    @cached_property
+    def looks_like_section_heading(self) -> bool:
+        return _looks_like_section_heading(self.text)
+
+    @cached_property
+    def first_int(self) -> Optional[int]:
+        m = re.search(r"\d+", self.text)
+        return int(m.group(0)) if m else None
+
+    @cached_property
+    def account_numbers(self) -> List[str]:
+        return re.findall(r"\d{10,30}", self.text)
+
+    @cached_property
+    def year_month(self) -> Optional[Tuple[int, int]]:
+        m = _YEAR_MONTH_RE.search(self.text)
+        return (int(m.group(1)), int(m.group(2))) if m else None
+
+    def value_after_label(self, label_regex: Optional[str]) -> Optional[str]:
+        key = (False, label_regex)
+        val = self._label_values.get(key, _MISSING)
+        if val is _MISSING:
+            val = _value_after_label_in_lines(self.lines, label_regex)
+            self._label_values[key] = val
+        return val
+
+    def value_after_label_strict(self, label_regex: Optional[str]) -> Optional[str]:
+        key = (True, label_regex)
+        val = self._label_values.get(key, _MISSING)
+        if val is _MISSING:
+            val = _value_after_label_strict_in_lines(self.lines, label_regex)
+            self._label_values[key] = val
+        return val
+
+
+class _RunCache:
+    def __init__(self):
+        self.features: Dict[int, _BlockFeatures] = {}
+        self.positions: Dict[int, Dict[str, int]] = {}
+
+
+_run_cache: ContextVar[Optional[_RunCache]] = ContextVar("check_run_cache", default=None)
+
+
+def _features(b: Block) -> _BlockFeatures:
+    cache = _run_cache.get()
+    if cache is None:
+        return _BlockFeatures(b)
+    f = cache.features.get(id(b))
+    if f is None or f.block is not b:
+        f = _BlockFeatures(b)
+        cache.features[id(b)] = f
+    return f
+
+
+def _block_position(blocks: List[Block], block_id: str) -> Optional[int]:
+    cache = _run_cache.get()
+    if cache is None:
+        for i, b in enumerate(blocks):
+            if b.blockId == block_id:
+                return i
+        return None
+    positions = cache.positions.get(id(blocks))
+    if positions is None:
+        positions = {}
+        for i, b in enumerate(blocks):
+            positions.setdefault(b.blockId, i)
+        cache.positions[id(blocks)] = positions
+    return positions.get(block_id)
+
+
 def _refine_block_for_label_rules(blocks: List[Block], anchor_block: Block, label_regex: str) -> Block:
     if not label_regex:
         return anchor_block
     if _block_has_label_value_strict(anchor_block, label_regex):
         return anchor_block
 
-    idx = None
-    for i, b in enumerate(blocks):
-        if b.blockId == anchor_block.blockId:
-            idx = i
-            break
+    idx = _block_position(blocks, anchor_block.blockId)
 
     if idx is not None:
         for j in range(max(0, idx - 8), min(len(blocks), idx + 13)):
@@ -261,7 +386,7 @@ def _refine_block_for_label_rules(blocks: List[Block], anchor_block: Block, labe
 
         for j in range(max(0, idx - 8), min(len(blocks), idx + 13)):
             cand = blocks[j]
-            if _looks_like_section_heading(cand.text or ""):
+            if _features(cand).looks_like_section_heading:
                 continue
             if _block_has_label_value(cand, label_regex):
                 return cand
@@ -271,7 +396,7 @@ def _refine_block_for_label_rules(blocks: List[Block], anchor_block: Block, labe
             return cand
 
     for cand in blocks:
-        if _looks_like_section_heading(cand.text or ""):
+        if _features(cand).looks_like_section_heading:
             continue
         if _block_has_label_value(cand, label_regex):
             return cand
@@ -280,20 +405,11 @@ def _refine_block_for_label_rules(blocks: List[Block], anchor_block: Block, labe
 
 
 def _block_has_table(b: Block) -> bool:
-    try:
-        if str(b.kind) == "BlockKind.TABLE" or (hasattr(b.kind, "value") and b.kind.value == "table") or b.kind == "table":
-            return True
-    except Exception:
-        pass
-    return "<table" in ((b.htmlFragment or "").lower())
+    return _features(b).has_table
 
 
 def _find_nearby_table_block(blocks: List[Block], anchor_block_id: str) -> Optional[Block]:
-    idx = None
-    for i, b in enumerate(blocks):
-        if b.blockId == anchor_block_id:
-            idx = i
-            break
+    idx = _block_position(blocks, anchor_block_id)
     if idx is None:
         return None
 
@@ -323,11 +439,12 @@ def _parse_money_number(s: str) -> Optional[float]:
 
 def _eval_required_after_colon(rule: CheckRule, block: Block) -> Tuple[CheckStatus, str]:
     label_regex = rule.params.get("labelRegex")
-    val = _value_after_label_strict(block.text or "", label_regex)
+    f = _features(block)
+    val = f.value_after_label_strict(label_regex)
     if val is None:
-        val = _value_after_label(block.text or "", label_regex)
+        val = f.value_after_label(label_regex)
     if val is None:
-        if _has_underline_placeholder(block.htmlFragment or ""):
+        if f.has_underline_placeholder:
             return CheckStatus.FAIL, "字段为空（占位线/下划线未填写）"
         return CheckStatus.WARN, "未能定位“：”后的字段值，建议人工复核"
     cleaned = _strip_party_aliases(val)
@@ -339,24 +456,26 @@ def _eval_required_after_colon(rule: CheckRule, block: Block) -> Tuple[CheckStat
 
 
 def _eval_date_month(_: CheckRule, block: Block) -> Tuple[CheckStatus, str]:
-    t = block.text or ""
-    m = re.search(r"(\d{4})\s*[年/\-\.]\s*(\d{1,2})\s*(?:月)?", t)
-    if m:
-        month = int(m.group(2))
+    f = _features(block)
+    t = f.text
+    ym = f.year_month
+    if ym:
+        month = ym[1]
         if 1 <= month <= 12:
             return CheckStatus.PASS, "日期至少精确到月"
     if re.search(r"\d{4}\s*年", t):
         return CheckStatus.FAIL, "日期仅包含年份，需至少精确到月"
-    if _has_underline_placeholder(block.htmlFragment or ""):
+    if f.has_underline_placeholder:
         return CheckStatus.FAIL, "日期为空（占位线/下划线未填写）"
     return CheckStatus.FAIL, "未识别到有效日期（至少到月）"
 
 
 def _eval_date_format(_: CheckRule, block: Block) -> Tuple[CheckStatus, str]:
-    if _has_underline_placeholder(block.htmlFragment or ""):
+    f = _features(block)
+    if f.has_underline_placeholder:
         return CheckStatus.FAIL, "日期为空（占位线/下划线未填写）"
 
-    t = block.text or ""
+    t = f.text
     m = re.search(r"(\d{4})\s*[-/.]\s*(\d{1,2})\s*[-/.]\s*(\d{1,2})", t)
     if m:
         y, mo, d = int(m.group(1)), int(m.group(2)), int(m.group(3))
@@ -375,9 +494,9 @@ def _eval_date_format(_: CheckRule, block: Block) -> Tuple[CheckStatus, str]:
         except Exception:
             return CheckStatus.FAIL, "日期格式不合法（年-月-日）"
 
-    m = re.search(r"(\d{4})\s*[年/\-\.]\s*(\d{1,2})\s*(?:月)?", t)
-    if m:
-        mo = int(m.group(2))
+    ym = f.year_month
+    if ym:
+        mo = ym[1]
         if 1 <= mo <= 12:
             return CheckStatus.PASS, "日期格式合法（年-月）"
         return CheckStatus.FAIL, "日期格式不合法（月份范围错误）"
@@ -388,14 +507,15 @@ def _eval_date_format(_: CheckRule, block: Block) -> Tuple[CheckStatus, str]:
 
 def _eval_company_suffix(rule: CheckRule, block: Block) -> Tuple[CheckStatus, str]:
     label_regex = rule.params.get("labelRegex")
-    val = _value_after_label_strict(block.text or "", label_regex)
+    f = _features(block)
+    val = f.value_after_label_strict(label_regex)
     if val is None:
-        val = _value_after_label(block.text or "", label_regex)
+        val = f.value_after_label(label_regex)
     val = val or ""
     val2 = _strip_party_aliases(val)
     val2 = re.sub(r"\s+", "", val2)
     val2 = val2.strip("，,。；;：:()（）")
-    if not val2 or _is_placeholder_text(val2) or _has_underline_placeholder(block.htmlFragment or ""):
+    if not val2 or _is_placeholder_text(val2) or f.has_underline_placeholder:
         return CheckStatus.FAIL, "名称未填写"
     if val2.endswith("公司"):
         return CheckStatus.PASS, "名称包含“公司”后缀"
@@ -408,7 +528,7 @@ def _eval_option_selected(_: CheckRule, block: Block) -> Tuple[CheckStatus, str]
     has_any = any(x in t for x in marks)
     has_selected = any(x in t for x in ["■", "☑", "√", "✔", "☒", "✅"])
     if not has_any:
-        if _has_underline_placeholder(block.htmlFragment or ""):
+        if _features(block).has_underline_placeholder:
             return CheckStatus.FAIL, "未选择选项（为空）"
         return CheckStatus.WARN, "未检测到选项标记，建议人工复核"
     if has_selected:
@@ -417,14 +537,13 @@ def _eval_option_selected(_: CheckRule, block: Block) -> Tuple[CheckStatus, str]
 
 
 def _eval_number_max(rule: CheckRule, block: Block) -> Tuple[CheckStatus, str]:
-    t = block.text or ""
+    f = _features(block)
     max_v = rule.params.get("max")
-    m = re.search(r"\d+", t)
-    if not m:
-        if _has_underline_placeholder(block.htmlFragment or ""):
+    v = f.first_int
+    if v is None:
+        if f.has_underline_placeholder:
             return CheckStatus.FAIL, "期限为空（占位线/下划线未填写）"
         return CheckStatus.FAIL, "未识别到数值"
-    v = int(m.group(0))
     if max_v is None:
         return CheckStatus.PASS, f"已识别数值 {v}"
     if v <= int(max_v):
@@ -435,7 +554,7 @@ def _eval_number_max(rule: CheckRule, block: Block) -> Tuple[CheckStatus, str]:
 def _eval_bank_account_in_list(rule: CheckRule, block: Block, ruleset: Ruleset) -> Tuple[CheckStatus, str]:
     ref_key = rule.params.get("referenceKey", "bankAccounts")
     ref_list = ruleset.referenceData.get(ref_key, [])
-    nums = re.findall(r"\d{10,30}", block.text or "")
+    nums = _features(block).account_numbers
     if not nums:
         return CheckStatus.MANUAL, "未能从文本中提取到银行账号，需人工复核"
     if not ref_list:
@@ -447,7 +566,7 @@ def _eval_bank_account_in_list(rule: CheckRule, block: Block, ruleset: Ruleset)
 
 
 def _eval_fill_or_strike(rule: CheckRule, block: Block) -> Tuple[CheckStatus, str]:
-    if _has_underline_placeholder(block.htmlFragment or ""):
+    if _features(block).has_underline_placeholder:
         return CheckStatus.FAIL, "内容为空（占位线/下划线未填写）"
     t = block.text or ""
     if re.search(r"划去|不适用|N/?A", t, flags=re.IGNORECASE):
@@ -538,9 +657,51 @@ RULE_EVAL: Dict[RuleType, Any] = {
 }
 
 
+_STATUS_ORDER: Dict[CheckStatus, int] = {
+    CheckStatus.ERROR: 6,
+    CheckStatus.FAIL: 5,
+    CheckStatus.WARN: 4,
+    CheckStatus.MANUAL: 3,
+    CheckStatus.SKIPPED: 2,
+    CheckStatus.PASS: 1,
+}
+
+RUN_STATE_RUNNING = "running"
+RUN_STATE_COMPLETED = "completed"
+RUN_STATE_FAILED = "failed"
+
+def _count_statuses(items: List[CheckResultItem]) -> Dict[str, int]:
+    return {
+        "pass": sum(1 for x in items if x.status == CheckStatus.PASS),
+        "fail": sum(1 for x in items if x.status == CheckStatus.FAIL),
+        "warn": sum(1 for x in items if x.status == CheckStatus.WARN),
+        "manual": sum(1 for x in items if x.status == CheckStatus.MANUAL),
+        "error": sum(1 for x in items if x.status == CheckStatus.ERROR),
+        "skipped": sum(1 for x in items if x.status == CheckStatus.SKIPPED),
+    }
+
+
+_batch_worker_service: Optional["CheckService"] = None
+_batch_worker_ruleset: Optional[Ruleset] = None
+
+
+def _init_batch_worker(ruleset_payload: Dict[str, Any]) -> None:
+    global _batch_worker_service, _batch_worker_ruleset
+    _batch_worker_ruleset = Ruleset.model_validate(ruleset_payload)
+    _batch_worker_service = CheckService()
+
+
+def _batch_parse_and_evaluate(
+    path: str, ai_enabled: bool
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Any]]:
+    blocks = DocService.parse_docx(path)
+    items, ai_tasks, inputs = _batch_worker_service._evaluate(_batch_worker_ruleset, blocks, ai_enabled)
+    return [x.model_dump() for x in items], ai_tasks, inputs
+
+
 class CheckService:
-    def __init__(self):
-        self.llm = LLMService()
+    def __init__(self, llm: Optional[LLMService] = None):
+        self.llm = llm if llm is not None else get_llm_service()
 
     def _ai_should_run(self, ai_policy: Optional[str], ai_enabled: bool, status: CheckStatus) -> bool:
         if not ai_enabled:
@@ -555,18 +716,77 @@ class CheckService:
             return status == CheckStatus.FAIL
         return status in (CheckStatus.FAIL, CheckStatus.WARN, CheckStatus.MANUAL)
 
-    def run(self, template_id: str, right_blocks: List[Block], ai_enabled: bool) -> CheckRunResponse:
+    def _load_ruleset(self, template_id: str) -> Ruleset:
         ruleset = get_ruleset(template_id)
         if ruleset is None:
             raise ValueError(f"ruleset not found: {template_id}")
-
+        return ruleset
+
+    def _evaluate(
+        self,
+        ruleset: Ruleset,
+        right_blocks: List[Block],
+        ai_enabled: bool,
+        base: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[CheckResultItem], List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Returns (items, ai_tasks, inputs). inputs records the block hashes and per-point evidence
+        signatures of this run; passing a previous run's payload as base copies forward every item
+        whose signature is unchanged instead of re-evaluating it.
+        """
+        token = _run_cache.set(_RunCache())
+        try:
+            return self._evaluate_points(ruleset, right_blocks, ai_enabled, base)
+        finally:
+            _run_cache.reset(token)
+
+    def _reusable_item(
+        self, p: CheckPoint, signature: str, base: Optional[Dict[str, Any]], ai_enabled: bool
+    ) -> Optional[CheckResultItem]:
+        if not base:
+            return None
+        prev_sig = ((base.get("inputs") or {}).get("points") or {}).get(p.pointId)
+        if prev_sig != signature:
+            return None
+        prev = next((x for x in base.get("items") or [] if x.get("pointId") == p.pointId), None)
+        if prev is None:
+            return None
+        item = CheckResultItem.model_validate(prev)
+        if not ai_enabled:
+            item.ai = None
+        elif item.ai is not None and (item.ai.raw or "").startswith(_AI_NOT_RUN_PREFIXES):
+            return None
+        elif item.ai is None and self._ai_should_run(p.ai.policy.value if p.ai else None, True, item.status):
+            return None
+        return item
+
+    def _evaluate_points(
+        self,
+        ruleset: Ruleset,
+        right_blocks: List[Block],
+        ai_enabled: bool,
+        base: Optional[Dict[str, Any]],
+    ) -> Tuple[List[CheckResultItem], List[Dict[str, Any]], Dict[str, Any]]:
         items: List[CheckResultItem] = []
         ai_tasks: List[Dict[str, Any]] = []
-        item_by_point_id: Dict[str, CheckResultItem] = {}
+        block_keys = _block_keys(right_blocks)
+        hash_by_id = {b.blockId: _block_hash(b) for b in right_blocks}
+        block_hashes = {block_keys[i]: h for i, h in hash_by_id.items()}
+        point_signatures: Dict[str, str] = {}
+        reference_hash = _sha1_json(ruleset.referenceData)
+        reused = 0
 
         for p in ruleset.points:
+            point_hash = _sha1_json(p.model_dump(mode="json"))
             b = _find_block(right_blocks, p.anchor.type.value, p.anchor.value)
             if b is None:
+                signature = _sha1_json([point_hash, reference_hash, None])
+                point_signatures[p.pointId] = signature
+                prev_item = self._reusable_item(p, signature, base, ai_enabled)
+                if prev_item is not None:
+                    items.append(prev_item)
+                    reused += 1
+                    continue
                 item = (
                     CheckResultItem(
                         pointId=p.pointId,
@@ -578,7 +798,6 @@ class CheckService:
                     )
                 )
                 items.append(item)
-                item_by_point_id[item.pointId] = item
                 continue
 
             label_rules = [r for r in (p.rules or []) if r.type in (RuleType.REQUIRED_AFTER_COLON, RuleType.COMPANY_SUFFIX)]
@@ -600,8 +819,19 @@ class CheckService:
             evidence_blocks: List[Block] = [b]
             if table_block is not None:
                 evidence_blocks.append(table_block)
-            evidence_text = "\n".join([x.text or "" for x in evidence_blocks if (x.text or "").strip()])
+
+            evidence_keys = [[block_keys.get(x.blockId), hash_by_id.get(x.blockId) or _block_hash(x)] for x in evidence_blocks]
+            signature = _sha1_json([point_hash, reference_hash, evidence_keys])
+            point_signatures[p.pointId] = signature
             evidence_block_id = (table_block.blockId if table_block is not None else b.blockId)
+            prev_item = self._reusable_item(p, signature, base, ai_enabled)
+            if prev_item is not None:
+                prev_item.evidence.rightBlockId = evidence_block_id
+                items.append(prev_item)
+                reused += 1
+                continue
+
+            evidence_text = "\n".join([x.text or "" for x in evidence_blocks if (x.text or "").strip()])
             evidence_excerpt = _excerpt(evidence_text or "")
 
             status: CheckStatus = CheckStatus.PASS
@@ -622,19 +852,11 @@ class CheckService:
                     else:
                         st, msg = fn(r, b)
                 message_parts.append(msg)
-                order = {
-                    CheckStatus.ERROR: 6,
-                    CheckStatus.FAIL: 5,
-                    CheckStatus.WARN: 4,
-                    CheckStatus.MANUAL: 3,
-                    CheckStatus.SKIPPED: 2,
-                    CheckStatus.PASS: 1,
-                }
-                if order[st] > order[status]:
+                if _STATUS_ORDER[st] > _STATUS_ORDER[status]:
                     status = st
 
             if not p.rules:
-                if _has_underline_placeholder(b.htmlFragment or ""):
+                if _features(b).has_underline_placeholder:
                     status = CheckStatus.FAIL
                     message_parts = ["内容为空（占位线/下划线未填写）"]
                 else:
@@ -653,87 +875,327 @@ class CheckService:
             ai_policy = p.ai.policy.value if p.ai else None
             ai_prompt = ai_prompt_raw
             items.append(item)
-            item_by_point_id[item.pointId] = item
 
             if self._ai_should_run(ai_policy, ai_enabled, status):
-                instruction = (ai_prompt or "").strip()
-                if not instruction:
-                    instruction = "请解释该检查点的风险与建议修订，结合证据与规则结果，输出简短可执行建议。"
                 ai_tasks.append(
                     {
                         "pointId": p.pointId,
                         "title": p.title,
-                        "instruction": instruction,
+                        "instruction": _ai_instruction(ai_prompt),
                         "evidence": _truncate_for_ai(evidence_text or ""),
                         "rule": {"status": status.value, "message": item.message},
                     }
                 )
 
-        if ai_enabled and ai_tasks:
-            chunk_size = 10
-            for i in range(0, len(ai_tasks), chunk_size):
-                chunk = ai_tasks[i : i + chunk_size]
+        inputs: Dict[str, Any] = {"blocks": block_hashes, "points": point_signatures}
+        if base:
+            prev_blocks = (base.get("inputs") or {}).get("blocks") or {}
+            inputs["incremental"] = {
+                "baseRunId": base.get("runId"),
+                "reused": reused,
+                "reevaluated": len(items) - reused,
+                "changedBlocks": sum(1 for k, v in block_hashes.items() if prev_blocks.get(k) != v),
+                "removedBlocks": sum(1 for k in prev_blocks if k not in block_hashes),
+            }
+        return items, ai_tasks, inputs
+
+    def _ai_definitions(self, ruleset: Ruleset) -> List[Dict[str, Any]]:
+        """
+        Title and instruction of every point in the ruleset that may go to AI. The batch prompt
+        sends these ahead of each chunk so all chunks of a ruleset share one cacheable prefix.
+        """
+        return [
+            {"pointId": p.pointId, "title": p.title, "instruction": _ai_instruction(p.ai.prompt if p.ai else None)}
+            for p in ruleset.points
+            if not (p.ai and p.ai.policy.value == AiPolicy.NEVER.value)
+        ]
+
+    async def _arun_ai_chunk(
+        self,
+        chunk: List[Dict[str, Any]],
+        item_by_point_id: Dict[str, CheckResultItem],
+        definitions: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        try:
+            res_map = await self.llm.acheck_points_batch(chunk, definitions=definitions)
+            for pid, ai_res in res_map.items():
+                it = item_by_point_id.get(pid)
+                if it is not None:
+                    it.ai = ai_res
+        except Exception as batch_error:
+            # A provider that is still failing after retries would only be hit harder by
+            # per-point calls; those are reserved for batch-specific errors.
+            if is_retryable(batch_error):
+                for t in chunk:
+                    it = item_by_point_id.get(str(t.get("pointId") or ""))
+                    if it is not None:
+                        it.ai = CheckAiResult(raw=f"AI failed: {repr(batch_error)}")
+                return
+            for t in chunk:
+                pid = str(t.get("pointId") or "")
+                it = item_by_point_id.get(pid)
+                if it is None:
+                    continue
                 try:
-                    res_map = self.llm.check_points_batch(chunk)
-                    for pid, ai_res in res_map.items():
-                        it = item_by_point_id.get(pid)
-                        if it is not None:
-                            it.ai = ai_res
-                except Exception:
-                    for t in chunk:
-                        pid = str(t.get("pointId") or "")
-                        it = item_by_point_id.get(pid)
-                        if it is None:
-                            continue
-                        try:
-                            ai_res = self.llm.check_point(
-                                title=str(t.get("title") or ""),
-                                instruction=str(t.get("instruction") or ""),
-                                evidence_text=str(t.get("evidence") or ""),
-                                rule_status=str(((t.get("rule") or {}) or {}).get("status") or ""),
-                                rule_message=str(((t.get("rule") or {}) or {}).get("message") or ""),
-                            )
-                            it.ai = ai_res
-                        except Exception as e:
-                            it.ai = CheckAiResult(raw=f"AI failed: {repr(e)}")
-
-        summary = {
+                    ai_res = await self.llm.acheck_point(
+                        title=str(t.get("title") or ""),
+                        instruction=str(t.get("instruction") or ""),
+                        evidence_text=str(t.get("evidence") or ""),
+                        rule_status=str(((t.get("rule") or {}) or {}).get("status") or ""),
+                        rule_message=str(((t.get("rule") or {}) or {}).get("message") or ""),
+                    )
+                    it.ai = ai_res
+                except Exception as e:
+                    it.ai = CheckAiResult(raw=f"AI failed: {repr(e)}")
+
+    async def _afill_ai(
+        self,
+        jobs: List[Tuple[List[Dict[str, Any]], Dict[str, CheckResultItem]]],
+        on_chunk_done: Any = None,
+        definitions: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        """Run AI chunks concurrently on the LLM loop, at most CHECK_AI_CONCURRENCY in flight."""
+        sem = asyncio.Semaphore(settings.CHECK_AI_CONCURRENCY)
+
+        async def _one(chunk: List[Dict[str, Any]], item_by_point_id: Dict[str, CheckResultItem]) -> None:
+            async with sem:
+                await self._arun_ai_chunk(chunk, item_by_point_id, definitions)
+            if on_chunk_done is not None:
+                await on_chunk_done(len(chunk))
+
+        await asyncio.gather(*(_one(chunk, m) for chunk, m in jobs))
+
+    def _ai_chunks(self, ai_tasks: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        chunk_size = settings.CHECK_AI_CHUNK_SIZE
+        return [ai_tasks[i : i + chunk_size] for i in range(0, len(ai_tasks), chunk_size)]
+
+    def _build_summary(self, items: List[CheckResultItem], state: str, ai_total: int, ai_done: int) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
             "generatedAt": _utc_now_iso(),
-            "counts": {
-                "pass": sum(1 for x in items if x.status == CheckStatus.PASS),
-                "fail": sum(1 for x in items if x.status == CheckStatus.FAIL),
-                "warn": sum(1 for x in items if x.status == CheckStatus.WARN),
-                "manual": sum(1 for x in items if x.status == CheckStatus.MANUAL),
-                "error": sum(1 for x in items if x.status == CheckStatus.ERROR),
-                "skipped": sum(1 for x in items if x.status == CheckStatus.SKIPPED),
-            },
+            "state": state,
+            "counts": _count_statuses(items),
         }
+        if ai_total:
+            summary["ai"] = {"total": ai_total, "done": ai_done}
+        return summary
+
+    def _load_base_run(self, base_run_id: Optional[str], template_id: str) -> Optional[Dict[str, Any]]:
+        if not base_run_id:
+            return None
+        base = get_run(base_run_id)
+        if base is None:
+            raise ValueError(f"base run not found: {base_run_id}")
+        if base.get("templateId") != template_id:
+            return None
+        return base
+
+    async def arun(
+        self, template_id: str, right_blocks: List[Block], ai_enabled: bool, base_run_id: Optional[str] = None
+    ) -> CheckRunResponse:
+        ruleset = await asyncio.to_thread(self._load_ruleset, template_id)
+        base = await asyncio.to_thread(self._load_base_run, base_run_id, ruleset.templateId)
+        items, ai_tasks, inputs = await asyncio.to_thread(self._evaluate, ruleset, right_blocks, ai_enabled, base)
+        item_by_point_id = {x.pointId: x for x in items}
+
+        usage: Optional[Dict[str, Any]] = None
+        if ai_enabled and ai_tasks:
+            with collect_usage() as agg:
+                jobs = [(chunk, item_by_point_id) for chunk in self._ai_chunks(ai_tasks)]
+                await run_on_llm_loop(self._afill_ai(jobs, definitions=self._ai_definitions(ruleset)))
+            usage = agg.summary()
 
         run_id = "chk_" + uuid.uuid4().hex[:12]
         resp = CheckRunResponse(
             runId=run_id,
             templateId=ruleset.templateId,
             templateVersion=ruleset.version,
-            summary=summary,
+            summary=self._build_summary(items, RUN_STATE_COMPLETED, len(ai_tasks) if ai_enabled else 0, len(ai_tasks) if ai_enabled else 0),
             items=items,
         )
-        self._persist_run(resp)
+        if "incremental" in inputs:
+            resp.summary["incremental"] = inputs["incremental"]
+        if usage is not None:
+            resp.summary["llmUsage"] = usage
+        await asyncio.to_thread(self._persist_run, resp, inputs)
         return resp
 
-    def _persist_run(self, resp: CheckRunResponse) -> None:
-        root = _primary_check_runs_dir()
-        path = os.path.join(root, f"{resp.runId}.json")
+    def run(
+        self, template_id: str, right_blocks: List[Block], ai_enabled: bool, base_run_id: Optional[str] = None
+    ) -> CheckRunResponse:
+        return run_sync(self.arun(template_id, right_blocks, ai_enabled, base_run_id))
+
+    def start_run(
+        self, template_id: str, right_blocks: List[Block], ai_enabled: bool, base_run_id: Optional[str] = None
+    ) -> CheckRunResponse:
+        """
+        Evaluate deterministic rules, persist them and return immediately.
+        AI results are filled into the persisted run in the background, chunk by chunk;
+        progress is visible through summary.state and summary.ai.
+        """
+        ruleset = self._load_ruleset(template_id)
+        base = self._load_base_run(base_run_id, ruleset.templateId)
+        items, ai_tasks, inputs = self._evaluate(ruleset, right_blocks, ai_enabled, base)
+        if not ai_enabled:
+            ai_tasks = []
+
+        run_id = "chk_" + uuid.uuid4().hex[:12]
+        state = RUN_STATE_RUNNING if ai_tasks else RUN_STATE_COMPLETED
+        resp = CheckRunResponse(
+            runId=run_id,
+            templateId=ruleset.templateId,
+            templateVersion=ruleset.version,
+            summary=self._build_summary(items, state, len(ai_tasks), 0),
+            items=items,
+        )
+        if "incremental" in inputs:
+            resp.summary["incremental"] = inputs["incremental"]
+        self._persist_run(resp, inputs)
+        if ai_tasks:
+            snapshot = resp.model_copy(deep=True)
+            submit(self._acomplete_ai(snapshot, ai_tasks, inputs, self._ai_definitions(ruleset)))
+        return resp
+
+    def run_batch(
+        self,
+        template_id: str,
+        files: List[Tuple[str, str]],
+        ai_enabled: bool,
+        workers: Optional[int] = None,
+    ) -> CheckBatchResponse:
+        """
+        Check many .docx files against one ruleset. files is a list of (filename, path).
+        The ruleset is loaded once and handed to each pool worker at start-up; parsing and rule
+        evaluation run across a process pool, and all AI chunks share one CHECK_AI_CONCURRENCY budget.
+        """
+        ruleset = self._load_ruleset(template_id)
+        batch_id = "bat_" + uuid.uuid4().hex[:12]
+        n_workers = max(1, min(int(workers or settings.batch_workers()), len(files) or 1))
+
+        evaluated: List[Optional[Tuple[List[CheckResultItem], List[Dict[str, Any]], Dict[str, Any]]]] = [None] * len(files)
+        errors: List[Optional[str]] = [None] * len(files)
+        if n_workers == 1:
+            for i, (_, path) in enumerate(files):
+                try:
+                    evaluated[i] = self._evaluate(ruleset, DocService.parse_docx(path), ai_enabled)
+                except Exception as e:
+                    errors[i] = str(e) or repr(e)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_batch_worker,
+                initargs=(ruleset.model_dump(),),
+            ) as pool:
+                futures = [pool.submit(_batch_parse_and_evaluate, path, ai_enabled) for _, path in files]
+                for i, fut in enumerate(futures):
+                    try:
+                        raw_items, ai_tasks, inputs = fut.result()
+                        evaluated[i] = ([CheckResultItem.model_validate(x) for x in raw_items], ai_tasks, inputs)
+                    except Exception as e:
+                        errors[i] = str(e) or repr(e)
+
+        batch_usage: Optional[Dict[str, Any]] = None
+        if ai_enabled:
+            jobs: List[Tuple[List[Dict[str, Any]], Dict[str, CheckResultItem]]] = []
+            for res in evaluated:
+                if res is None or not res[1]:
+                    continue
+                item_by_point_id = {x.pointId: x for x in res[0]}
+                for chunk in self._ai_chunks(res[1]):
+                    jobs.append((chunk, item_by_point_id))
+            if jobs:
+                with collect_usage() as agg:
+                    run_sync(self._afill_ai(jobs, definitions=self._ai_definitions(ruleset)))
+                batch_usage = agg.summary()
+
+        out_items: List[CheckBatchItem] = []
+        totals: Dict[str, int] = {}
+        failing_points: Dict[str, int] = {}
+        for i, (filename, _) in enumerate(files):
+            res = evaluated[i]
+            if res is None:
+                out_items.append(CheckBatchItem(filename=filename, ok=False, error=errors[i] or "failed"))
+                continue
+            items, ai_tasks, inputs = res
+            n_ai = len(ai_tasks) if ai_enabled else 0
+            resp = CheckRunResponse(
+                runId="chk_" + uuid.uuid4().hex[:12],
+                templateId=ruleset.templateId,
+                templateVersion=ruleset.version,
+                summary=self._build_summary(items, RUN_STATE_COMPLETED, n_ai, n_ai),
+                items=items,
+            )
+            resp.summary["batchId"] = batch_id
+            resp.summary["filename"] = filename
+            self._persist_run(resp, inputs)
+            counts = resp.summary["counts"]
+            for k, v in counts.items():
+                totals[k] = totals.get(k, 0) + int(v)
+            for it in items:
+                if it.status == CheckStatus.FAIL:
+                    failing_points[it.pointId] = failing_points.get(it.pointId, 0) + 1
+            out_items.append(CheckBatchItem(filename=filename, runId=resp.runId, ok=True, counts=counts))
+
+        succeeded = sum(1 for x in out_items if x.ok)
+        summary = {
+            "generatedAt": _utc_now_iso(),
+            "documents": len(files),
+            "succeeded": succeeded,
+            "failed": len(files) - succeeded,
+            "documentsWithFailures": sum(1 for x in out_items if x.ok and x.counts.get("fail", 0) > 0),
+            "counts": totals,
+            "failingPoints": dict(sorted(failing_points.items(), key=lambda kv: (-kv[1], kv[0]))),
+        }
+        if batch_usage is not None:
+            summary["llmUsage"] = batch_usage
+        return CheckBatchResponse(
+            batchId=batch_id,
+            templateId=ruleset.templateId,
+            templateVersion=ruleset.version,
+            summary=summary,
+            items=out_items,
+        )
+
+    async def _acomplete_ai(
+        self,
+        resp: CheckRunResponse,
+        ai_tasks: List[Dict[str, Any]],
+        inputs: Dict[str, Any],
+        definitions: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        item_by_point_id = {x.pointId: x for x in resp.items}
+        persist_lock = asyncio.Lock()
+        done = 0
+
+        with collect_usage("check_run_background", inherit=False) as agg:
+
+            async def _on_chunk_done(n: int) -> None:
+                nonlocal done
+                async with persist_lock:
+                    done += n
+                    state = RUN_STATE_COMPLETED if done >= len(ai_tasks) else RUN_STATE_RUNNING
+                    resp.summary.update(self._build_summary(resp.items, state, len(ai_tasks), done))
+                    resp.summary["llmUsage"] = agg.summary()
+                    await asyncio.to_thread(self._persist_run, resp, inputs)
+
+            try:
+                jobs = [(chunk, item_by_point_id) for chunk in self._ai_chunks(ai_tasks)]
+                await self._afill_ai(jobs, _on_chunk_done, definitions)
+            except Exception as e:
+                async with persist_lock:
+                    resp.summary.update(self._build_summary(resp.items, RUN_STATE_FAILED, len(ai_tasks), done))
+                    resp.summary["error"] = repr(e)
+                    resp.summary["llmUsage"] = agg.summary()
+                    await asyncio.to_thread(self._persist_run, resp, inputs)
+
+    def _persist_run(self, resp: CheckRunResponse, inputs: Optional[Dict[str, Any]] = None) -> None:
         payload = resp.model_dump()
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, path)
+        if inputs:
+            payload["inputs"] = inputs
+        save_run(payload)
 
     def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
-        primary = os.path.join(_primary_check_runs_dir(), f"{run_id}.json")
-        legacy = os.path.join(_legacy_check_runs_dir(), f"{run_id}.json")
-        path = primary if os.path.exists(primary) else legacy
-        if not os.path.exists(path):
-            return None
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        payload = get_run(run_id)
+        if payload is not None:
+            payload.pop("inputs", None)
+        return payload
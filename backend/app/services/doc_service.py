@@ -4,6 +4,7 @@ import os
 import shutil
 import html
 import docx
+from lxml import etree
 from docx.document import Document
 from docx.text.paragraph import Paragraph
 from docx.table import Table
@@ -11,7 +12,7 @@ from docx.oxml.text.paragraph import CT_P
 from docx.oxml.table import CT_Tbl
 from docx.oxml.ns import qn
 from docx.shared import Pt
-from typing import List, Dict, Optional, Tuple, Any
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Any
 from app.models import Block, BlockKind, BlockMeta
 
 def normalize_text(text: str) -> str:
@@ -26,6 +27,18 @@ def normalize_text(text: str) -> str:
 def sha1(text: str) -> str:
     return hashlib.sha1(text.encode('utf-8')).hexdigest()
 
+# The run content Paragraph.text reads (w:r and w:hyperlink/w:r children), in one precompiled
+# query: python-docx evaluates a fresh XPath per run, which dominates parsing of long documents.
+_RUN_CONTENT = "w:br | w:cr | w:noBreakHyphen | w:ptab | w:t | w:tab"
+_PARAGRAPH_TEXT = etree.XPath(
+    " | ".join(f"{parent}/{child.strip()}" for parent in ("w:r", "w:hyperlink/w:r") for child in _RUN_CONTENT.split("|")),
+    namespaces={"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"},
+)
+
+def paragraph_text(paragraph: Paragraph) -> str:
+    """Same result as paragraph.text."""
+    return "".join(str(e) for e in _PARAGRAPH_TEXT(paragraph._p))
+
 def iter_block_items(parent):
     """
     Yield each paragraph and table child within *parent*, in document order.
@@ -158,33 +171,83 @@ class DocService:
         return formats, num_to_abs, starts
 
     @staticmethod
-    def parse_docx(file_path: str) -> List[Block]:
+    def open_docx(file_path: str) -> Document:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        return docx.Document(file_path)
+
+    @staticmethod
+    def parse_docx(file_path: str, doc: Optional[Document] = None) -> List[Block]:
         """
         Parse docx file directly using python-docx into Blocks.
         Replaces convert_docx_to_html + parse_blocks.
+        A doc already opened from file_path may be passed to skip reading the package again.
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
+        if doc is None:
+            doc = DocService.open_docx(file_path)
+        nodes = list(DocService._iter_nodes(doc))
 
-        doc = docx.Document(file_path)
-        nodes = []
+        # Normalize Indentation (data only; rendering happens in frontend)
+        DocService._normalize_indentation(nodes)
         
+        # Aggressive Section Merging (Top-Level Grouping)
+        return DocService._merge_nodes(doc, nodes)
+
+    @staticmethod
+    def iter_outline_blocks(file_path: str, doc: Optional[Document] = None) -> Iterator[Block]:
+        """
+        Cheap parse for template matching: yields the blocks parse_docx would return, in the same
+        order, but only as far as the caller reads. Each block carries just the text of its first
+        paragraph (what outline extraction looks at) and no HTML, so a caller that stops after
+        the first N outline entries skips most of the document.
+        """
+        if doc is None:
+            doc = DocService.open_docx(file_path)
+        seen_nodes: List[Dict] = []
+
+        def _tracked() -> Iterator[Dict]:
+            for n in DocService._iter_nodes(doc, outline_only=True):
+                seen_nodes.append(n)
+                yield n
+
+        next_block_index = 1
+        for n in DocService._group_nodes(_tracked()):
+            if not n["text"] and n["kind"] != BlockKind.TABLE:
+                continue
+            yield DocService._node_block(n, next_block_index)
+            next_block_index += 1
+        extra = DocService._extra_block(doc, seen_nodes, next_block_index)
+        if extra is not None:
+            yield extra
+
+    @staticmethod
+    def _iter_nodes(doc: Document, outline_only: bool = False) -> Iterator[Dict]:
+        """
+        Paragraph and table nodes in document order, before grouping. With outline_only the HTML
+        is left empty; kinds, numbering labels and text are computed exactly as for a full parse.
+        """
         # Load Numbering Formats
         numbering_formats, num_to_abs, numbering_starts = DocService._load_numbering_meta(doc)
         
         # Per-List Counter: numId -> {ilvl: count}
         list_states = {}
         
+        # Paragraph.style resolves the style id against styles.xml on every access.
+        style_names: Dict[Optional[str], str] = {}
+
         # Iterate over all block-level elements (paragraphs and tables)
         idx = 0
         for block in iter_block_items(doc):
             if isinstance(block, Paragraph):
-                text = block.text.strip()
+                text = paragraph_text(block).strip()
                 if not text:
                     continue
                 
                 # Determine Kind and Level
-                style_name = block.style.name
+                style_id = block._p.style
+                style_name = style_names.get(style_id)
+                if style_name is None:
+                    style_name = style_names[style_id] = block.style.name
                 kind = BlockKind.PARAGRAPH
                 level = None
                 
@@ -205,10 +268,11 @@ class DocService:
                 indent_pt = 0
                 first_line_indent_pt = 0
                 
-                if block.paragraph_format.left_indent:
+                # Only used to normalize list indentation for rendering.
+                if not outline_only and block.paragraph_format.left_indent:
                     indent_pt = block.paragraph_format.left_indent.pt
                 
-                if block.paragraph_format.first_line_indent:
+                if not outline_only and block.paragraph_format.first_line_indent:
                     first_line_indent_pt = block.paragraph_format.first_line_indent.pt
                 
                 if block._element.pPr is not None and block._element.pPr.numPr is not None:
@@ -332,8 +396,10 @@ class DocService:
                 style_attr = ""
 
                 html_inner: str
-                has_underlined_run = any(bool(getattr(r, "underline", False)) for r in block.runs)
-                if has_underlined_run:
+                has_underlined_run = not outline_only and any(bool(getattr(r, "underline", False)) for r in block.runs)
+                if outline_only:
+                    html_inner = html_content = ""
+                elif has_underlined_run:
                     run_parts: List[str] = []
                     stripped_leading = False
                     for r in block.runs:
@@ -362,7 +428,7 @@ class DocService:
                     html_inner = html.escape(final_text, quote=False)
                     html_content = f"<{html_tag}{style_attr}>{html_inner}</{html_tag}>"
 
-                nodes.append({
+                yield {
                     "kind": kind,
                     "headingLevel": level,
                     "structurePath": structure_path,
@@ -375,7 +441,7 @@ class DocService:
                     "num_fmt": num_fmt if kind == BlockKind.LIST_ITEM else None,
                     "num_id": num_id if kind == BlockKind.LIST_ITEM else None,
                     "abs_id": num_to_abs.get(num_id) if kind == BlockKind.LIST_ITEM and num_id is not None else None
-                })
+                }
                 
             elif isinstance(block, Table):
                 # Handle Table
@@ -398,6 +464,8 @@ class DocService:
                         # Get Text
                         cell_txt = cell.text.strip().replace('\n', ' ')
                         cells_text.append(cell_txt)
+                        if outline_only:
+                            continue
                         
                         # Handle Colspan
                         colspan_attr = ""
@@ -419,26 +487,20 @@ class DocService:
                 table_text = "\n".join(rows_text)
                 table_html = f"<table border='1'>{''.join(html_rows)}</table>"
                 
-                nodes.append({
+                yield {
                     "kind": BlockKind.TABLE,
                     "headingLevel": None,
                     "structurePath": f"body.table[{idx}]",
-                    "html": table_html,
+                    "html": "" if outline_only else table_html,
                     "text": normalize_text(table_text),
                     "indent_pt": 0
-                })
+                }
             
             idx += 1
             
         # Restore Numbering Logic - DISABLED because we do it inline now
         # DocService._restore_heading_numbering(nodes)
 
-        # Normalize Indentation (data only; rendering happens in frontend)
-        DocService._normalize_indentation(nodes)
-        
-        # Aggressive Section Merging (Top-Level Grouping)
-        return DocService._merge_nodes(doc, nodes)
-
     @staticmethod
     def _normalize_indentation(nodes: List[Dict]):
         """
@@ -493,6 +555,29 @@ class DocService:
                 
     @staticmethod
     def _merge_nodes(doc: Document, nodes: List[Dict]) -> List[Block]:
+        merged_nodes = list(DocService._group_nodes(nodes))
+
+        blocks: List[Block] = []
+        next_block_index = 1
+
+        for n in merged_nodes:
+            if not n["text"] and n["kind"] != BlockKind.TABLE:
+                continue
+
+            blocks.append(DocService._node_block(n, next_block_index))
+            next_block_index += 1
+
+        extra = DocService._extra_block(doc, nodes, next_block_index)
+        if extra is not None:
+            blocks.append(extra)
+        return blocks
+
+    @staticmethod
+    def _group_nodes(nodes: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Top-level grouping. Yields each node that starts a block as soon as that is decided; the
+        nodes that follow are merged into it in place, so its text is final once iteration ends.
+        """
         chinese_formats = ["chineseCounting", "chineseCountingThousand", "ideographTraditional", "japaneseCounting", "japaneseCountingThousand"]
 
         def _is_soft_section_title_text(text: str) -> bool:
@@ -522,7 +607,6 @@ class DocService:
                     return True
             return False
 
-        merged_nodes = []
         current_node = None
         
         # Track indentation of the current "Top Level" block
@@ -582,41 +666,28 @@ class DocService:
                 current_top_indent = indent
                 
             if is_start:
-                if current_node:
-                    merged_nodes.append(current_node)
                 current_node = n
+                yield n
             else:
                 current_node['text'] += "\n" + n['text']
                 current_node['html'] += n['html']
                 # structurePath stays as start node
-        
-        if current_node:
-            merged_nodes.append(current_node)
-        
-        blocks: List[Block] = []
-        next_block_index = 1
-
-        for n in merged_nodes:
-            if not n["text"] and n["kind"] != BlockKind.TABLE:
-                continue
-
-            block_id = f"b_{str(next_block_index).zfill(4)}"
-            next_block_index += 1
-
-            stable_key = sha1(f"{n['kind']}:{n['text']}")
 
-            blocks.append(
-                Block(
-                    blockId=block_id,
-                    kind=n["kind"],
-                    structurePath=n["structurePath"],
-                    stableKey=stable_key,
-                    text=n["text"],
-                    htmlFragment=n["html"],
-                    meta=BlockMeta(headingLevel=n["headingLevel"]),
-                )
-            )
+    @staticmethod
+    def _node_block(n: Dict, index: int) -> Block:
+        return Block(
+            blockId=f"b_{str(index).zfill(4)}",
+            kind=n["kind"],
+            structurePath=n["structurePath"],
+            stableKey=sha1(f"{n['kind']}:{n['text']}"),
+            text=n["text"],
+            htmlFragment=n["html"],
+            meta=BlockMeta(headingLevel=n["headingLevel"]),
+        )
 
+    @staticmethod
+    def _extra_block(doc: Document, nodes: List[Dict], next_block_index: int) -> Optional[Block]:
+        """Text boxes, headers and footers not already in the body, as one trailing block."""
         extra_texts: List[str] = []
         def _is_page_marker(s: str) -> bool:
             t = (s or "").strip()
@@ -688,20 +759,17 @@ class DocService:
                 joined_text = "\n".join(unique)
                 joined_html = "".join([f"<p>{html.escape(s, quote=False)}</p>" for s in unique])
                 block_id = f"b_{str(next_block_index).zfill(4)}"
-                next_block_index += 1
-                blocks.append(
-                    Block(
-                        blockId=block_id,
-                        kind=BlockKind.PARAGRAPH,
-                        structurePath="body.extra",
-                        stableKey=sha1(f"{BlockKind.PARAGRAPH}:{joined_text}"),
-                        text=joined_text,
-                        htmlFragment=joined_html,
-                        meta=BlockMeta(headingLevel=None),
-                    )
+                return Block(
+                    blockId=block_id,
+                    kind=BlockKind.PARAGRAPH,
+                    structurePath="body.extra",
+                    stableKey=sha1(f"{BlockKind.PARAGRAPH}:{joined_text}"),
+                    text=joined_text,
+                    htmlFragment=joined_html,
+                    meta=BlockMeta(headingLevel=None),
                 )
 
-        return blocks
+        return None
     
     @staticmethod
     def _restore_heading_numbering(nodes: List[Dict]):
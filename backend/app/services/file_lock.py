@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+class RWLock:
+    """
+    In-process reader/writer lock. Any number of readers share it; a writer waits for the readers
+    to drain and blocks new readers while it waits, so a steady stream of reads cannot starve it.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self, timeout_s: Optional[float] = None) -> bool:
+        with self._cond:
+            if not self._cond.wait_for(lambda: not self._writer and not self._waiting_writers, timeout_s):
+                return False
+            self._readers += 1
+            return True
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self, timeout_s: Optional[float] = None) -> bool:
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                ok = self._cond.wait_for(lambda: not self._writer and self._readers == 0, timeout_s)
+            finally:
+                self._waiting_writers -= 1
+            if ok:
+                self._writer = True
+            else:
+                self._cond.notify_all()
+            return ok
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+_registry_lock = threading.Lock()
+_rw_locks: Dict[str, RWLock] = {}
+# lock path -> (exclusive, depth) for the locks the current thread holds.
+_held = threading.local()
+
+
+def _rw_lock(lock_path: str) -> RWLock:
+    with _registry_lock:
+        lock = _rw_locks.get(lock_path)
+        if lock is None:
+            lock = _rw_locks[lock_path] = RWLock()
+        return lock
+
+
+def _lock_path(target_path: str) -> str:
+    return target_path + ".lock"
+
+
+def _flock(fd: int, op: int, timeout_s: float) -> bool:
+    """
+    flock() has no timeout, so a contended lock is waited for in a helper thread that blocks in the
+    kernel; if the caller gives up, the helper releases the lock as soon as it gets it.
+    """
+    try:
+        fcntl.flock(fd, op | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        pass
+    state = {"acquired": False, "abandoned": False}
+    guard = threading.Lock()
+
+    def _wait() -> None:
+        fcntl.flock(fd, op)
+        with guard:
+            if state["abandoned"]:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+            else:
+                state["acquired"] = True
+
+    waiter = threading.Thread(target=_wait, name="flock-wait", daemon=True)
+    waiter.start()
+    waiter.join(timeout_s)
+    with guard:
+        if state["acquired"]:
+            return True
+        state["abandoned"] = True
+        return False
+
+
+def _held_locks() -> Dict[str, Tuple[bool, int]]:
+    held = getattr(_held, "locks", None)
+    if held is None:
+        held = _held.locks = {}
+    return held
+
+
+@contextmanager
+def _locked(target_path: str, exclusive: bool, timeout_s: float) -> Iterator[None]:
+    lock_path = _lock_path(target_path)
+    held = _held_locks()
+    current = held.get(lock_path)
+    if current is not None:
+        # Re-entry from the same thread: reading under our own write lock (or nesting the same
+        # mode) is already covered. Upgrading a shared lock would deadlock against ourselves.
+        if exclusive and not current[0]:
+            raise RuntimeError(f"cannot upgrade shared lock: {lock_path}")
+        held[lock_path] = (current[0], current[1] + 1)
+        try:
+            yield
+        finally:
+            held[lock_path] = (current[0], held[lock_path][1] - 1)
+        return
+    with _acquired(lock_path, exclusive, timeout_s):
+        held[lock_path] = (exclusive, 1)
+        try:
+            yield
+        finally:
+            held.pop(lock_path, None)
+
+
+@contextmanager
+def _acquired(lock_path: str, exclusive: bool, timeout_s: float) -> Iterator[None]:
+    deadline = time.monotonic() + timeout_s
+    rw = _rw_lock(lock_path)
+    acquired = rw.acquire_write(timeout_s) if exclusive else rw.acquire_read(timeout_s)
+    if not acquired:
+        raise RuntimeError(f"timeout acquiring lock: {lock_path}")
+    try:
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        op = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not _flock(fd, op, max(0.0, deadline - time.monotonic())):
+            # fd now belongs to the abandoned waiter thread, which closes it.
+            raise RuntimeError(f"timeout acquiring lock: {lock_path}")
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+    finally:
+        if exclusive:
+            rw.release_write()
+        else:
+            rw.release_read()
+
+
+def exclusive_lock(target_path: str, timeout_s: float = 10.0):
+    """
+    Writer lock for a store file: a threading RW lock inside the process plus flock(LOCK_EX) on
+    <target>.lock across processes. The lock file is never deleted; the kernel drops a dead
+    process's lock, so there is no stale-lock heuristic. Without fcntl (Windows) only the
+    in-process lock applies.
+    """
+    return _locked(target_path, True, timeout_s)
+
+
+def shared_lock(target_path: str, timeout_s: float = 10.0):
+    """Reader lock; readers only wait for a writer, never for each other."""
+    return _locked(target_path, False, timeout_s)
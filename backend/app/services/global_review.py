@@ -0,0 +1,263 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from app.utils.text_utils import get_leading_section_label
+
+BLOCK_TEXT_LIMIT = 1600
+
+_RISK_ORDER = {"low": 0, "medium": 1, "high": 2}
+
+
+def _payload_chars(obj: Any) -> int:
+    return len(json.dumps(obj, ensure_ascii=False))
+
+
+def compact_payload(payload: Dict[str, Any], limit: int = BLOCK_TEXT_LIMIT) -> Dict[str, Any]:
+    """Single-prompt payload: every block's text is cut to `limit` characters."""
+    blocks = []
+    for b in payload.get("blocks") or []:
+        t = str(b.get("text") or "")
+        if len(t) > limit:
+            b = {**b, "text": t[:limit] + "…"}
+        blocks.append(b)
+    return {**payload, "blocks": blocks}
+
+
+def _starts_section(block: Dict[str, Any]) -> bool:
+    if str(block.get("kind") or "") == "heading":
+        return True
+    text = str(block.get("text") or "").lstrip()
+    if text.startswith(("(", "（")):
+        return False
+    label = get_leading_section_label(text)
+    return bool(label) and "." not in label
+
+
+def _section_title(block: Dict[str, Any]) -> str:
+    first = str(block.get("text") or "").strip().split("\n", 1)[0]
+    return first[:60]
+
+
+def split_sections(payload: Dict[str, Any], max_chars: int) -> List[Dict[str, Any]]:
+    """
+    Split a global review payload into per-section payloads. Sections start at headings and at
+    top-level clause labels (get_leading_section_label); adjacent small sections are packed together
+    and oversized ones are split by block so that no section payload exceeds max_chars.
+    Each section only carries the diff rows and check items whose blocks it contains.
+    """
+    blocks: List[Dict[str, Any]] = []
+    for b in payload.get("blocks") or []:
+        t = str(b.get("text") or "")
+        if len(t) > max_chars // 2:
+            b = {**b, "text": t[: max_chars // 2] + "…"}
+        blocks.append(b)
+
+    raw_sections: List[List[Dict[str, Any]]] = []
+    for b in blocks:
+        if not raw_sections or _starts_section(b):
+            raw_sections.append([])
+        raw_sections[-1].append(b)
+
+    budget = max(1, max_chars // 2)
+    groups: List[List[Dict[str, Any]]] = []
+    size = 0
+    for sec in raw_sections:
+        sec_size = _payload_chars(sec)
+        if groups and size + sec_size <= budget:
+            groups[-1].extend(sec)
+            size += sec_size
+            continue
+        groups.append([])
+        size = 0
+        for b in sec:
+            b_size = _payload_chars(b)
+            if groups[-1] and size + b_size > budget:
+                groups.append([])
+                size = 0
+            groups[-1].append(b)
+            size += b_size
+
+    section_of: Dict[str, int] = {}
+    for i, g in enumerate(groups):
+        for b in g:
+            section_of[str(b.get("blockId") or "")] = i
+
+    rows_by_section: Dict[int, List[Dict[str, Any]]] = {}
+    current = 0
+    for row in payload.get("diffRows") or []:
+        rid = str(row.get("rightBlockId") or "")
+        if rid in section_of:
+            current = section_of[rid]
+        elif str(row.get("kind") or "") == "matched":
+            continue
+        rows_by_section.setdefault(current, []).append(row)
+
+    check_run = payload.get("checkRun") or None
+    items_by_section: Dict[int, List[Dict[str, Any]]] = {}
+    for it in (check_run or {}).get("items") or []:
+        rid = str(((it.get("evidence") or {}) or {}).get("rightBlockId") or "")
+        if rid in section_of:
+            items_by_section.setdefault(section_of[rid], []).append(it)
+
+    out: List[Dict[str, Any]] = []
+    for i, g in enumerate(groups):
+        section_payload: Dict[str, Any] = {
+            "templateId": payload.get("templateId"),
+            "section": {"index": i + 1, "of": len(groups), "title": _section_title(g[0])},
+            "blocks": g,
+            "diffRows": rows_by_section.get(i, []),
+            "checkRun": {"items": items_by_section.get(i, [])} if check_run is not None else None,
+        }
+        out.append(_fit(section_payload, max_chars))
+    return out
+
+
+def _fit(section_payload: Dict[str, Any], max_chars: int) -> Dict[str, Any]:
+    """Shed diff HTML, then trailing diff rows and check items, until the section fits max_chars."""
+    if _payload_chars(section_payload) <= max_chars:
+        return section_payload
+    section_payload["diffRows"] = [
+        {k: v for k, v in row.items() if k not in ("diffHtml", "leftDiffHtml", "rightDiffHtml")}
+        for row in section_payload["diffRows"]
+    ]
+    rows = section_payload["diffRows"]
+    items = ((section_payload.get("checkRun") or {}) or {}).get("items") or []
+    while _payload_chars(section_payload) > max_chars and (rows or items):
+        if rows:
+            rows.pop()
+        else:
+            items.pop()
+    return section_payload
+
+
+def unplaced_check_items(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Check items with no evidence block; they are handed to the reduce step instead of a section."""
+    block_ids = {str(b.get("blockId") or "") for b in payload.get("blocks") or []}
+    out = []
+    for it in ((payload.get("checkRun") or {}) or {}).get("items") or []:
+        rid = str(((it.get("evidence") or {}) or {}).get("rightBlockId") or "")
+        if rid not in block_ids:
+            out.append(it)
+    return out
+
+
+def section_digest(title: str, result: Optional[Dict[str, Any]], error: Optional[str]) -> Dict[str, Any]:
+    """The part of a section review that is forwarded to the reduce prompt."""
+    if result is None:
+        return {"title": title, "error": error or "no result"}
+    return {
+        "title": title,
+        "overallRiskLevel": result.get("overallRiskLevel"),
+        "summary": result.get("summary"),
+        "keyFindings": result.get("keyFindings") or [],
+        "improvementSuggestions": result.get("improvementSuggestions") or [],
+        "missingInformation": result.get("missingInformation") or [],
+    }
+
+
+_DIGEST_LISTS = ("keyFindings", "improvementSuggestions", "missingInformation")
+# (entries kept per list, characters kept per string), tried in order until a digest fits its share.
+_DIGEST_TRIM_STEPS = ((8, 800), (6, 400), (4, 200), (3, 120), (2, 80), (1, 60), (0, 40))
+
+
+def _cut(value: Any, limit: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= limit else value[:limit] + "…"
+    if isinstance(value, dict):
+        return {k: _cut(v, limit) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_cut(v, limit) for v in value]
+    return value
+
+
+def _trim_digest(digest: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    out = digest
+    for items, limit in _DIGEST_TRIM_STEPS:
+        if _payload_chars(out) <= budget:
+            break
+        out = {**digest, "summary": _cut(digest.get("summary"), limit)}
+        omitted = 0
+        for key in _DIGEST_LISTS:
+            entries = digest.get(key) or []
+            out[key] = _cut(entries[:items], limit)
+            omitted += max(0, len(entries) - items)
+        if omitted:
+            out["omittedEntries"] = omitted
+    return out
+
+
+def fit_digests(digests: List[Dict[str, Any]], max_chars: int) -> List[Dict[str, Any]]:
+    """
+    Section digests for the reduce prompt, trimmed so that together they stay within max_chars:
+    each section gets an equal share and loses list entries and string length until it fits.
+    Titles, risk levels and errors are always kept, so very many sections can still exceed it.
+    """
+    if not digests or _payload_chars(digests) <= max_chars:
+        return digests
+    share = max_chars // len(digests)
+    return [_trim_digest(d, share) for d in digests]
+
+
+def merge_block_reviews(results: List[Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    merged: Dict[str, Dict[str, Any]] = {}
+    order: List[str] = []
+    for r in results:
+        for br in (r or {}).get("blockReviews") or []:
+            bid = str(br.get("blockId") or "")
+            if not bid:
+                continue
+            if bid not in merged:
+                merged[bid] = dict(br)
+                order.append(bid)
+                continue
+            cur = merged[bid]
+            for key in ("issues", "suggestions"):
+                cur[key] = list(cur.get(key) or []) + [x for x in br.get(key) or [] if x not in (cur.get(key) or [])]
+            if _RISK_ORDER.get(str(br.get("riskLevel")), -1) > _RISK_ORDER.get(str(cur.get("riskLevel")), -1):
+                cur["riskLevel"] = br.get("riskLevel")
+    return [merged[b] for b in order]
+
+
+def section_entries(titles: List[str], results: List[Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    out = []
+    for title, r in zip(titles, results):
+        if r is None:
+            continue
+        evidence: List[str] = []
+        for f in r.get("keyFindings") or []:
+            for e in (f or {}).get("evidenceIds") or []:
+                if e not in evidence:
+                    evidence.append(e)
+        out.append(
+            {
+                "title": title,
+                "riskLevel": r.get("overallRiskLevel"),
+                "findings": [str((f or {}).get("title") or "") for f in r.get("keyFindings") or []],
+                "suggestions": [str((s or {}).get("title") or "") for s in r.get("improvementSuggestions") or []],
+                "evidenceIds": evidence,
+            }
+        )
+    return out
+
+
+def fallback_reduce(results: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Deterministic merge used when the reduce call fails or returns invalid JSON."""
+    ok = [r for r in results if r is not None]
+    risk = "low"
+    for r in ok:
+        if _RISK_ORDER.get(str(r.get("overallRiskLevel")), -1) > _RISK_ORDER[risk]:
+            risk = str(r.get("overallRiskLevel"))
+    confidences = [float(r["confidence"]) for r in ok if isinstance(r.get("confidence"), (int, float))]
+    missing: List[str] = []
+    for r in ok:
+        for m in r.get("missingInformation") or []:
+            if m not in missing:
+                missing.append(m)
+    return {
+        "overallRiskLevel": risk,
+        "summary": "\n".join(str(r.get("summary") or "") for r in ok if r.get("summary")),
+        "keyFindings": [f for r in ok for f in r.get("keyFindings") or []],
+        "improvementSuggestions": [s for r in ok for s in r.get("improvementSuggestions") or []],
+        "missingInformation": missing,
+        "confidence": min(confidences) if confidences else None,
+    }
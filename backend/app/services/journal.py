@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.file_lock import exclusive_lock, shared_lock
+from app.services.store_cache import file_key
+
+
+def fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_durable(path: str, data: bytes) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    fsync_dir(path)
+
+
+class _View:
+    def __init__(self) -> None:
+        self.items: Dict[str, Any] = {}
+        self.snapshot_key: Optional[Tuple[int, int, int]] = None
+        self.journal_ino: Optional[int] = None
+        self.offset = 0
+        self.seq = 0
+        self.records = 0
+        self.lock = threading.Lock()
+        self.compacting = False
+
+
+class JournaledMap:
+    """
+    A keyed store kept as a snapshot file plus an append-only journal (<snapshot>.journal, one JSON
+    record per line: {"seq", "key", "value"}, value null meaning delete). A write appends and fsyncs
+    its records, so its cost depends on the size of the change rather than the size of the store.
+    Readers keep a materialized view per path and only parse journal bytes they have not seen.
+
+    Compaction (in a background thread once STORE_JOURNAL_COMPACT_RECORDS records have accumulated)
+    writes a new snapshot carrying the last applied seq and only then swaps in an empty journal,
+    each step fsynced. A crash in between leaves records the snapshot already contains; replay skips
+    them by seq. A torn last line from a crash mid-append is ignored by readers and cut off by the
+    next writer.
+    """
+
+    def __init__(
+        self,
+        load_snapshot: Callable[[Dict[str, Any]], Dict[str, Any]],
+        dump_snapshot: Callable[[Dict[str, Any]], Dict[str, Any]],
+        encode: Callable[[Any], Any] = lambda v: v,
+        decode: Callable[[Any], Any] = lambda v: v,
+        indent: Optional[int] = None,
+    ):
+        self._indent = indent
+        self._load_snapshot = load_snapshot
+        self._dump_snapshot = dump_snapshot
+        self._encode = encode
+        self._decode = decode
+        self._views: Dict[str, _View] = {}
+        self._views_lock = threading.Lock()
+
+    @staticmethod
+    def journal_path(path: str) -> str:
+        return path + ".journal"
+
+    def _view(self, path: str) -> _View:
+        with self._views_lock:
+            view = self._views.get(path)
+            if view is None:
+                view = self._views[path] = _View()
+            return view
+
+    def _stat(self, path: str) -> Tuple[Optional[Tuple[int, int, int]], Optional[int], int]:
+        try:
+            skey = file_key(path)
+        except FileNotFoundError:
+            skey = None
+        try:
+            st = os.stat(self.journal_path(path))
+            return skey, st.st_ino, st.st_size
+        except FileNotFoundError:
+            return skey, None, 0
+
+    def _reload(self, path: str, view: _View) -> None:
+        view.items = {}
+        view.seq = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            view.items = self._load_snapshot(payload)
+            view.seq = int(payload.get("journalSeq") or 0)
+        except FileNotFoundError:
+            pass
+        view.offset = 0
+        view.records = 0
+
+    def _read_tail(self, path: str, view: _View) -> None:
+        try:
+            with open(self.journal_path(path), "rb") as f:
+                f.seek(view.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n")
+        if end < 0:
+            return
+        # Copy on write: callers may still be iterating the dict they got from items().
+        items = dict(view.items)
+        for line in data[: end + 1].splitlines():
+            view.offset += len(line) + 1
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            seq = int(rec.get("seq") or 0)
+            if seq <= view.seq:
+                continue
+            view.seq = seq
+            view.records += 1
+            if rec.get("value") is None:
+                items.pop(rec["key"], None)
+            else:
+                items[rec["key"]] = self._decode(rec["value"])
+        view.items = items
+
+    def _is_fresh(self, path: str, view: _View) -> bool:
+        skey, jino, jsize = self._stat(path)
+        return (
+            settings.STORE_CACHE_ENABLED
+            and view.snapshot_key is not None
+            and skey == view.snapshot_key
+            and jino == view.journal_ino
+            and jsize == view.offset
+        )
+
+    def _catch_up(self, path: str, view: _View) -> None:
+        """Caller holds a file lock on path (shared or exclusive) and view.lock, in that order."""
+        skey, jino, jsize = self._stat(path)
+        # A journal appearing where there was none is just the first append, not a swap.
+        replaced = view.journal_ino is not None and jino != view.journal_ino
+        if not settings.STORE_CACHE_ENABLED or skey != view.snapshot_key or replaced or jsize < view.offset:
+            self._reload(path, view)
+            view.snapshot_key = skey
+        view.journal_ino = jino
+        self._read_tail(path, view)
+
+    def _current(self, path: str) -> _View:
+        view = self._view(path)
+        with view.lock:
+            if self._is_fresh(path, view):
+                return view
+        # Read the snapshot and journal as one state: a compaction cannot swap them mid-read.
+        with shared_lock(path):
+            with view.lock:
+                self._catch_up(path, view)
+        return view
+
+    def items(self, path: str) -> Dict[str, Any]:
+        """The current key -> value view. Shared with other callers: treat it as read-only."""
+        return self._current(path).items
+
+    def revision(self, path: str) -> Tuple[Any, ...]:
+        """Changes whenever a record is applied or the snapshot file is replaced."""
+        view = self._current(path)
+        return path, view.seq, view.snapshot_key
+
+    def apply(self, path: str, changes: List[Tuple[str, Optional[Any]]], locked: bool = False) -> None:
+        """Append changes (value None deletes the key). Pass locked=True when already holding exclusive_lock(path)."""
+        if not changes:
+            return
+        if not locked:
+            with exclusive_lock(path):
+                self._apply(path, changes)
+        else:
+            self._apply(path, changes)
+        view = self._view(path)
+        if view.records >= settings.STORE_JOURNAL_COMPACT_RECORDS and not view.compacting:
+            view.compacting = True
+            threading.Thread(target=self._background_compact, args=(path,), name="journal-compact", daemon=True).start()
+
+    def _apply(self, path: str, changes: List[Tuple[str, Optional[Any]]]) -> None:
+        view = self._view(path)
+        with view.lock:
+            self._catch_up(path, view)
+            jpath = self.journal_path(path)
+            lines = []
+            seq = view.seq
+            for key, value in changes:
+                seq += 1
+                rec = {"seq": seq, "key": key, "value": None if value is None else self._encode(value)}
+                lines.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            with open(jpath, "ab+") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size > view.offset:
+                    # Bytes past what we replayed can only be a torn line from a crashed writer.
+                    f.truncate(view.offset)
+                    f.seek(view.offset)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if view.journal_ino is None:
+                fsync_dir(jpath)
+            self._read_tail(path, view)
+            view.journal_ino = os.stat(jpath).st_ino
+
+    def _background_compact(self, path: str) -> None:
+        try:
+            self.compact(path)
+        except Exception:
+            pass
+        finally:
+            self._view(path).compacting = False
+
+    def compact(self, path: str) -> None:
+        with exclusive_lock(path):
+            view = self._view(path)
+            with view.lock:
+                self._catch_up(path, view)
+                payload = self._dump_snapshot({k: self._encode(v) for k, v in view.items.items()})
+                payload["journalSeq"] = view.seq
+                separators = (",", ": ") if self._indent else (",", ":")
+                data = json.dumps(payload, ensure_ascii=False, indent=self._indent, separators=separators)
+                _write_durable(path, data.encode("utf-8"))
+                _write_durable(self.journal_path(path), b"")
+                view.snapshot_key, view.journal_ino, _ = self._stat(path)
+                view.offset = 0
+                view.records = 0
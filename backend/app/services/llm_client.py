@@ -0,0 +1,226 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, AsyncIterator, Awaitable, Optional, TypeVar
+
+try:
+    import httpx
+    from openai import AsyncOpenAI
+except ModuleNotFoundError:
+    httpx = None
+    AsyncOpenAI = None
+
+from app.core.config import settings
+
+
+T = TypeVar("T")
+
+
+def resolve_client_config() -> tuple[str, str, str]:
+    provider = (getattr(settings, "LLM_PROVIDER", "") or "").strip().lower()
+
+    api_key = (getattr(settings, "LLM_API_KEY", "") or "").strip()
+    base_url = (getattr(settings, "LLM_BASE_URL", "") or "").strip()
+    model = (getattr(settings, "LLM_MODEL", "") or "").strip()
+
+    if not provider:
+        if api_key or base_url or model:
+            provider = "openai"
+        elif (getattr(settings, "QWEN_API_KEY", "") or "").strip():
+            provider = "qwen"
+        elif (getattr(settings, "SILICONFLOW_API_KEY", "") or "").strip():
+            provider = "siliconflow"
+        elif (getattr(settings, "OPENAI_API_KEY", "") or "").strip():
+            provider = "openai"
+        else:
+            provider = "openai"
+
+    if provider in ("qwen", "dashscope"):
+        if not api_key:
+            api_key = (getattr(settings, "QWEN_API_KEY", "") or "").strip()
+        if not base_url:
+            base_url = (getattr(settings, "QWEN_BASE_URL", "") or "").strip()
+        if not model:
+            model = (getattr(settings, "QWEN_MODEL", "") or "").strip() or "qwen-plus"
+
+    elif provider in ("siliconflow", "sf"):
+        if not api_key:
+            api_key = (getattr(settings, "SILICONFLOW_API_KEY", "") or "").strip() or (getattr(settings, "OPENAI_API_KEY", "") or "").strip()
+        if not base_url:
+            base_url = (getattr(settings, "SILICONFLOW_BASE_URL", "") or "").strip() or (getattr(settings, "OPENAI_BASE_URL", "") or "").strip()
+        if not model:
+            model = (getattr(settings, "SILICONFLOW_MODEL", "") or "").strip() or (getattr(settings, "OPENAI_MODEL", "") or "").strip() or "deepseek-ai/DeepSeek-V2.5"
+
+    else:
+        if not api_key:
+            api_key = (getattr(settings, "OPENAI_API_KEY", "") or "").strip()
+        if not base_url:
+            base_url = (getattr(settings, "OPENAI_BASE_URL", "") or "").strip()
+        if not model:
+            model = (getattr(settings, "OPENAI_MODEL", "") or "").strip() or "deepseek-ai/DeepSeek-V2.5"
+
+    return api_key, base_url, model
+
+
+def _http2_enabled() -> bool:
+    mode = (settings.LLM_HTTP2 or "auto").strip().lower()
+    if mode in ("0", "false", "no", "off"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ModuleNotFoundError:
+        return False
+    return True
+
+
+class _LLMLoop:
+    """
+    One event loop on a daemon thread that owns the process-wide AsyncOpenAI client.
+    Every LLM request, whether issued from a request thread or from another event loop,
+    is executed here so the whole process shares one keep-alive connection pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Any = None
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or not self._loop.is_running():
+                ready = threading.Event()
+                loop = asyncio.new_event_loop()
+
+                def _run() -> None:
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                thread = threading.Thread(target=_run, name="llm-loop", daemon=True)
+                thread.start()
+                ready.wait()
+                self._loop = loop
+                self._thread = thread
+                self._client = None
+            return self._loop
+
+    def in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def client(self) -> Any:
+        """Must be called from inside the LLM loop."""
+        if self._client is None:
+            api_key, base_url, _ = resolve_client_config()
+            if AsyncOpenAI is None or httpx is None or not api_key:
+                return None
+            http_client = httpx.AsyncClient(
+                http2=_http2_enabled(),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.LLM_POOL_KEEPALIVE_EXPIRY_S,
+                ),
+                timeout=httpx.Timeout(settings.LLM_TIMEOUT_S, connect=min(10.0, settings.LLM_TIMEOUT_S)),
+            )
+            self._client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url if base_url else None,
+                http_client=http_client,
+                max_retries=0,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await client.close()
+
+
+_llm_loop = _LLMLoop()
+
+
+def submit(coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+    """Schedule a coroutine on the LLM loop from any thread."""
+    return asyncio.run_coroutine_threadsafe(coro, _llm_loop.loop())
+
+
+async def run_on_llm_loop(coro: Awaitable[T]) -> T:
+    """Await a coroutine on the LLM loop from any event loop."""
+    if _llm_loop.in_loop():
+        return await coro
+    return await asyncio.wrap_future(submit(coro))
+
+
+async def iterate_on_llm_loop(agen: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Drive an async generator on the LLM loop and relay its items to the calling event loop."""
+    if _llm_loop.in_loop():
+        async for x in agen:
+            yield x
+        return
+
+    consumer = asyncio.get_running_loop()
+    queue: "asyncio.Queue[tuple[bool, Any]]" = asyncio.Queue()
+
+    def _put(item: "tuple[bool, Any]") -> None:
+        try:
+            consumer.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass
+
+    async def _pump() -> None:
+        try:
+            async for x in agen:
+                _put((False, x))
+        except Exception as e:
+            _put((True, e))
+            return
+        _put((True, None))
+
+    fut = submit(_pump())
+    try:
+        while True:
+            done, value = await queue.get()
+            if done:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        if not fut.done():
+            fut.cancel()
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Block the calling (non-loop) thread until the coroutine finishes on the LLM loop."""
+    if _llm_loop.in_loop():
+        raise RuntimeError("run_sync called from the LLM loop; await the coroutine instead")
+    return submit(coro).result()
+
+
+def get_async_client() -> Any:
+    """The shared AsyncOpenAI client, or None when no API key is configured. LLM loop only."""
+    return _llm_loop.client()
+
+
+def reset_client() -> None:
+    """Drop the shared client (e.g. after configuration changes); the next call rebuilds it."""
+    if _llm_loop._loop is not None and _llm_loop._loop.is_running():
+        submit(_llm_loop.aclose()).result()
+
+
+_service_lock = threading.Lock()
+_service: Any = None
+
+
+def get_llm_service() -> Any:
+    global _service
+    with _service_lock:
+        if _service is None:
+            from app.services.llm_service import LLMService
+
+            _service = LLMService()
+        return _service
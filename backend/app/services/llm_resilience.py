@@ -0,0 +1,275 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+try:
+    import httpx
+    import openai
+except ModuleNotFoundError:
+    httpx = None
+    openai = None
+
+from app.core.config import settings
+from app.services.llm_metrics import LLMMetrics
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    if openai is not None:
+        if isinstance(exc, openai.APIConnectionError):
+            return True
+        if isinstance(exc, openai.APIStatusError):
+            code = int(getattr(exc, "status_code", 0) or 0)
+            return code in (408, 409, 429) or code >= 500
+    if httpx is not None and isinstance(exc, httpx.TransportError):
+        return True
+    return False
+
+
+def _retry_after_s(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        v = float(headers.get("retry-after") or "")
+    except Exception:
+        return None
+    return v if v >= 0 else None
+
+
+def backoff_delay(attempt: int, base_s: float, max_s: float) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0.0, min(max_s, base_s * (2**attempt)))
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(float(seconds))
+
+    def count(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        if len(self._samples) < max(1, min_samples):
+            return None
+        xs = sorted(self._samples)
+        idx = min(len(xs) - 1, max(0, int(round(q * (len(xs) - 1)))))
+        return xs[idx]
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker: opens after `failures` retryable errors in a row, lets one
+    probe through after `reset_s`, and closes again on the first success.
+    Only touched from the LLM loop thread, so it needs no locking.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failures: int, reset_s: float):
+        self.failures = failures
+        self.reset_s = reset_s
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_s:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """The probe was abandoned (cancelled) before an answer came back; let the next caller probe."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._consecutive += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self._consecutive >= self.failures:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+class ResilientCaller:
+    """
+    Wraps one provider call with jittered retries, an optional hedged duplicate once the
+    call outlives the observed p95, and a circuit breaker shared by all callers.
+    Latency is tracked overall and per model; hedging uses the model's own samples once it has enough.
+    """
+
+    def __init__(self, metrics: Optional[LLMMetrics] = None):
+        self.latency = LatencyTracker()
+        self.model_latency: Dict[str, LatencyTracker] = {}
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET_S)
+        self.metrics = metrics if metrics is not None else LLMMetrics()
+
+    def latency_for(self, model: str) -> LatencyTracker:
+        tracker = self.model_latency.get(model)
+        if tracker is None:
+            tracker = self.model_latency[model] = LatencyTracker()
+        return tracker
+
+    def record_first_token(self, model: str, seconds: float) -> None:
+        """Streamed calls report their time to first token, so model_for sees streaming-only models."""
+        self.latency_for(model).record(seconds)
+
+    def _hedge_after_s(self, model: Optional[str]) -> Optional[float]:
+        if not settings.LLM_HEDGE_ENABLED:
+            return None
+        if model is not None:
+            p95 = self.latency_for(model).percentile(0.95, settings.LLM_HEDGE_MIN_SAMPLES)
+            if p95 is not None:
+                return p95
+        return self.latency.percentile(0.95, settings.LLM_HEDGE_MIN_SAMPLES)
+
+    async def _timed(self, make_call: Callable[[], Awaitable[Any]], model: Optional[str]) -> Any:
+        t0 = time.monotonic()
+        result = await make_call()
+        dt = time.monotonic() - t0
+        self.latency.record(dt)
+        if model is not None:
+            self.latency_for(model).record(dt)
+        return result
+
+    async def _hedged(self, make_call: Callable[[], Awaitable[Any]], hedge: bool, model: Optional[str]) -> Any:
+        if not hedge:
+            return await make_call()
+        hedge_after = self._hedge_after_s(model)
+        primary = asyncio.ensure_future(self._timed(make_call, model))
+        if hedge_after is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        self.metrics.incr("hedged")
+        pending = {primary, asyncio.ensure_future(self._timed(make_call, model))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        return t.result()
+                    error = t.exception()
+            assert error is not None
+            raise error
+        finally:
+            for t in pending:
+                t.cancel()
+
+    async def call(
+        self,
+        make_call: Callable[[], Awaitable[Any]],
+        hedge: bool = True,
+        stats: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None,
+    ) -> Any:
+        """
+        hedge=False is for streamed responses: only opening the stream is retried, and its
+        time-to-headers is not mixed into the latency samples (the caller reports time to first
+        token with record_first_token). The retry count is written to stats.
+        """
+        if not self.breaker.allow():
+            self.metrics.incr("circuitOpen")
+            raise CircuitOpenError("LLM provider unavailable (circuit open)")
+        probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+        attempt = 0
+        try:
+            while True:
+                try:
+                    result = await self._hedged(make_call, hedge, model)
+                except Exception as e:
+                    if not is_retryable(e):
+                        # The provider answered; a rejected request says nothing about its health.
+                        self.breaker.record_success()
+                        probe = False
+                        raise
+                    self.breaker.record_failure()
+                    probe = False
+                    self.metrics.incr("retryableErrors")
+                    if attempt >= settings.LLM_MAX_RETRIES:
+                        raise
+                    if not self.breaker.allow():
+                        self.metrics.incr("circuitOpen")
+                        raise CircuitOpenError("LLM provider unavailable (circuit open)") from e
+                    probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+                    delay = backoff_delay(attempt, settings.LLM_BACKOFF_BASE_S, settings.LLM_BACKOFF_MAX_S)
+                    retry_after = _retry_after_s(e)
+                    if retry_after is not None:
+                        delay = max(delay, min(retry_after, settings.LLM_BACKOFF_MAX_S))
+                    attempt += 1
+                    if stats is not None:
+                        stats["retries"] = attempt
+                    self.metrics.incr("retries")
+                    await asyncio.sleep(delay)
+                    continue
+                self.breaker.record_success()
+                probe = False
+                return result
+        finally:
+            # Cancellation skips both records above; a probe left marked in flight would keep
+            # the breaker rejecting every call.
+            if probe:
+                self.breaker.release_probe()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key onto one in-flight task; later callers await the
+    same result. Keys are forgotten as soon as the task finishes, so nothing is cached.
+    Only used on the LLM loop.
+    """
+
+    def __init__(self, metrics: Optional[LLMMetrics] = None):
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self.metrics = metrics if metrics is not None else LLMMetrics()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, make_call: Callable[[], Awaitable[Any]], stats: Optional[Dict[str, Any]] = None) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.metrics.incr("coalesced")
+            if stats is not None:
+                stats["coalesced"] = True
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(make_call())
+        self._inflight[key] = task
+
+        def _forget(t: "asyncio.Future[Any]") -> None:
+            if self._inflight.get(key) is t:
+                del self._inflight[key]
+            if not t.cancelled():
+                t.exception()
+
+        task.add_done_callback(_forget)
+        return await asyncio.shield(task)
@@ -1,83 +1,202 @@
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
 except ModuleNotFoundError:
-    OpenAI = None
+    AsyncOpenAI = None
+from app.models import Block, CheckAiResult, GlobalReviewResult
+from app.services.llm_client import get_async_client, iterate_on_llm_loop, resolve_client_config, run_on_llm_loop, run_sync
 from app.core.config import settings
-from app.models import Block, CheckAiResult
-from typing import List, Dict, Any
+from app.services import global_review as gr
+from app.services.llm_metrics import LLMMetrics
+from app.services.llm_resilience import CircuitOpenError, ResilientCaller, SingleFlight
+from app.services.llm_usage import call_record, record_call
+from app.services.retrieval import select_blocks
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional, Tuple
+import asyncio
+import hashlib
 import json
 import re
+import time
+
+# Task name -> settings field naming its model; unlisted tasks and empty fields use LLM_MODEL.
+_TASK_MODEL_SETTINGS = {
+    "check_batch": "LLM_MODEL_CHECK_BATCH",
+    "check_point": "LLM_MODEL_CHECK_POINT",
+    "analyze": "LLM_MODEL_ANALYZE",
+    "global_review": "LLM_MODEL_GLOBAL_REVIEW",
+    "global_review_section": "LLM_MODEL_GLOBAL_REVIEW",
+    "global_review_reduce": "LLM_MODEL_GLOBAL_REVIEW",
+}
 
 class LLMService:
-    def __init__(self):
+    """
+    Prompt assembly and response parsing for every LLM task.
+    Requests go through the process-wide async client (see llm_client); each a* coroutine has a
+    blocking twin for callers running on plain threads. Provider calls are retried, hedged and
+    circuit-broken by llm_resilience; while the circuit is open every task returns "AI skipped".
+    Identical concurrent requests share one provider call (LLM_SINGLE_FLIGHT).
+    Each task is routed to its own model (see model_for).
+    """
+
+    def __init__(self, client: Any = None):
         self.api_key, self.base_url, self.model = self._resolve_client_config()
-        if OpenAI is None:
-            self.client = None
-        else:
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url=self.base_url if self.base_url else None,
-            )
+        self._client = client
+        self.metrics = LLMMetrics()
+        self.resilience = ResilientCaller(self.metrics)
+        self.single_flight = SingleFlight(self.metrics)
+        self._primary_probe_at: Dict[str, float] = {}
 
     def _resolve_client_config(self) -> tuple[str, str, str]:
-        provider = (getattr(settings, "LLM_PROVIDER", "") or "").strip().lower()
-
-        api_key = (getattr(settings, "LLM_API_KEY", "") or "").strip()
-        base_url = (getattr(settings, "LLM_BASE_URL", "") or "").strip()
-        model = (getattr(settings, "LLM_MODEL", "") or "").strip()
-
-        if not provider:
-            if api_key or base_url or model:
-                provider = "openai"
-            elif (getattr(settings, "QWEN_API_KEY", "") or "").strip():
-                provider = "qwen"
-            elif (getattr(settings, "SILICONFLOW_API_KEY", "") or "").strip():
-                provider = "siliconflow"
-            elif (getattr(settings, "OPENAI_API_KEY", "") or "").strip():
-                provider = "openai"
-            else:
-                provider = "openai"
-
-        if provider in ("qwen", "dashscope"):
-            if not api_key:
-                api_key = (getattr(settings, "QWEN_API_KEY", "") or "").strip()
-            if not base_url:
-                base_url = (getattr(settings, "QWEN_BASE_URL", "") or "").strip()
-            if not model:
-                model = (getattr(settings, "QWEN_MODEL", "") or "").strip() or "qwen-plus"
-
-        elif provider in ("siliconflow", "sf"):
-            if not api_key:
-                api_key = (getattr(settings, "SILICONFLOW_API_KEY", "") or "").strip() or (getattr(settings, "OPENAI_API_KEY", "") or "").strip()
-            if not base_url:
-                base_url = (getattr(settings, "SILICONFLOW_BASE_URL", "") or "").strip() or (getattr(settings, "OPENAI_BASE_URL", "") or "").strip()
-            if not model:
-                model = (getattr(settings, "SILICONFLOW_MODEL", "") or "").strip() or (getattr(settings, "OPENAI_MODEL", "") or "").strip() or "deepseek-ai/DeepSeek-V2.5"
-
-        else:
-            if not api_key:
-                api_key = (getattr(settings, "OPENAI_API_KEY", "") or "").strip()
-            if not base_url:
-                base_url = (getattr(settings, "OPENAI_BASE_URL", "") or "").strip()
-            if not model:
-                model = (getattr(settings, "OPENAI_MODEL", "") or "").strip() or "deepseek-ai/DeepSeek-V2.5"
-
-        return api_key, base_url, model
-    
-    def analyze_risk(self, blocks: List[Block], query: str) -> Dict[str, Any]:
+        return resolve_client_config()
+
+    def _configured(self) -> bool:
+        if self._client is not None:
+            return True
+        return bool(self.api_key) and AsyncOpenAI is not None
+
+    def model_for(self, task: str) -> str:
         """
-        Analyze risk in the document blocks based on query.
-        Returns response with traceability (citations).
+        The task's configured model (LLM_MODEL_<TASK>, else LLM_MODEL). While that model's p95 is
+        above LLM_FALLBACK_P95_S, LLM_MODEL_FALLBACK is used instead, except for one probe request
+        every LLM_FALLBACK_PROBE_S so the primary's latency samples can recover.
         """
-        # Prepare context from blocks
+        primary = (getattr(settings, _TASK_MODEL_SETTINGS.get(task, ""), "") or "") or self.model
+        fallback = settings.LLM_MODEL_FALLBACK
+        if not fallback or fallback == primary or settings.LLM_FALLBACK_P95_S <= 0:
+            return primary
+        p95 = self.resilience.latency_for(primary).percentile(0.95, settings.LLM_FALLBACK_MIN_SAMPLES)
+        if p95 is None or p95 <= settings.LLM_FALLBACK_P95_S:
+            return primary
+        now = time.monotonic()
+        if now - self._primary_probe_at.get(primary, 0.0) >= settings.LLM_FALLBACK_PROBE_S:
+            self._primary_probe_at[primary] = now
+            return primary
+        self.metrics.incr("modelFallbacks")
+        return fallback
+
+    def _request_key(self, model: str, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> str:
+        raw = json.dumps({"model": model, "messages": messages, "kwargs": kwargs}, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _acreate(self, messages: List[Dict[str, str]], task: str = "chat", **kwargs: Any) -> Any:
+        async def _run() -> Any:
+            self.metrics.incr("requests")
+            client = self._client if self._client is not None else get_async_client()
+            if client is None:
+                raise RuntimeError("LLM client not configured")
+
+            stats: Dict[str, Any] = {}
+            model = self.model_for(task)
+
+            async def _provider_call() -> Any:
+                self.metrics.incr("providerCalls")
+                return await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0,
+                    **kwargs,
+                )
+
+            async def _call() -> Any:
+                return await self.resilience.call(_provider_call, stats=stats, model=model)
+
+            t0 = time.monotonic()
+            try:
+                if settings.LLM_SINGLE_FLIGHT:
+                    response = await self.single_flight.do(self._request_key(model, messages, kwargs), _call, stats=stats)
+                else:
+                    response = await _call()
+            except Exception:
+                record_call(call_record(task, model, time.monotonic() - t0, retries=stats.get("retries", 0), ok=False))
+                raise
+            record_call(
+                call_record(
+                    task,
+                    model,
+                    time.monotonic() - t0,
+                    usage=getattr(response, "usage", None),
+                    retries=stats.get("retries", 0),
+                    coalesced=bool(stats.get("coalesced")),
+                )
+            )
+            return response
+
+        return await run_on_llm_loop(_run())
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = self.metrics.snapshot()
+        out["inFlight"] = self.single_flight.in_flight()
+        out["breakerState"] = self.resilience.breaker.state
+        out["latencyP50S"] = self.resilience.latency.percentile(0.5)
+        out["latencyP95S"] = self.resilience.latency.percentile(0.95)
+        out["models"] = {
+            m: {"samples": t.count(), "latencyP50S": t.percentile(0.5), "latencyP95S": t.percentile(0.95)}
+            for m, t in sorted(self.resilience.model_latency.items())
+        }
+        return out
+
+    async def _astream_text(self, messages: List[Dict[str, str]], task: str = "chat", **kwargs: Any) -> AsyncIterator[Tuple[str, str]]:
+        """Yields (completion id, text delta) pairs as the provider streams them."""
+
+        async def _gen() -> AsyncIterator[Tuple[str, str]]:
+            client = self._client if self._client is not None else get_async_client()
+            if client is None:
+                raise RuntimeError("LLM client not configured")
+            stats: Dict[str, Any] = {}
+            usage: Any = None
+            model = self.model_for(task)
+            # Providers only report usage for a stream when asked to, in a final chunk.
+            stream_options = {"include_usage": True, **(kwargs.pop("stream_options", None) or {})}
+            t0 = time.monotonic()
+            try:
+                stream = await self.resilience.call(
+                    lambda: client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=0,
+                        stream=True,
+                        stream_options=stream_options,
+                        **kwargs,
+                    ),
+                    hedge=False,
+                    stats=stats,
+                    model=model,
+                )
+            except Exception:
+                record_call(call_record(task, model, time.monotonic() - t0, retries=stats.get("retries", 0), ok=False))
+                raise
+            first_token = True
+            ok = True
+            try:
+                async for chunk in stream:
+                    usage = getattr(chunk, "usage", None) or usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content or ""
+                    if delta:
+                        if first_token:
+                            first_token = False
+                            self.resilience.record_first_token(model, time.monotonic() - t0)
+                        yield chunk.id or "", delta
+            except Exception:
+                ok = False
+                raise
+            finally:
+                await stream.close()
+                record_call(call_record(task, model, time.monotonic() - t0, usage=usage, retries=stats.get("retries", 0), ok=ok))
+
+        async for item in iterate_on_llm_loop(_gen()):
+            yield item
+
+    def _analyze_messages(self, blocks: List[Block], query: str) -> List[Dict[str, str]]:
+        # Prepare context from the blocks relevant to the query (see retrieval.select_blocks)
         context_parts = []
-        for block in blocks:
+        for block in select_blocks(blocks, query):
             # We include Block ID in the context so LLM can reference it
             context_parts.append(f"<block id='{block.blockId}'>{block.text}</block>")
-        
+
         context_str = "\n".join(context_parts)
-        
-        system_prompt = """You are a legal contract assistant. 
+
+        system_prompt = """You are a legal contract assistant.
 Analyze the provided contract blocks and answer the user's query.
 Crucially, you MUST cite the specific block IDs that support your analysis.
 Use the format [Block ID] (e.g., [b_0001]) when referencing a clause.
@@ -91,35 +210,63 @@ Query: {query}
 
 Please provide a detailed risk analysis with citations."""
 
-        if not self.api_key or self.client is None:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    async def aanalyze_risk(self, blocks: List[Block], query: str) -> Dict[str, Any]:
+        """
+        Analyze risk in the document blocks based on query.
+        Returns response with traceability (citations).
+        """
+        # Indexing a large document is CPU work; keep it off the loop other LLM calls share.
+        messages = await asyncio.to_thread(self._analyze_messages, blocks, query)
+
+        if not self._configured():
             return {"analysis": "AI skipped: LLM client not configured", "trace_id": ""}
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0
-        )
-        
+        try:
+            response = await self._acreate(messages, task="analyze")
+        except CircuitOpenError as e:
+            return {"analysis": f"AI skipped: {e}", "trace_id": ""}
+
         content = response.choices[0].message.content
         return {
             "analysis": content,
             "trace_id": response.id # Traceability of the request
         }
 
-    def check_point(
+    def analyze_risk(self, blocks: List[Block], query: str) -> Dict[str, Any]:
+        return run_sync(self.aanalyze_risk(blocks, query))
+
+    async def astream_analyze_risk(self, blocks: List[Block], query: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Streaming analyze_risk: ("delta", {"text"}) events, then ("done", <analyze_risk result>)."""
+        messages = await asyncio.to_thread(self._analyze_messages, blocks, query)
+        if not self._configured():
+            yield "done", {"analysis": "AI skipped: LLM client not configured", "trace_id": ""}
+            return
+
+        parts: List[str] = []
+        trace_id = ""
+        try:
+            async for cid, delta in self._astream_text(messages, task="analyze"):
+                trace_id = trace_id or cid
+                parts.append(delta)
+                yield "delta", {"text": delta}
+        except CircuitOpenError as e:
+            yield "done", {"analysis": f"AI skipped: {e}", "trace_id": ""}
+            return
+        yield "done", {"analysis": "".join(parts), "trace_id": trace_id}
+
+    def _check_point_messages(
         self,
         title: str,
         instruction: str,
         evidence_text: str,
         rule_status: str,
         rule_message: str,
-    ) -> CheckAiResult:
-        if not self.api_key or self.client is None:
-            return CheckAiResult(raw="AI skipped: LLM API key not configured")
-
+    ) -> List[Dict[str, str]]:
         system_prompt = (
             "You are a contract checking assistant. "
             "Return ONLY a single JSON object with keys: "
@@ -133,18 +280,13 @@ Please provide a detailed risk analysis with citations."""
             "evidence": evidence_text,
             "rule": {"status": rule_status, "message": rule_message},
         }
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": json.dumps(user_payload, ensure_ascii=False)},
+        ]
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": json.dumps(user_payload, ensure_ascii=False)},
-            ],
-            temperature=0,
-        )
-
-        content = response.choices[0].message.content or ""
-        content2 = content.strip()
+    def _parse_check_point(self, content: str) -> CheckAiResult:
+        content2 = (content or "").strip()
         try:
             obj = json.loads(content2)
         except Exception:
@@ -166,64 +308,94 @@ Please provide a detailed risk analysis with citations."""
             confidence_f = None
         return CheckAiResult(status=status, summary=summary, confidence=confidence_f, raw=content2)
 
-    def check_points_batch(self, points: List[Dict[str, Any]]) -> Dict[str, CheckAiResult]:
-        if not self.api_key or self.client is None:
-            out: Dict[str, CheckAiResult] = {}
-            for p in points:
-                pid = str(p.get("pointId") or "")
-                if pid:
-                    out[pid] = CheckAiResult(raw="AI skipped: LLM API key not configured")
-            return out
+    async def acheck_point(
+        self,
+        title: str,
+        instruction: str,
+        evidence_text: str,
+        rule_status: str,
+        rule_message: str,
+    ) -> CheckAiResult:
+        if not self._configured():
+            return CheckAiResult(raw="AI skipped: LLM API key not configured")
+
+        messages = self._check_point_messages(title, instruction, evidence_text, rule_status, rule_message)
+        try:
+            response = await self._acreate(messages, task="check_point")
+        except CircuitOpenError as e:
+            return CheckAiResult(raw=f"AI skipped: {e}")
+        return self._parse_check_point(response.choices[0].message.content or "")
 
+    def check_point(
+        self,
+        title: str,
+        instruction: str,
+        evidence_text: str,
+        rule_status: str,
+        rule_message: str,
+    ) -> CheckAiResult:
+        return run_sync(self.acheck_point(title, instruction, evidence_text, rule_status, rule_message))
+
+    def _skipped_points(self, points: List[Dict[str, Any]], raw: str) -> Dict[str, CheckAiResult]:
+        out: Dict[str, CheckAiResult] = {}
+        for p in points:
+            pid = str(p.get("pointId") or "")
+            if pid:
+                out[pid] = CheckAiResult(raw=raw)
+        return out
+
+    def _check_points_batch_messages(
+        self, points: List[Dict[str, Any]], definitions: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Laid out for provider prefix caching: the system prompt and the check point definitions
+        (ruleset-wide when `definitions` is given, so every chunk of a ruleset shares them byte for
+        byte) come first; only the last message carries this chunk's evidence and rule results.
+        """
         system_prompt = (
             "You are a contract checking assistant. "
+            "The first user message defines the check points (pointId, title, instruction); "
+            "the second gives, for the points to check now, the evidence and the rule result. "
             "Return ONLY a single JSON object with key: results. "
             "results is an array of objects with keys: "
-            "pointId (string), status (pass|fail|warn|manual), summary (string), confidence (0-1). "
+            "pointId (string), status (pass|fail|warn|manual), summary (string), confidence (0-1), "
+            "with one entry per point in the second message. "
             "Do not include any extra text. "
-            "Important policy: if input.rule.status is 'fail', you MUST NOT output 'pass' for that point."
+            "Important policy: if a point's rule.status is 'fail', you MUST NOT output 'pass' for that point."
         )
 
-        user_payload = {"points": points}
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": json.dumps(user_payload, ensure_ascii=False)},
-            ],
-            temperature=0,
-        )
+        if definitions is None:
+            definitions = [{"pointId": p.get("pointId"), "title": p.get("title"), "instruction": p.get("instruction")} for p in points]
+        defined = {str(d.get("pointId") or "") for d in definitions}
+        checks = []
+        for p in points:
+            item = {"pointId": p.get("pointId"), "evidence": p.get("evidence"), "rule": p.get("rule")}
+            if str(p.get("pointId") or "") not in defined:
+                item.update(title=p.get("title"), instruction=p.get("instruction"))
+            checks.append(item)
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": json.dumps({"definitions": definitions}, ensure_ascii=False, sort_keys=True)},
+            {"role": "user", "content": json.dumps({"points": checks}, ensure_ascii=False)},
+        ]
 
-        content = (response.choices[0].message.content or "").strip()
+    def _parse_check_points_batch(self, points: List[Dict[str, Any]], content: str) -> Dict[str, CheckAiResult]:
+        content = (content or "").strip()
         try:
             obj = json.loads(content)
         except Exception:
             m = re.search(r"\{[\s\S]*\}", content)
             if not m:
-                out: Dict[str, CheckAiResult] = {}
-                for p in points:
-                    pid = str(p.get("pointId") or "")
-                    if pid:
-                        out[pid] = CheckAiResult(raw=content)
-                return out
+                return self._skipped_points(points, content)
             try:
                 obj = json.loads(m.group(0))
             except Exception:
-                out: Dict[str, CheckAiResult] = {}
-                for p in points:
-                    pid = str(p.get("pointId") or "")
-                    if pid:
-                        out[pid] = CheckAiResult(raw=content)
-                return out
+                return self._skipped_points(points, content)
 
         results = obj.get("results")
         if not isinstance(results, list):
-            out: Dict[str, CheckAiResult] = {}
-            for p in points:
-                pid = str(p.get("pointId") or "")
-                if pid:
-                    out[pid] = CheckAiResult(raw=content)
-            return out
+            return self._skipped_points(points, content)
 
         out: Dict[str, CheckAiResult] = {}
         for r in results:
@@ -247,10 +419,33 @@ Please provide a detailed risk analysis with citations."""
                 out[pid] = CheckAiResult(raw=content)
         return out
 
-    def global_review(self, payload: Dict[str, Any], prompt: str) -> str:
-        if not self.api_key or self.client is None:
-            return "AI skipped: LLM API key not configured"
+    async def acheck_points_batch(
+        self, points: List[Dict[str, Any]], definitions: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, CheckAiResult]:
+        if not self._configured():
+            return self._skipped_points(points, "AI skipped: LLM API key not configured")
+
+        try:
+            response = await self._acreate(self._check_points_batch_messages(points, definitions), task="check_batch")
+        except CircuitOpenError as e:
+            return self._skipped_points(points, f"AI skipped: {e}")
+        return self._parse_check_points_batch(points, response.choices[0].message.content or "")
+
+    def check_points_batch(
+        self, points: List[Dict[str, Any]], definitions: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, CheckAiResult]:
+        return run_sync(self.acheck_points_batch(points, definitions))
+
+    def _prefixed_messages(self, system_prompt: str, prompt: str, payload: Dict[str, Any]) -> List[Dict[str, str]]:
+        # The template prompt gets its own message ahead of the per-document input, so the
+        # system + prompt prefix is byte-identical across documents and sections of a template.
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": json.dumps({"prompt": prompt}, ensure_ascii=False)},
+            {"role": "user", "content": json.dumps({"input": payload}, ensure_ascii=False)},
+        ]
 
+    def _global_review_messages(self, payload: Dict[str, Any], prompt: str) -> List[Dict[str, str]]:
         system_prompt = (
             "You are a contract review assistant. "
             "Return ONLY a single JSON object. "
@@ -265,13 +460,186 @@ Please provide a detailed risk analysis with citations."""
             "Do not include any extra text."
         )
 
-        user_payload = {"prompt": prompt, "input": payload}
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": json.dumps(user_payload, ensure_ascii=False)},
-            ],
-            temperature=0,
+        return self._prefixed_messages(system_prompt, prompt, payload)
+
+    def _global_reduce_messages(self, payload: Dict[str, Any], prompt: str) -> List[Dict[str, str]]:
+        system_prompt = (
+            "You are a contract review assistant merging the per-section reviews of one contract. "
+            "Return ONLY a single JSON object. "
+            "It MUST contain keys: "
+            "overallRiskLevel (low|medium|high), summary (string), "
+            "keyFindings (array of {title, detail, evidenceIds}), "
+            "improvementSuggestions (array of {title, detail, priority}), "
+            "missingInformation (array of strings), confidence (0-1). "
+            "Merge duplicate findings across sections, keep their evidenceIds, and order findings by severity. "
+            "Do not include any extra text."
         )
+
+        return self._prefixed_messages(system_prompt, prompt, payload)
+
+    def _use_map_reduce(self, payload: Dict[str, Any]) -> bool:
+        mode = settings.GLOBAL_REVIEW_MODE
+        if mode == "single":
+            return False
+        if mode == "map_reduce":
+            return True
+        compact = gr.compact_payload(payload)
+        return len(json.dumps(compact, ensure_ascii=False)) > settings.GLOBAL_REVIEW_SECTION_MAX_CHARS
+
+    async def _amap_reduce_review(
+        self, payload: Dict[str, Any], prompt: str, on_section: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> str:
+        """
+        Review each section concurrently with only its own blocks, diff rows and check items, then merge
+        the section findings in one reduce call. blockReviews and sections are merged locally.
+        on_section gets {index, total, title, ok} as each section review finishes.
+        """
+        sections = gr.split_sections(payload, settings.GLOBAL_REVIEW_SECTION_MAX_CHARS)
+        titles = [str(sec["section"]["title"]) for sec in sections]
+        sem = asyncio.Semaphore(settings.GLOBAL_REVIEW_CONCURRENCY)
+
+        async def _review(sec: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+            async with sem:
+                try:
+                    response = await self._acreate(self._global_review_messages(sec, prompt), task="global_review_section")
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    return None, repr(e)
+            result, error = self.parse_global_review(response.choices[0].message.content or "")
+            return (result.model_dump() if result is not None else None), error
+
+        async def _map(i: int, sec: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+            out = await _review(sec)
+            if on_section is not None:
+                on_section({"index": i, "total": len(sections), "title": titles[i], "ok": out[0] is not None})
+            return out
+
+        mapped = await asyncio.gather(*(_map(i, sec) for i, sec in enumerate(sections)))
+        results = [r for r, _ in mapped]
+        if not any(r is not None for r in results):
+            raise RuntimeError(f"all {len(sections)} section reviews failed: {mapped[0][1] if mapped else ''}")
+
+        reduce_payload = {
+            "templateId": payload.get("templateId"),
+            # Bounded like a section payload, so the reduce call fits wherever the map calls did.
+            "sections": gr.fit_digests(
+                [gr.section_digest(t, r, e) for t, (r, e) in zip(titles, mapped)], settings.GLOBAL_REVIEW_SECTION_MAX_CHARS
+            ),
+            "checkRun": {
+                "summary": ((payload.get("checkRun") or {}) or {}).get("summary"),
+                "unplacedItems": gr.unplaced_check_items(payload),
+            },
+        }
+        reduced: Optional[Dict[str, Any]] = None
+        try:
+            response = await self._acreate(self._global_reduce_messages(reduce_payload, prompt), task="global_review_reduce")
+            result, _ = self.parse_global_review(response.choices[0].message.content or "")
+            if result is not None:
+                reduced = result.model_dump(include={"overallRiskLevel", "summary", "keyFindings", "improvementSuggestions", "missingInformation", "confidence"})
+        except CircuitOpenError:
+            raise
+        except Exception:
+            reduced = None
+        if reduced is None:
+            reduced = gr.fallback_reduce(results)
+
+        merged = {
+            **reduced,
+            "sections": gr.section_entries(titles, results),
+            "blockReviews": gr.merge_block_reviews(results),
+            "mapReduce": {"sections": len(sections), "failedSections": sum(1 for r in results if r is None)},
+        }
+        return json.dumps(merged, ensure_ascii=False)
+
+    async def aglobal_review(self, payload: Dict[str, Any], prompt: str) -> str:
+        """
+        Long documents (or GLOBAL_REVIEW_MODE=map_reduce) are reviewed section by section and merged;
+        otherwise the whole payload, with block texts cut to 1600 chars, goes out as one prompt.
+        """
+        if not self._configured():
+            return "AI skipped: LLM API key not configured"
+
+        try:
+            if self._use_map_reduce(payload):
+                return await run_on_llm_loop(self._amap_reduce_review(payload, prompt))
+            response = await self._acreate(self._global_review_messages(gr.compact_payload(payload), prompt), task="global_review")
+        except CircuitOpenError as e:
+            return f"AI skipped: {e}"
         return (response.choices[0].message.content or "").strip()
+
+    def global_review(self, payload: Dict[str, Any], prompt: str) -> str:
+        return run_sync(self.aglobal_review(payload, prompt))
+
+    async def _amap_reduce_events(self, payload: Dict[str, Any], prompt: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """_amap_reduce_review as ("section", ...) progress events and a final ("done", ...). LLM loop only."""
+        queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+        task = asyncio.ensure_future(self._amap_reduce_review(payload, prompt, on_section=queue.put_nowait))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                ev = await queue.get()
+                if ev is None:
+                    break
+                yield "section", ev
+            raw = task.result()
+        finally:
+            task.cancel()
+        result, error = self.parse_global_review(raw)
+        yield "done", {"raw": raw, "valid": result is not None, "result": result.model_dump() if result is not None else None, "error": error}
+
+    def parse_global_review(self, raw: str) -> Tuple[Optional[GlobalReviewResult], Optional[str]]:
+        """Validate a global_review completion; returns (result, None) or (None, error)."""
+        content = (raw or "").strip()
+        try:
+            obj = json.loads(content)
+        except Exception:
+            m = re.search(r"\{[\s\S]*\}", content)
+            if not m:
+                return None, "no JSON object in response"
+            try:
+                obj = json.loads(m.group(0))
+            except Exception as e:
+                return None, f"invalid JSON: {e}"
+        if not isinstance(obj, dict):
+            return None, "response is not a JSON object"
+        try:
+            return GlobalReviewResult.model_validate(obj), None
+        except Exception as e:
+            return None, str(e)
+
+    async def astream_global_review(self, payload: Dict[str, Any], prompt: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming global_review: ("delta", {"text"}) events, then ("done", {raw, valid, result, error})
+        where the assembled completion has been validated against GlobalReviewResult. Payloads that
+        aglobal_review would map-reduce are reviewed the same way here: one ("section", {index, total,
+        title, ok}) event per finished section instead of deltas, then the merged result.
+        """
+        if not self._configured():
+            yield "done", {"raw": "AI skipped: LLM API key not configured", "valid": False, "result": None, "error": None}
+            return
+
+        if self._use_map_reduce(payload):
+            try:
+                async for event, data in iterate_on_llm_loop(self._amap_reduce_events(payload, prompt)):
+                    yield event, data
+            except CircuitOpenError as e:
+                yield "done", {"raw": f"AI skipped: {e}", "valid": False, "result": None, "error": None}
+            return
+
+        parts: List[str] = []
+        try:
+            async for _, delta in self._astream_text(self._global_review_messages(gr.compact_payload(payload), prompt), task="global_review"):
+                parts.append(delta)
+                yield "delta", {"text": delta}
+        except CircuitOpenError as e:
+            yield "done", {"raw": f"AI skipped: {e}", "valid": False, "result": None, "error": None}
+            return
+        raw = "".join(parts).strip()
+        result, error = self.parse_global_review(raw)
+        yield "done", {
+            "raw": raw,
+            "valid": result is not None,
+            "result": result.model_dump() if result is not None else None,
+            "error": error,
+        }
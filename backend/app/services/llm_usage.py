@@ -0,0 +1,191 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.core.config import settings
+
+
+def _usage_tokens(usage: Any) -> Dict[str, int]:
+    # OpenAI-style usage object (prompt_tokens / completion_tokens); None when not reported.
+    # Prefix-cache hits come as prompt_tokens_details.cached_tokens, or prompt_cache_hit_tokens
+    # on DeepSeek-style providers.
+    def _int(v: Any) -> int:
+        try:
+            return int(v or 0)
+        except Exception:
+            return 0
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = _int(getattr(details, "cached_tokens", 0)) or _int(getattr(usage, "prompt_cache_hit_tokens", 0))
+    return {
+        "promptTokens": _int(getattr(usage, "prompt_tokens", 0)),
+        "completionTokens": _int(getattr(usage, "completion_tokens", 0)),
+        "cachedTokens": cached,
+    }
+
+
+def _cache_ratio(cached: int, prompt: int) -> Optional[float]:
+    return round(cached / prompt, 4) if prompt else None
+
+
+def call_record(
+    task: str,
+    model: str,
+    latency_s: float,
+    usage: Any = None,
+    retries: int = 0,
+    coalesced: bool = False,
+    ok: bool = True,
+) -> Dict[str, Any]:
+    """One LLM request as seen by its caller. Coalesced requests report no tokens: they were not billed."""
+    tokens = _usage_tokens(None if coalesced else usage)
+    return {
+        "task": task,
+        "model": model,
+        "latencyS": float(latency_s),
+        "retries": int(retries),
+        "coalesced": bool(coalesced),
+        "ok": bool(ok),
+        **tokens,
+    }
+
+
+def _new_task_totals() -> Dict[str, Any]:
+    return {"calls": 0, "promptTokens": 0, "completionTokens": 0, "cachedTokens": 0, "latencyS": 0.0}
+
+
+class UsageAggregate:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.latency_s = 0.0
+        self.by_model: Dict[str, int] = {}
+        self.by_task: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.calls += 1
+            self.failed += 0 if record.get("ok", True) else 1
+            self.coalesced += 1 if record.get("coalesced") else 0
+            self.retries += int(record.get("retries") or 0)
+            self.prompt_tokens += int(record.get("promptTokens") or 0)
+            self.completion_tokens += int(record.get("completionTokens") or 0)
+            self.cached_tokens += int(record.get("cachedTokens") or 0)
+            self.latency_s += float(record.get("latencyS") or 0.0)
+            model = str(record.get("model") or "")
+            self.by_model[model] = self.by_model.get(model, 0) + 1
+            t = self.by_task.setdefault(str(record.get("task") or ""), _new_task_totals())
+            t["calls"] += 1
+            t["promptTokens"] += int(record.get("promptTokens") or 0)
+            t["completionTokens"] += int(record.get("completionTokens") or 0)
+            t["cachedTokens"] += int(record.get("cachedTokens") or 0)
+            t["latencyS"] = round(t["latencyS"] + float(record.get("latencyS") or 0.0), 6)
+
+    def merge(self, other: "UsageAggregate") -> None:
+        with other._lock:
+            snap = other._state()
+        with self._lock:
+            self.calls += snap["calls"]
+            self.failed += snap["failed"]
+            self.coalesced += snap["coalesced"]
+            self.retries += snap["retries"]
+            self.prompt_tokens += snap["prompt_tokens"]
+            self.completion_tokens += snap["completion_tokens"]
+            self.cached_tokens += snap["cached_tokens"]
+            self.latency_s += snap["latency_s"]
+            for k, v in snap["by_model"].items():
+                self.by_model[k] = self.by_model.get(k, 0) + v
+            for k, v in snap["by_task"].items():
+                t = self.by_task.setdefault(k, _new_task_totals())
+                t["calls"] += v["calls"]
+                t["promptTokens"] += v["promptTokens"]
+                t["completionTokens"] += v["completionTokens"]
+                t["cachedTokens"] += v["cachedTokens"]
+                t["latencyS"] = round(t["latencyS"] + v["latencyS"], 6)
+
+    def _state(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "latency_s": self.latency_s,
+            "by_model": dict(self.by_model),
+            "by_task": {k: dict(v) for k, v in self.by_task.items()},
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {
+                "calls": self.calls,
+                "failed": self.failed,
+                "coalesced": self.coalesced,
+                "retries": self.retries,
+                "promptTokens": self.prompt_tokens,
+                "completionTokens": self.completion_tokens,
+                "totalTokens": self.prompt_tokens + self.completion_tokens,
+                "cachedTokens": self.cached_tokens,
+                "cacheHitRatio": _cache_ratio(self.cached_tokens, self.prompt_tokens),
+                "latencyS": round(self.latency_s, 6),
+                "models": dict(self.by_model),
+                "tasks": {k: {**v, "cacheHitRatio": _cache_ratio(v["cachedTokens"], v["promptTokens"])} for k, v in self.by_task.items()},
+            }
+        if settings.LLM_PRICE_PROMPT_PER_1K or settings.LLM_PRICE_COMPLETION_PER_1K:
+            out["estimatedCost"] = round(
+                out["promptTokens"] / 1000.0 * settings.LLM_PRICE_PROMPT_PER_1K
+                + out["completionTokens"] / 1000.0 * settings.LLM_PRICE_COMPLETION_PER_1K,
+                6,
+            )
+        return out
+
+
+_collectors: ContextVar[Tuple[UsageAggregate, ...]] = ContextVar("llm_usage_collectors", default=())
+_totals = UsageAggregate()
+_by_endpoint: Dict[str, UsageAggregate] = {}
+_by_endpoint_lock = threading.Lock()
+
+
+def record_call(record: Dict[str, Any]) -> None:
+    """Add one call to the process totals and to every collector open in the current context."""
+    _totals.add(record)
+    for agg in _collectors.get():
+        agg.add(record)
+
+
+@contextmanager
+def collect_usage(endpoint: Optional[str] = None, inherit: bool = True) -> Iterator[UsageAggregate]:
+    """
+    Collect the usage of every LLM call made in this context. Collectors nest, and the context is
+    inherited by work submitted to the LLM loop, so calls made there are counted too. With
+    `endpoint`, the result is also added to that endpoint's running totals. inherit=False detaches
+    from enclosing collectors (background work that outlives its request).
+    """
+    agg = UsageAggregate()
+    token = _collectors.set((_collectors.get() if inherit else ()) + (agg,))
+    try:
+        yield agg
+    finally:
+        _collectors.reset(token)
+        if endpoint:
+            with _by_endpoint_lock:
+                target = _by_endpoint.setdefault(endpoint, UsageAggregate())
+            target.merge(agg)
+
+
+def usage_totals() -> Dict[str, Any]:
+    with _by_endpoint_lock:
+        endpoints = dict(_by_endpoint)
+    return {
+        "total": _totals.summary(),
+        "endpoints": {k: v.summary() for k, v in sorted(endpoints.items())},
+    }
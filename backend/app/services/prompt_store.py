@@ -1,51 +1,13 @@
 import json
 import os
-import time
-from contextlib import contextmanager
+import threading
 from typing import Any, Dict
 
+from app.core.config import settings
 from app.models import GlobalPromptConfig
-
-
-def _lock_path(target_path: str) -> str:
-    return target_path + ".lock"
-
-
-@contextmanager
-def _exclusive_lock(target_path: str, timeout_s: float = 10.0, stale_s: float = 60.0):
-    lock_path = _lock_path(target_path)
-    start = time.monotonic()
-    acquired = False
-    fd = None
-    while True:
-        try:
-            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_RDWR)
-            acquired = True
-            break
-        except FileExistsError:
-            try:
-                age = time.time() - os.path.getmtime(lock_path)
-                if age > stale_s:
-                    os.remove(lock_path)
-                    continue
-            except Exception:
-                pass
-            if time.monotonic() - start >= timeout_s:
-                raise RuntimeError(f"timeout acquiring lock: {lock_path}")
-            time.sleep(0.05)
-    try:
-        yield
-    finally:
-        try:
-            if fd is not None:
-                os.close(fd)
-        finally:
-            if acquired:
-                try:
-                    os.remove(lock_path)
-                except Exception:
-                    pass
-
+from app.services import sqlite_store
+from app.services.file_lock import exclusive_lock
+from app.services.journal import JournaledMap
 
 def _store_dir() -> str | None:
     root = os.getenv("DOC_COMPARISON_DATA_DIR", "").strip()
@@ -77,7 +39,7 @@ def ensure_prompts_file() -> None:
     path = _prompts_file_path()
     if os.path.exists(path):
         return
-    with _exclusive_lock(path):
+    with exclusive_lock(path):
         if os.path.exists(path):
             return
         legacy = _legacy_prompts_file_path()
@@ -96,22 +58,71 @@ def ensure_prompts_file() -> None:
         os.replace(tmp, path)
 
 
-def get_global_prompt_config() -> GlobalPromptConfig:
-    ensure_prompts_file()
-    path = _prompts_file_path()
-    with open(path, "r", encoding="utf-8") as f:
-        payload = json.load(f)
+_DEFAULT_KEY = "defaultPrompt"
+_TEMPLATE_KEY_PREFIX = "byTemplateId/"
+
+
+def _prompt_items(cfg: GlobalPromptConfig) -> Dict[str, str]:
+    items = {_DEFAULT_KEY: cfg.defaultPrompt}
+    items.update({_TEMPLATE_KEY_PREFIX + k: v for k, v in cfg.byTemplateId.items()})
+    return items
+
+
+def _load_prompts_snapshot(payload: Dict[str, Any]) -> Dict[str, str]:
     try:
-        return GlobalPromptConfig.model_validate(payload)
+        cfg = GlobalPromptConfig.model_validate(payload)
     except Exception:
-        return GlobalPromptConfig()
+        cfg = GlobalPromptConfig()
+    return _prompt_items(cfg)
+
+
+def _dump_prompts_snapshot(items: Dict[str, str]) -> Dict[str, Any]:
+    by_id = {k[len(_TEMPLATE_KEY_PREFIX):]: v for k, v in items.items() if k.startswith(_TEMPLATE_KEY_PREFIX)}
+    return {"defaultPrompt": items.get(_DEFAULT_KEY) or "", "byTemplateId": by_id}
+
+
+# prompts.json is the snapshot; each changed prompt appends one record to prompts.json.journal.
+_prompts_journal = JournaledMap(_load_prompts_snapshot, _dump_prompts_snapshot, indent=2)
+
+
+def read_json_prompt_config() -> Dict[str, Any]:
+    ensure_prompts_file()
+    return _dump_prompts_snapshot(_prompts_journal.items(_prompts_file_path()))
+
+
+_prompt_config_lock = threading.Lock()
+_prompt_config_state: Dict[str, Any] = {"revision": None, "config": None}
+
+
+def _cached_prompt_config() -> GlobalPromptConfig:
+    """Validated again only when the journal revision changes (a write, compaction or external edit)."""
+    ensure_prompts_file()
+    path = _prompts_file_path()
+    revision = _prompts_journal.revision(path)
+    with _prompt_config_lock:
+        if _prompt_config_state["revision"] == revision:
+            return _prompt_config_state["config"]
+    cfg = GlobalPromptConfig.model_validate(_dump_prompts_snapshot(_prompts_journal.items(path)))
+    with _prompt_config_lock:
+        _prompt_config_state.update(revision=revision, config=cfg)
+    return cfg
+
+
+def get_global_prompt_config() -> GlobalPromptConfig:
+    if settings.STORE_BACKEND == "sqlite":
+        return GlobalPromptConfig.model_validate(sqlite_store.get_prompt_config())
+    return _cached_prompt_config().model_copy(deep=True)
 
 
 def upsert_global_prompt_config(cfg: GlobalPromptConfig) -> None:
+    if settings.STORE_BACKEND == "sqlite":
+        sqlite_store.put_prompt_config(cfg.model_dump())
+        return
     ensure_prompts_file()
     path = _prompts_file_path()
-    with _exclusive_lock(path):
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(cfg.model_dump(), f, ensure_ascii=False, indent=2)
-        os.replace(tmp, path)
+    wanted = _prompt_items(cfg)
+    with exclusive_lock(path):
+        current = _prompts_journal.items(path)
+        changes = [(k, v) for k, v in wanted.items() if current.get(k) != v]
+        changes.extend((k, None) for k in current if k not in wanted)
+        _prompts_journal.apply(path, changes, locked=True)
@@ -0,0 +1,111 @@
+import hashlib
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, List, Tuple
+
+from app.core.config import settings
+from app.models import Block
+from app.utils.text_utils import normalize_text
+
+
+_CJK_RUN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+_WORD = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    CJK-friendly terms: every CJK run contributes its character bigrams (a lone character
+    stands for itself), and latin/digit sequences contribute whole words.
+    """
+    s = unicodedata.normalize("NFKC", normalize_text(text or "")).lower()
+    out: List[str] = []
+    for run in _CJK_RUN.findall(s):
+        if len(run) == 1:
+            out.append(run)
+        else:
+            out.extend(run[i : i + 2] for i in range(len(run) - 1))
+    out.extend(_WORD.findall(_CJK_RUN.sub(" ", s)))
+    return out
+
+
+class BM25Index:
+    def __init__(self, docs: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tfs: List[Counter] = [Counter(d) for d in docs]
+        self.lengths = [len(d) for d in docs]
+        self.avgdl = (sum(self.lengths) / len(docs)) if docs else 0.0
+        df: Counter = Counter()
+        for tf in self.tfs:
+            df.update(tf.keys())
+        n = len(docs)
+        self.idf: Dict[str, float] = {t: math.log(1.0 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+        self.postings: Dict[str, List[int]] = {}
+        for i, tf in enumerate(self.tfs):
+            for t in tf:
+                self.postings.setdefault(t, []).append(i)
+
+    def search(self, query_terms: List[str], k: int) -> List[Tuple[int, float]]:
+        scores: Dict[int, float] = {}
+        avgdl = self.avgdl or 1.0
+        for t in set(query_terms):
+            idf = self.idf.get(t)
+            if idf is None:
+                continue
+            for i in self.postings[t]:
+                f = self.tfs[i][t]
+                denom = f + self.k1 * (1.0 - self.b + self.b * self.lengths[i] / avgdl)
+                scores[i] = scores.get(i, 0.0) + idf * f * (self.k1 + 1.0) / denom
+        return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[: max(0, k)]
+
+
+def document_hash(blocks: List[Block]) -> str:
+    h = hashlib.sha1()
+    for b in blocks:
+        h.update((b.blockId or "").encode("utf-8"))
+        h.update(b"\x00")
+        h.update((b.text or "").encode("utf-8"))
+        h.update(b"\x01")
+    return h.hexdigest()
+
+
+_index_cache: "OrderedDict[str, BM25Index]" = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def get_block_index(blocks: List[Block]) -> BM25Index:
+    """BM25 index over the blocks, cached per document hash so follow-up queries skip indexing."""
+    key = document_hash(blocks)
+    with _index_cache_lock:
+        idx = _index_cache.get(key)
+        if idx is not None:
+            _index_cache.move_to_end(key)
+            return idx
+    idx = BM25Index([tokenize(b.text) for b in blocks])
+    with _index_cache_lock:
+        _index_cache[key] = idx
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > settings.ANALYZE_INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return idx
+
+
+def select_blocks(blocks: List[Block], query: str) -> List[Block]:
+    """
+    The top ANALYZE_RETRIEVAL_TOP_K blocks for the query plus ANALYZE_RETRIEVAL_NEIGHBORS blocks
+    on each side, in document order. Short documents keep every block; a query that matches nothing
+    gets the opening blocks, as many as a matching query could select.
+    """
+    if len(blocks) <= settings.ANALYZE_RETRIEVAL_MIN_BLOCKS:
+        return list(blocks)
+    n = settings.ANALYZE_RETRIEVAL_NEIGHBORS
+    hits = get_block_index(blocks).search(tokenize(query), settings.ANALYZE_RETRIEVAL_TOP_K)
+    if not hits:
+        return list(blocks[: settings.ANALYZE_RETRIEVAL_TOP_K * (2 * n + 1)])
+    keep = set()
+    for i, _ in hits:
+        keep.update(range(max(0, i - n), min(len(blocks), i + n + 1)))
+    return [blocks[i] for i in sorted(keep)]
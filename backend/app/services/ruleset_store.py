@@ -1,51 +1,13 @@
 import json
 import os
 import re
-import time
-from contextlib import contextmanager
 from typing import Dict, Any, List, Optional
 
+from app.core.config import settings
 from app.models import Ruleset
-
-
-def _lock_path(target_path: str) -> str:
-    return target_path + ".lock"
-
-
-@contextmanager
-def _exclusive_lock(target_path: str, timeout_s: float = 10.0, stale_s: float = 60.0):
-    lock_path = _lock_path(target_path)
-    start = time.monotonic()
-    acquired = False
-    fd = None
-    while True:
-        try:
-            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_RDWR)
-            acquired = True
-            break
-        except FileExistsError:
-            try:
-                age = time.time() - os.path.getmtime(lock_path)
-                if age > stale_s:
-                    os.remove(lock_path)
-                    continue
-            except Exception:
-                pass
-            if time.monotonic() - start >= timeout_s:
-                raise RuntimeError(f"timeout acquiring lock: {lock_path}")
-            time.sleep(0.05)
-    try:
-        yield
-    finally:
-        try:
-            if fd is not None:
-                os.close(fd)
-        finally:
-            if acquired:
-                try:
-                    os.remove(lock_path)
-                except Exception:
-                    pass
+from app.services import sqlite_store
+from app.services.file_lock import exclusive_lock
+from app.services.journal import JournaledMap
 
 
 def _store_dir() -> Optional[str]:
@@ -234,7 +196,7 @@ def ensure_rulesets_file() -> None:
     path = _rulesets_file_path()
     if os.path.exists(path):
         return
-    with _exclusive_lock(path):
+    with exclusive_lock(path):
         if os.path.exists(path):
             return
         legacy = _legacy_rulesets_file_path()
@@ -253,20 +215,45 @@ def ensure_rulesets_file() -> None:
         os.replace(tmp, path)
 
 
-def list_rulesets() -> List[Ruleset]:
+def _load_rulesets_snapshot(payload: Dict[str, Any]) -> Dict[str, Ruleset]:
+    out: Dict[str, Ruleset] = {}
+    for x in payload.get("rulesets", []):
+        rs = Ruleset.model_validate(x)
+        out.setdefault(rs.templateId, rs)
+    return out
+
+
+# rulesets.json is the snapshot; upserts and deletes append to rulesets.json.journal.
+_rulesets_journal = JournaledMap(
+    _load_rulesets_snapshot,
+    lambda items: {"rulesets": list(items.values())},
+    encode=lambda rs: rs.model_dump(),
+    decode=Ruleset.model_validate,
+    indent=2,
+)
+
+
+def _cached_rulesets() -> Dict[str, Ruleset]:
     ensure_rulesets_file()
-    path = _rulesets_file_path()
-    with open(path, "r", encoding="utf-8") as f:
-        payload = json.load(f)
-    items = payload.get("rulesets", [])
-    return [Ruleset.model_validate(x) for x in items]
+    return _rulesets_journal.items(_rulesets_file_path())
+
+
+def read_json_rulesets() -> List[Dict[str, Any]]:
+    return [rs.model_dump() for rs in _cached_rulesets().values()]
+
+
+def list_rulesets() -> List[Ruleset]:
+    if settings.STORE_BACKEND == "sqlite":
+        return [Ruleset.model_validate(x) for x in sqlite_store.list_rulesets()]
+    return [rs.model_copy(deep=True) for rs in _cached_rulesets().values()]
 
 
 def get_ruleset(template_id: str) -> Optional[Ruleset]:
-    for rs in list_rulesets():
-        if rs.templateId == template_id:
-            return rs
-    return None
+    if settings.STORE_BACKEND == "sqlite":
+        payload = sqlite_store.get_ruleset(template_id)
+        return Ruleset.model_validate(payload) if payload is not None else None
+    rs = _cached_rulesets().get(template_id)
+    return rs.model_copy(deep=True) if rs is not None else None
 
 
 def _validate_template_id(template_id: str) -> str:
@@ -291,39 +278,19 @@ def upsert_ruleset(ruleset: Ruleset) -> None:
     ruleset.templateId = _validate_template_id(ruleset.templateId)
     ruleset.version = _validate_version(ruleset.version)
     ruleset.name = (ruleset.name or "").strip() or ruleset.templateId
+    if settings.STORE_BACKEND == "sqlite":
+        sqlite_store.put_ruleset(ruleset.model_dump())
+        return
     ensure_rulesets_file()
-    path = _rulesets_file_path()
-    with _exclusive_lock(path):
-        with open(path, "r", encoding="utf-8") as f:
-            payload = json.load(f)
-        items = payload.get("rulesets", [])
-        replaced = False
-        for i, x in enumerate(items):
-            if x.get("templateId") == ruleset.templateId:
-                items[i] = ruleset.model_dump()
-                replaced = True
-                break
-        if not replaced:
-            items.append(ruleset.model_dump())
-        payload["rulesets"] = items
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, path)
+    _rulesets_journal.apply(_rulesets_file_path(), [(ruleset.templateId, ruleset.model_copy(deep=True))])
 
 
 def delete_ruleset(template_id: str) -> None:
+    if settings.STORE_BACKEND == "sqlite":
+        sqlite_store.delete_ruleset(template_id)
+        return
     ensure_rulesets_file()
     path = _rulesets_file_path()
-    with _exclusive_lock(path):
-        with open(path, "r", encoding="utf-8") as f:
-            payload = json.load(f)
-        items = payload.get("rulesets", [])
-        next_items = [x for x in items if x.get("templateId") != template_id]
-        if len(next_items) == len(items):
-            return
-        payload["rulesets"] = next_items
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, path)
+    with exclusive_lock(path):
+        if template_id in _rulesets_journal.items(path):
+            _rulesets_journal.apply(path, [(template_id, None)], locked=True)
@@ -0,0 +1,414 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from app.core.config import settings
+from app.models import CheckRunListItem
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    template_id TEXT NOT NULL,
+    template_version TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    created_ts REAL NOT NULL,
+    counts TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_template_created ON runs (template_id, created_ts);
+CREATE INDEX IF NOT EXISTS idx_runs_state_created ON runs (state, created_ts);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_ts);
+CREATE TABLE IF NOT EXISTS run_payloads (
+    run_id TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_prune_lock = threading.Lock()
+_schema_lock = threading.Lock()
+_schema_ready: Set[str] = set()
+_last_prune_at = 0.0
+
+
+def _primary_check_runs_dir() -> str:
+    root = os.getenv("DOC_COMPARISON_DATA_DIR", "").strip()
+    if root:
+        d = os.path.join(root, "artifacts", "check_runs")
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    artifacts_root = os.getenv("ARTIFACTS_DIR", "").strip()
+    if artifacts_root:
+        d = os.path.join(artifacts_root, "check_runs")
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    backend_dir = os.path.abspath(os.path.join(app_dir, ".."))
+    d = os.path.join(backend_dir, "data", "artifacts", "check_runs")
+    os.makedirs(d, exist_ok=True)
+    return d
+
+
+def _legacy_check_runs_dir() -> str:
+    app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    return os.path.join(app_dir, "artifacts", "check_runs")
+
+
+def _index_path(root: str) -> str:
+    return os.path.join(root, "index.sqlite3")
+
+
+@contextmanager
+def _connect(root: str) -> Iterator[sqlite3.Connection]:
+    path = _index_path(root)
+    # WAL mode is stored in the database file, so the pragma and schema run once per index;
+    # executescript would also commit whatever the caller had open.
+    fresh = not os.path.exists(path)
+    conn = sqlite3.connect(path, timeout=30.0)
+    try:
+        if fresh or path not in _schema_ready:
+            with _schema_lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _import_legacy_runs(root, conn)
+                _schema_ready.add(path)
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _parse_ts(value: Optional[str]) -> Optional[float]:
+    s = (value or "").strip()
+    if not s:
+        return None
+    try:
+        dt = datetime.fromisoformat(s.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"invalid datetime: {value}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _run_rel_path(run_id: str, created_ts: float) -> str:
+    day = datetime.fromtimestamp(created_ts, tz=timezone.utc).strftime("%Y%m%d")
+    return os.path.join(day, f"{run_id}.json.gz")
+
+
+def _compress(payload: Dict[str, Any]) -> bytes:
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(data, compresslevel=6)
+
+
+def _write_payload(path: str, payload: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_compress(payload))
+    os.replace(tmp, path)
+
+
+def _read_payload(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        if path.endswith(".gz"):
+            with open(path, "rb") as f:
+                return json.loads(gzip.decompress(f.read()).decode("utf-8"))
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _legacy_run_files(root: str) -> List[str]:
+    out = []
+    for d in (root, _legacy_check_runs_dir()):
+        try:
+            names = sorted(os.listdir(d))
+        except FileNotFoundError:
+            continue
+        out.extend(os.path.join(d, n) for n in names if n.endswith(".json") and os.path.isfile(os.path.join(d, n)))
+    return out
+
+
+def _import_legacy_runs(root: str, conn: sqlite3.Connection) -> None:
+    """
+    Runs written before the index existed are flat <runId>.json files in the check_runs directory
+    (or the old app/artifacts one). They are moved into the index and payload layout once, when an
+    index is first opened, so lookups and listings never probe directories.
+    """
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone() is not None:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone() is not None:
+        conn.commit()
+        return
+    files = _legacy_run_files(root)
+    for file_path in files:
+        try:
+            payload = _read_payload(file_path)
+        except ValueError:
+            continue
+        if not isinstance(payload, dict):
+            continue
+        run_id = str(payload.get("runId") or os.path.basename(file_path)[: -len(".json")])
+        summary = payload.get("summary") or {}
+        try:
+            created_ts = _parse_ts(summary.get("generatedAt"))
+        except ValueError:
+            created_ts = None
+        if created_ts is None:
+            created_ts = os.path.getmtime(file_path)
+        rel_path = ""
+        if settings.STORE_BACKEND == "sqlite":
+            conn.execute("INSERT OR IGNORE INTO run_payloads (run_id, data) VALUES (?, ?)", (run_id, _compress(payload)))
+        else:
+            rel_path = _run_rel_path(run_id, created_ts)
+            _write_payload(os.path.join(root, rel_path), payload)
+        conn.execute(
+            "INSERT OR IGNORE INTO runs (run_id, template_id, template_version, state, created_at, created_ts, counts, path) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id,
+                str(payload.get("templateId") or ""),
+                str(payload.get("templateVersion") or ""),
+                str(summary.get("state") or "completed"),
+                str(summary.get("generatedAt") or datetime.fromtimestamp(created_ts, tz=timezone.utc).isoformat()),
+                float(created_ts),
+                json.dumps(summary.get("counts") or {}, separators=(",", ":")),
+                rel_path,
+            ),
+        )
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(len(files)),))
+    conn.commit()
+    for file_path in files:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+def save_run(payload: Dict[str, Any]) -> None:
+    """
+    Persist a check run payload (CheckRunResponse.model_dump()) and upsert its index row.
+    Re-saving the same runId (e.g. async AI progress) rewrites the payload in place. With the
+    SQLite store backend the payload is a row in run_payloads (path is empty) instead of a file.
+    """
+    root = _primary_check_runs_dir()
+    run_id = str(payload.get("runId") or "")
+    if not run_id:
+        raise ValueError("runId required")
+    summary = payload.get("summary") or {}
+    with _connect(root) as conn:
+        row = conn.execute("SELECT created_at, created_ts, path FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is not None:
+            created_at, created_ts, rel_path = row
+        else:
+            created_ts = time.time()
+            created_at = str(summary.get("generatedAt") or datetime.fromtimestamp(created_ts, tz=timezone.utc).isoformat())
+            rel_path = _run_rel_path(run_id, created_ts)
+        if settings.STORE_BACKEND == "sqlite":
+            if rel_path:
+                _remove_payload_file(root, rel_path)
+            rel_path = ""
+            conn.execute("INSERT OR REPLACE INTO run_payloads (run_id, data) VALUES (?, ?)", (run_id, _compress(payload)))
+        else:
+            if not rel_path:
+                rel_path = _run_rel_path(run_id, created_ts)
+                conn.execute("DELETE FROM run_payloads WHERE run_id = ?", (run_id,))
+            _write_payload(os.path.join(root, rel_path), payload)
+        conn.execute(
+            "INSERT OR REPLACE INTO runs (run_id, template_id, template_version, state, created_at, created_ts, counts, path) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id,
+                str(payload.get("templateId") or ""),
+                str(payload.get("templateVersion") or ""),
+                str(summary.get("state") or "completed"),
+                created_at,
+                float(created_ts),
+                json.dumps(summary.get("counts") or {}, separators=(",", ":")),
+                rel_path,
+            ),
+        )
+    _maybe_prune(root)
+
+
+def get_run(run_id: str) -> Optional[Dict[str, Any]]:
+    root = _primary_check_runs_dir()
+    with _connect(root) as conn:
+        row = conn.execute("SELECT path FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        blob = None
+        if row is not None and not row[0]:
+            blob = conn.execute("SELECT data FROM run_payloads WHERE run_id = ?", (run_id,)).fetchone()
+    if blob is not None:
+        return json.loads(gzip.decompress(blob[0]).decode("utf-8"))
+    if row is not None and row[0]:
+        return _read_payload(os.path.join(root, row[0]))
+    return None
+
+
+def list_runs(
+    template_id: Optional[str] = None,
+    state: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[CheckRunListItem]:
+    clauses: List[str] = []
+    params: List[Any] = []
+    if template_id:
+        clauses.append("template_id = ?")
+        params.append(template_id)
+    if state:
+        clauses.append("state = ?")
+        params.append(state)
+    since_ts = _parse_ts(since)
+    if since_ts is not None:
+        clauses.append("created_ts >= ?")
+        params.append(since_ts)
+    until_ts = _parse_ts(until)
+    if until_ts is not None:
+        clauses.append("created_ts < ?")
+        params.append(until_ts)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    params.extend([max(1, min(1000, int(limit))), max(0, int(offset))])
+    root = _primary_check_runs_dir()
+    with _connect(root) as conn:
+        rows = conn.execute(
+            "SELECT run_id, template_id, template_version, state, created_at, counts FROM runs "
+            f"{where} ORDER BY created_ts DESC LIMIT ? OFFSET ?",
+            params,
+        ).fetchall()
+    return [
+        CheckRunListItem(
+            runId=r[0],
+            templateId=r[1],
+            templateVersion=r[2],
+            state=r[3],
+            createdAt=r[4],
+            counts=json.loads(r[5] or "{}"),
+        )
+        for r in rows
+    ]
+
+
+def _remove_payload_file(root: str, rel_path: str) -> None:
+    try:
+        os.remove(os.path.join(root, rel_path))
+    except FileNotFoundError:
+        pass
+
+
+def _delete_rows(root: str, conn: sqlite3.Connection, rows: List[tuple]) -> int:
+    for run_id, rel_path in rows:
+        if rel_path:
+            _remove_payload_file(root, rel_path)
+    ids = [(r[0],) for r in rows]
+    conn.executemany("DELETE FROM runs WHERE run_id = ?", ids)
+    conn.executemany("DELETE FROM run_payloads WHERE run_id = ?", ids)
+    return len(rows)
+
+
+def import_run_payloads() -> int:
+    """Move file-backed run payloads into run_payloads; used when switching to the SQLite backend."""
+    root = _primary_check_runs_dir()
+    moved = 0
+    with _connect(root) as conn:
+        rows = conn.execute("SELECT run_id, path FROM runs WHERE path != ''").fetchall()
+        for run_id, rel_path in rows:
+            payload = _read_payload(os.path.join(root, rel_path))
+            if payload is None:
+                continue
+            conn.execute("INSERT OR REPLACE INTO run_payloads (run_id, data) VALUES (?, ?)", (run_id, _compress(payload)))
+            conn.execute("UPDATE runs SET path = '' WHERE run_id = ?", (run_id,))
+            moved += 1
+        conn.commit()
+    for run_id, rel_path in rows:
+        _remove_payload_file(root, rel_path)
+    return moved
+
+
+def _fail_stale_runs(root: str, conn: sqlite3.Connection, cutoff: float) -> None:
+    """Runs still 'running' after CHECK_RUN_STALE_S lost their worker (e.g. a restart); mark them failed."""
+    rows = conn.execute("SELECT run_id, path FROM runs WHERE state = 'running' AND created_ts < ?", (cutoff,)).fetchall()
+    for run_id, rel_path in rows:
+        if rel_path:
+            payload = _read_payload(os.path.join(root, rel_path))
+        else:
+            blob = conn.execute("SELECT data FROM run_payloads WHERE run_id = ?", (run_id,)).fetchone()
+            payload = json.loads(gzip.decompress(blob[0]).decode("utf-8")) if blob is not None else None
+        if payload is not None:
+            summary = payload.setdefault("summary", {})
+            summary["state"] = "failed"
+            summary["error"] = "run did not finish (stale)"
+            if rel_path:
+                _write_payload(os.path.join(root, rel_path), payload)
+            else:
+                conn.execute("UPDATE run_payloads SET data = ? WHERE run_id = ?", (_compress(payload), run_id))
+        conn.execute("UPDATE runs SET state = 'failed' WHERE run_id = ?", (run_id,))
+
+
+def prune_runs(now: Optional[float] = None) -> int:
+    """
+    Apply the retention policy: mark runs left 'running' for CHECK_RUN_STALE_S as failed, drop
+    runs older than CHECK_RUN_RETENTION_DAYS and keep at most CHECK_RUN_MAX_PER_TEMPLATE finished
+    runs per template. Returns the number of runs removed.
+    """
+    root = _primary_check_runs_dir()
+    now_ts = time.time() if now is None else now
+    removed = 0
+    with _connect(root) as conn:
+        if settings.CHECK_RUN_STALE_S > 0:
+            _fail_stale_runs(root, conn, now_ts - settings.CHECK_RUN_STALE_S)
+
+        days = settings.CHECK_RUN_RETENTION_DAYS
+        if days > 0:
+            cutoff = now_ts - timedelta(days=days).total_seconds()
+            rows = conn.execute("SELECT run_id, path FROM runs WHERE created_ts < ? AND state != 'running'", (cutoff,)).fetchall()
+            removed += _delete_rows(root, conn, rows)
+
+        max_per_template = settings.CHECK_RUN_MAX_PER_TEMPLATE
+        if max_per_template > 0:
+            over = conn.execute(
+                "SELECT template_id FROM runs WHERE state != 'running' GROUP BY template_id HAVING COUNT(*) > ?",
+                (max_per_template,),
+            ).fetchall()
+            for (tid,) in over:
+                rows = conn.execute(
+                    "SELECT run_id, path FROM runs WHERE template_id = ? AND state != 'running' "
+                    "ORDER BY created_ts DESC LIMIT -1 OFFSET ?",
+                    (tid, max_per_template),
+                ).fetchall()
+                removed += _delete_rows(root, conn, rows)
+    return removed
+
+
+def _maybe_prune(root: str) -> None:
+    global _last_prune_at
+    if settings.CHECK_RUN_RETENTION_DAYS <= 0 and settings.CHECK_RUN_MAX_PER_TEMPLATE <= 0 and settings.CHECK_RUN_STALE_S <= 0:
+        return
+    now = time.monotonic()
+    if now - _last_prune_at < settings.CHECK_RUN_PRUNE_INTERVAL_S:
+        return
+    if not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _last_prune_at = now
+        prune_runs()
+    finally:
+        _prune_lock.release()
@@ -10,7 +10,7 @@ from fastapi import HTTPException
 from app.models import GlobalPromptConfig, Ruleset, TemplateSnapshot
 from app.services.prompt_store import get_global_prompt_config, upsert_global_prompt_config
 from app.services.ruleset_store import get_ruleset, upsert_ruleset
-from app.services.template_store import get_template, get_latest_template, get_template_docx_path, upsert_template
+from app.services.template_store import get_latest_template, get_template, get_template_docx_path, get_template_meta, upsert_template
 
 
 def _sha256_bytes(data: bytes) -> str:
@@ -217,7 +217,7 @@ def import_skill_bundle(bundle_bytes: bytes, overwrite_same_version: bool = Fals
         if tpl.templateId != skill_id or tpl.version != skill_version:
             raise HTTPException(status_code=400, detail="templateId/version mismatch to manifest")
 
-        existing = get_template(skill_id, skill_version)
+        existing = get_template_meta(skill_id, skill_version)
         if existing is not None and not overwrite_same_version:
             raise HTTPException(status_code=409, detail="skill already exists (use overwriteSameVersion)")
 
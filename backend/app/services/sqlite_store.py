@@ -0,0 +1,287 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    template_id TEXT NOT NULL,
+    version TEXT NOT NULL,
+    name TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    updated_ts REAL NOT NULL,
+    PRIMARY KEY (template_id, version)
+);
+CREATE TABLE IF NOT EXISTS template_fingerprints (
+    template_id TEXT NOT NULL,
+    version TEXT NOT NULL,
+    outline TEXT NOT NULL,
+    tokens TEXT NOT NULL,
+    PRIMARY KEY (template_id, version)
+);
+CREATE TABLE IF NOT EXISTS rulesets (
+    template_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    updated_ts REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prompts (
+    template_id TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# The prompts table keeps GlobalPromptConfig.defaultPrompt under this key.
+_DEFAULT_PROMPT_KEY = ""
+
+
+def _store_dir() -> str:
+    root = os.getenv("DOC_COMPARISON_DATA_DIR", "").strip()
+    if root:
+        d = os.path.join(root, "store")
+    else:
+        app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        backend_dir = os.path.abspath(os.path.join(app_dir, ".."))
+        d = os.path.join(backend_dir, "data", "store")
+    os.makedirs(d, exist_ok=True)
+    return d
+
+
+def db_path() -> str:
+    return os.path.join(_store_dir(), "store.sqlite3")
+
+
+def _dumps(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+@contextmanager
+def _connect(bootstrap: bool = True) -> Iterator[sqlite3.Connection]:
+    """
+    One short-lived connection per call, like run_store. WAL lets readers in other workers proceed
+    while one writer commits; writers wait on SQLite's own lock (timeout) instead of a lock file.
+    """
+    conn = sqlite3.connect(db_path(), timeout=30.0)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        if bootstrap:
+            _bootstrap(conn)
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _bootstrap(conn: sqlite3.Connection) -> None:
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone() is not None:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone() is None:
+        _import_json_stores(conn)
+    conn.commit()
+
+
+def import_json_stores(replace: bool = False) -> Dict[str, int]:
+    """
+    Copy the JSON-file stores into the database. Runs once automatically when the SQLite backend
+    first opens an empty database (which also seeds the default ruleset); app.tools.import_sqlite_store
+    re-runs it on demand. Rows that already exist are kept unless replace is set.
+    """
+    with _connect(bootstrap=False) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        return _import_json_stores(conn, replace=replace)
+
+
+def _import_json_stores(conn: sqlite3.Connection, replace: bool = False) -> Dict[str, int]:
+    from app.services.prompt_store import read_json_prompt_config
+    from app.services.ruleset_store import read_json_rulesets
+    from app.services.template_store import read_json_templates
+
+    verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+    now = time.time()
+    counts = {"templates": 0, "rulesets": 0, "prompts": 0}
+    for t in read_json_templates():
+        cur = conn.execute(
+            f"{verb} INTO templates (template_id, version, name, signature, payload, updated_ts) VALUES (?, ?, ?, ?, ?, ?)",
+            (t["templateId"], t["version"], t.get("name") or t["templateId"], t.get("signature") or "", _dumps(t), now),
+        )
+        counts["templates"] += cur.rowcount
+    for rs in read_json_rulesets():
+        if not rs.get("templateId"):
+            continue
+        cur = conn.execute(
+            f"{verb} INTO rulesets (template_id, payload, updated_ts) VALUES (?, ?, ?)",
+            (rs["templateId"], _dumps(rs), now),
+        )
+        counts["rulesets"] += cur.rowcount
+    cfg = read_json_prompt_config()
+    prompts = {_DEFAULT_PROMPT_KEY: cfg.get("defaultPrompt") or ""}
+    prompts.update({k: v for k, v in (cfg.get("byTemplateId") or {}).items() if k})
+    for tid, prompt in prompts.items():
+        cur = conn.execute(f"{verb} INTO prompts (template_id, prompt) VALUES (?, ?)", (tid, prompt or ""))
+        counts["prompts"] += cur.rowcount
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported', ?)", (str(now),))
+    _bump_templates_revision(conn)
+    return counts
+
+
+def _bump_templates_revision(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('templates_rev', '1') "
+        "ON CONFLICT (key) DO UPDATE SET value = CAST(CAST(value AS INTEGER) + 1 AS TEXT)"
+    )
+
+
+def templates_revision() -> str:
+    """Changes whenever a template row is written, renamed or deleted."""
+    with _connect() as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'templates_rev'").fetchone()
+    return row[0] if row is not None else "0"
+
+
+def template_entries() -> List[Dict[str, Any]]:
+    with _connect() as conn:
+        rows = conn.execute("SELECT template_id, version, name, signature FROM templates").fetchall()
+    return [{"templateId": r[0], "version": r[1], "name": r[2], "signature": r[3]} for r in rows]
+
+
+def load_template(template_id: str, version: str) -> Optional[Dict[str, Any]]:
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT name, payload FROM templates WHERE template_id = ? AND version = ?", (template_id, version)
+        ).fetchone()
+    if row is None:
+        return None
+    payload = json.loads(row[1])
+    # The name column is authoritative, so renames only touch that column.
+    payload["name"] = row[0] or payload.get("name")
+    return payload
+
+
+def put_template(payload: Dict[str, Any], fingerprint: Optional[Dict[str, List[str]]] = None) -> None:
+    with _connect() as conn:
+        if fingerprint is not None:
+            _put_fingerprint(conn, payload["templateId"], payload["version"], fingerprint)
+        _bump_templates_revision(conn)
+        conn.execute(
+            "INSERT INTO templates (template_id, version, name, signature, payload, updated_ts) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (template_id, version) DO UPDATE SET "
+            "name = excluded.name, signature = excluded.signature, payload = excluded.payload, updated_ts = excluded.updated_ts",
+            (
+                payload["templateId"],
+                payload["version"],
+                payload.get("name") or payload["templateId"],
+                payload.get("signature") or "",
+                _dumps(payload),
+                time.time(),
+            ),
+        )
+
+
+def rename_template(template_id: str, name: str) -> bool:
+    with _connect() as conn:
+        matched = conn.execute("SELECT 1 FROM templates WHERE template_id = ? LIMIT 1", (template_id,)).fetchone()
+        if matched is None:
+            return False
+        cur = conn.execute("UPDATE templates SET name = ? WHERE template_id = ? AND name != ?", (name, template_id, name))
+        if cur.rowcount:
+            _bump_templates_revision(conn)
+    return True
+
+
+def delete_templates(template_id: str) -> bool:
+    with _connect() as conn:
+        cur = conn.execute("DELETE FROM templates WHERE template_id = ?", (template_id,))
+        conn.execute("DELETE FROM template_fingerprints WHERE template_id = ?", (template_id,))
+        if cur.rowcount:
+            _bump_templates_revision(conn)
+    return cur.rowcount > 0
+
+
+def _put_fingerprint(conn: sqlite3.Connection, template_id: str, version: str, fingerprint: Dict[str, List[str]]) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO template_fingerprints (template_id, version, outline, tokens) VALUES (?, ?, ?, ?)",
+        (template_id, version, _dumps(fingerprint.get("outline") or []), _dumps(fingerprint.get("tokens") or [])),
+    )
+
+
+def backfill_fingerprint(template_id: str, version: str, signature: str, fingerprint: Dict[str, List[str]]) -> None:
+    """
+    Store a fingerprint computed from a template row read earlier. One statement, so it only lands
+    while that row still exists with the same signature, and never replaces one put_template wrote.
+    """
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO template_fingerprints (template_id, version, outline, tokens) "
+            "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM templates WHERE template_id = ? AND version = ? AND signature = ?)",
+            (
+                template_id,
+                version,
+                _dumps(fingerprint.get("outline") or []),
+                _dumps(fingerprint.get("tokens") or []),
+                template_id,
+                version,
+                signature,
+            ),
+        )
+
+
+def template_fingerprints() -> Dict[Tuple[str, str], Dict[str, List[str]]]:
+    with _connect() as conn:
+        rows = conn.execute("SELECT template_id, version, outline, tokens FROM template_fingerprints").fetchall()
+    return {(r[0], r[1]): {"outline": json.loads(r[2]), "tokens": json.loads(r[3])} for r in rows}
+
+
+def list_rulesets() -> List[Dict[str, Any]]:
+    with _connect() as conn:
+        rows = conn.execute("SELECT payload FROM rulesets ORDER BY rowid").fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+
+def get_ruleset(template_id: str) -> Optional[Dict[str, Any]]:
+    with _connect() as conn:
+        row = conn.execute("SELECT payload FROM rulesets WHERE template_id = ?", (template_id,)).fetchone()
+    return json.loads(row[0]) if row is not None else None
+
+
+def put_ruleset(payload: Dict[str, Any]) -> None:
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO rulesets (template_id, payload, updated_ts) VALUES (?, ?, ?) "
+            "ON CONFLICT (template_id) DO UPDATE SET payload = excluded.payload, updated_ts = excluded.updated_ts",
+            (payload["templateId"], _dumps(payload), time.time()),
+        )
+
+
+def delete_ruleset(template_id: str) -> None:
+    with _connect() as conn:
+        conn.execute("DELETE FROM rulesets WHERE template_id = ?", (template_id,))
+
+
+def get_prompt_config() -> Dict[str, Any]:
+    with _connect() as conn:
+        rows = conn.execute("SELECT template_id, prompt FROM prompts").fetchall()
+    by_id = {tid: prompt for tid, prompt in rows if tid != _DEFAULT_PROMPT_KEY}
+    default = next((prompt for tid, prompt in rows if tid == _DEFAULT_PROMPT_KEY), "")
+    return {"defaultPrompt": default, "byTemplateId": by_id}
+
+
+def put_prompt_config(payload: Dict[str, Any]) -> None:
+    rows = {_DEFAULT_PROMPT_KEY: payload.get("defaultPrompt") or ""}
+    rows.update({k: v or "" for k, v in (payload.get("byTemplateId") or {}).items() if k})
+    with _connect() as conn:
+        conn.execute("DELETE FROM prompts WHERE template_id NOT IN (%s)" % ",".join("?" * len(rows)), list(rows))
+        conn.executemany(
+            "INSERT INTO prompts (template_id, prompt) VALUES (?, ?) "
+            "ON CONFLICT (template_id) DO UPDATE SET prompt = excluded.prompt WHERE prompt != excluded.prompt",
+            list(rows.items()),
+        )
@@ -0,0 +1,56 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+def file_key(path: str) -> Tuple[int, int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class FileCache:
+    """
+    Parsed file contents keyed by path. Every get() stats the file and reuses the parsed value
+    while (mtime, size, inode) is unchanged, so steady-state reads skip both the read and the
+    pydantic validation; writes through os.replace always change the inode. Cached values are
+    shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int, int], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, load: Callable[[str], T]) -> T:
+        if not settings.STORE_CACHE_ENABLED:
+            return load(path)
+        try:
+            key = file_key(path)
+        except FileNotFoundError:
+            self.invalidate(path)
+            raise
+        with self._lock:
+            hit = self._entries.get(path)
+            if hit is not None and hit[0] == key:
+                self._entries.move_to_end(path)
+                return hit[1]
+        value = load(path)
+        with self._lock:
+            self._entries[path] = (key, value)
+            self._entries.move_to_end(path)
+            limit = self.max_entries
+            while limit is not None and len(self._entries) > max(1, limit):
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
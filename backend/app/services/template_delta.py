@@ -0,0 +1,83 @@
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+from app.models import Block
+from app.services.diff_service import get_align_key
+
+
+# blockId and structurePath carry the block's position (b_0007, body.p[12]), so one inserted clause
+# renumbers every block after it. A copy op may shift that last number instead of patching each block.
+_POSITIONAL = ("blockId", "structurePath")
+_LAST_INT = re.compile(r"(\d+)(?!.*\d)")
+
+
+def _last_int(s: str) -> Optional[int]:
+    m = _LAST_INT.search(s or "")
+    return int(m.group(1)) if m else None
+
+
+def _shift(s: str, d: int) -> str:
+    return _LAST_INT.sub(lambda m: str(int(m.group(1)) + d).zfill(len(m.group(1))), s, count=1)
+
+
+def _shifted(d: Dict[str, Any], shift: int) -> Dict[str, Any]:
+    return {**d, **{k: _shift(d[k], shift) for k in _POSITIONAL}} if shift else d
+
+
+def encode_delta(base: List[Block], blocks: List[Block]) -> List[Dict[str, Any]]:
+    """
+    Block-level delta from base to blocks. Blocks are aligned the way align_blocks does it (align
+    keys, i.e. stableKey with section numbers ignored) and the result is a list of ops:
+    {"copy": [i, n, shift]} reuses base[i:i + n] with the positional numbers moved by shift,
+    {"patch": i, "set": {...}} is base[i] with the listed fields replaced, {"insert": [...]} carries
+    whole blocks.
+    """
+    base_dumps = [b.model_dump() for b in base]
+    ops: List[Dict[str, Any]] = []
+
+    def _put(i: int, block: Block) -> None:
+        d = block.model_dump()
+        a, b = _last_int(d["blockId"]), _last_int(base_dumps[i]["blockId"])
+        shift = a - b if a is not None and b is not None else 0
+        if d != _shifted(base_dumps[i], shift):
+            ops.append({"patch": i, "set": {k: v for k, v in d.items() if v != base_dumps[i].get(k)}})
+            return
+        last = ops[-1].get("copy") if ops else None
+        if last is not None and last[0] + last[1] == i and last[2] == shift:
+            last[1] += 1
+        else:
+            ops.append({"copy": [i, 1, shift]})
+
+    def _insert(block: Block) -> None:
+        if ops and "insert" in ops[-1]:
+            ops[-1]["insert"].append(block.model_dump())
+        else:
+            ops.append({"insert": [block.model_dump()]})
+
+    sm = SequenceMatcher(None, [get_align_key(b, True) for b in base], [get_align_key(b, True) for b in blocks], autojunk=False)
+    for tag, i1, i2, j1, j2 in sm.get_opcodes():
+        # A replaced run pairs up positionally: an edited clause usually keeps its place.
+        paired = min(i2 - i1, j2 - j1) if tag in ("equal", "replace") else 0
+        for k in range(paired):
+            _put(i1 + k, blocks[j1 + k])
+        for j in range(j1 + paired, j2):
+            _insert(blocks[j])
+    return ops
+
+
+def apply_delta(base: List[Block], ops: List[Dict[str, Any]]) -> List[Block]:
+    """Rebuild the blocks encode_delta was given. Unshifted copies are the base's own Block objects."""
+    out: List[Block] = []
+    for op in ops:
+        if "copy" in op:
+            i, n, shift = op["copy"]
+            if not shift:
+                out.extend(base[i : i + n])
+            else:
+                out.extend(b.model_copy(update={k: _shift(getattr(b, k), shift) for k in _POSITIONAL}) for b in base[i : i + n])
+        elif "patch" in op:
+            out.append(Block.model_validate({**base[op["patch"]].model_dump(), **op["set"]}))
+        else:
+            out.extend(Block.model_validate(x) for x in op["insert"])
+    return out
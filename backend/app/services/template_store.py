@@ -1,58 +1,26 @@
 import hashlib
+import heapq
 import json
 import os
 import re
-import time
-from contextlib import contextmanager
+import shutil
+import threading
+from collections import Counter
 from difflib import SequenceMatcher
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
-from app.models import Block, TemplateSnapshot, TemplateListItem, TemplateMatchItem, TemplateMatchResponse
+from app.models import Block, TemplateMeta, TemplateSnapshot, TemplateListItem, TemplateMatchItem, TemplateMatchResponse
 from app.core.config import settings
 from app.services.ruleset_store import delete_ruleset, get_ruleset, upsert_ruleset
+from app.services import blob_store, sqlite_store
+from app.services.doc_service import DocService
+from app.services.file_lock import exclusive_lock, shared_lock
+from app.services.journal import JournaledMap
+from app.services.store_cache import FileCache
+from app.services.template_delta import apply_delta, encode_delta
 from app.utils.text_utils import get_leading_section_label, normalize_text, strip_section_noise
 
 
-def _lock_path(target_path: str) -> str:
-    return target_path + ".lock"
-
-
-@contextmanager
-def _exclusive_lock(target_path: str, timeout_s: float = 10.0, stale_s: float = 60.0):
-    lock_path = _lock_path(target_path)
-    start = time.monotonic()
-    acquired = False
-    fd = None
-    while True:
-        try:
-            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_RDWR)
-            acquired = True
-            break
-        except FileExistsError:
-            try:
-                age = time.time() - os.path.getmtime(lock_path)
-                if age > stale_s:
-                    os.remove(lock_path)
-                    continue
-            except Exception:
-                pass
-            if time.monotonic() - start >= timeout_s:
-                raise RuntimeError(f"timeout acquiring lock: {lock_path}")
-            time.sleep(0.05)
-    try:
-        yield
-    finally:
-        try:
-            if fd is not None:
-                os.close(fd)
-        finally:
-            if acquired:
-                try:
-                    os.remove(lock_path)
-                except Exception:
-                    pass
-
-
 def _sha1(text: str) -> str:
     return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
@@ -100,25 +68,40 @@ def _safe_segment(s: str) -> str:
     return re.sub(r"[^a-zA-Z0-9._-]+", "_", (s or "").strip())
 
 
+def _asset_ref(template_id: str, version: str) -> str:
+    return f"template/{_safe_segment(template_id)}/{_safe_segment(version)}"
+
+
 def get_template_docx_path(template_id: str, version: str) -> Optional[str]:
-    root = _assets_root_dir()
-    p = os.path.join(root, _safe_segment(template_id), _safe_segment(version), "template.docx")
+    p = blob_store.get_ref(_asset_ref(template_id, version))
+    if p is not None:
+        return p
+    # Written before the blob store; replaced by a ref on the next save of that version.
+    p = os.path.join(_assets_root_dir(), _safe_segment(template_id), _safe_segment(version), "template.docx")
     return p if os.path.exists(p) else None
 
 
 def save_template_docx(template_id: str, version: str, data: bytes) -> str:
-    root = _assets_root_dir()
-    d = os.path.join(root, _safe_segment(template_id), _safe_segment(version))
-    os.makedirs(d, exist_ok=True)
-    p = os.path.join(d, "template.docx")
-    tmp = p + ".tmp"
-    with open(tmp, "wb") as f:
-        f.write(data)
-    os.replace(tmp, p)
+    """Stores the .docx once per distinct content; versions and bundles with the same bytes share a blob."""
+    p = blob_store.put_ref(_asset_ref(template_id, version), data)
+    _remove_legacy_assets(template_id, version)
     return p
 
 
+def _remove_legacy_assets(template_id: str, version: Optional[str] = None) -> None:
+    d = os.path.join(_assets_root_dir(), _safe_segment(template_id))
+    if version is None:
+        shutil.rmtree(d, ignore_errors=True)
+        return
+    shutil.rmtree(os.path.join(d, _safe_segment(version)), ignore_errors=True)
+    try:
+        os.rmdir(d)
+    except OSError:
+        pass
+
+
 def _templates_file_path() -> str:
+    """The pre-sharding single-file store; only read by the migration in ensure_templates_file."""
     store_dir = _store_dir()
     return os.path.join(store_dir, "templates.json")
 
@@ -132,27 +115,168 @@ def _default_templates_payload() -> Dict[str, Any]:
     return {"templates": []}
 
 
+def _templates_dir() -> str:
+    d = os.path.join(_store_dir(), "templates")
+    os.makedirs(d, exist_ok=True)
+    return d
+
+
+def _index_file_path() -> str:
+    return os.path.join(_templates_dir(), "index.json")
+
+
+def _shard_rel_path(template_id: str, version: str) -> str:
+    return os.path.join(_safe_segment(template_id), _safe_segment(version) + ".json")
+
+
+def _fingerprint_rel_path(template_id: str, version: str) -> str:
+    return os.path.join(_safe_segment(template_id), "_fp", _safe_segment(version) + ".json")
+
+
+def _write_json(path: str, payload: Any) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _index_entry(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "templateId": item.get("templateId"),
+        "version": item.get("version"),
+        "name": item.get("name"),
+        "signature": item.get("signature"),
+        "path": _shard_rel_path(str(item.get("templateId") or ""), str(item.get("version") or "")),
+        **({"base": item["baseVersion"], "depth": item.get("deltaDepth") or 1} if item.get("baseVersion") else {}),
+    }
+
+
+def _migrate_monolithic(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    root = _templates_dir()
+    entries: List[Dict[str, Any]] = []
+    for x in items:
+        if not x.get("templateId") or not x.get("version"):
+            continue
+        entry = _index_entry(x)
+        _write_json(os.path.join(root, entry["path"]), x)
+        entries = [e for e in entries if not (e["templateId"] == entry["templateId"] and e["version"] == entry["version"])]
+        entries.append(entry)
+    return {"templates": entries}
+
+
 def ensure_templates_file() -> None:
-    path = _templates_file_path()
+    """
+    Templates live in one file per (templateId, version) under store/templates/, listed by
+    store/templates/index.json. A store still holding the old single templates.json (or the
+    legacy app/templates.json) is split into shards once; the old file is kept as templates.json.bak.
+    """
+    path = _index_file_path()
     if os.path.exists(path):
         return
-    with _exclusive_lock(path):
+    with exclusive_lock(path):
         if os.path.exists(path):
             return
-        legacy = _legacy_templates_file_path()
-        if legacy != path and os.path.exists(legacy):
-            with open(legacy, "r", encoding="utf-8") as f:
+        for source in (_templates_file_path(), _legacy_templates_file_path()):
+            if not os.path.exists(source):
+                continue
+            with open(source, "r", encoding="utf-8") as f:
                 payload = json.load(f)
-            tmp = path + ".tmp"
-            with open(tmp, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
-            os.replace(tmp, path)
+            _write_json(path, _migrate_monolithic(payload.get("templates", [])))
+            if source == _templates_file_path():
+                os.replace(source, source + ".bak")
             return
-        payload = _default_templates_payload()
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, path)
+        _write_json(path, _default_templates_payload())
+
+
+def _entry_key(template_id: str, version: str) -> str:
+    return f"{template_id}/{version}"
+
+
+def _load_index_snapshot(payload: Dict[str, Any]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for e in payload.get("templates", []):
+        if e.get("templateId") and e.get("version"):
+            out[_entry_key(e["templateId"], e["version"])] = e
+    return out
+
+
+# index.json is the snapshot; upserts, renames and deletes append to index.json.journal.
+_index_journal = JournaledMap(_load_index_snapshot, lambda items: {"templates": list(items.values())})
+_shard_cache = FileCache(max_entries=settings.STORE_CACHE_MAX_TEMPLATES)
+
+
+def _use_sqlite() -> bool:
+    return settings.STORE_BACKEND == "sqlite"
+
+
+def _read_index() -> List[Dict[str, Any]]:
+    if _use_sqlite():
+        return sqlite_store.template_entries()
+    ensure_templates_file()
+    return [dict(e) for e in _index_journal.items(_index_file_path()).values()]
+
+
+def _parse_shard(path: str) -> Optional[TemplateSnapshot]:
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    try:
+        if "delta" not in payload:
+            return TemplateSnapshot.model_validate(payload)
+        # Stored as a delta against another version of the same template (see _encode_shard).
+        base_path = os.path.join(os.path.dirname(path), _safe_segment(payload.pop("baseVersion")) + ".json")
+        base = _shard_cache.get(base_path, _parse_shard)
+        if base is None:
+            return None
+        payload.pop("deltaDepth", None)
+        payload["blocks"] = apply_delta(base.blocks, payload.pop("delta"))
+        return TemplateSnapshot.model_validate(payload)
+    except Exception:
+        return None
+
+
+def _load_shard(entry: Dict[str, Any]) -> Optional[TemplateSnapshot]:
+    if _use_sqlite():
+        payload = sqlite_store.load_template(entry["templateId"], entry["version"])
+        try:
+            return TemplateSnapshot.model_validate(payload) if payload is not None else None
+        except Exception:
+            return None
+    return _load_json_shard(entry)
+
+
+def _load_json_shard(entry: Dict[str, Any]) -> Optional[TemplateSnapshot]:
+    try:
+        t = _shard_cache.get(os.path.join(_templates_dir(), entry["path"]), _parse_shard)
+    except FileNotFoundError:
+        return None
+    if t is None:
+        return None
+    # The index is authoritative for names, so renames only rewrite the index. Deep, so callers
+    # editing blocks cannot reach the cached snapshot (or the base a delta version shares blocks with).
+    return t.model_copy(update={"name": entry.get("name") or t.name}, deep=True)
+
+
+def read_json_templates() -> List[Dict[str, Any]]:
+    """Raw template payloads from the JSON store, index names applied; used by the SQLite import."""
+    ensure_templates_file()
+    out: List[Dict[str, Any]] = []
+    # Shared with other readers, but keeps writers from changing the index between shard reads.
+    with shared_lock(_index_file_path()):
+        for e in _index_journal.items(_index_file_path()).values():
+            t = _load_json_shard(e)
+            if t is not None:
+                out.append(t.model_dump())
+    return out
+
+
+def _latest_entries(entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    latest: Dict[str, Dict[str, Any]] = {}
+    for e in entries:
+        prev = latest.get(e["templateId"])
+        if prev is None or e["version"] > prev["version"]:
+            latest[e["templateId"]] = e
+    return latest
 
 
 def _block_token(b: Block) -> str:
@@ -187,7 +311,7 @@ def _outline_token(text: str) -> str:
     return s[:80]
 
 
-def _extract_outline_tokens(blocks: List[Block], limit: int = 60) -> List[str]:
+def _extract_outline_tokens(blocks: Iterable[Block], limit: int = 60) -> List[str]:
     out: List[str] = []
     for idx, b in enumerate(blocks):
         if len(out) >= limit:
@@ -208,44 +332,31 @@ def _extract_outline_tokens(blocks: List[Block], limit: int = 60) -> List[str]:
     return out
 
 
-def _latest_templates_by_id() -> List[TemplateSnapshot]:
-    latest_by_id: Dict[str, TemplateSnapshot] = {}
-    for t in list_templates():
-        prev = latest_by_id.get(t.templateId)
-        if prev is None or t.version > prev.version:
-            latest_by_id[t.templateId] = t
-    return list(latest_by_id.values())
-
-
 def list_templates() -> List[TemplateSnapshot]:
-    ensure_templates_file()
-    path = _templates_file_path()
-    with open(path, "r", encoding="utf-8") as f:
-        payload = json.load(f)
-    items = payload.get("templates", [])
     out: List[TemplateSnapshot] = []
-    for x in items:
-        try:
-            out.append(TemplateSnapshot.model_validate(x))
-        except Exception:
-            continue
+    for e in _read_index():
+        t = _load_shard(e)
+        if t is not None:
+            out.append(t)
     return out
 
 
 def list_template_index() -> List[TemplateListItem]:
+    """Built from the index alone; no template file is opened."""
     by_id: Dict[str, TemplateListItem] = {}
     best_name_by_id: Dict[str, Tuple[str, str]] = {}
-    for t in list_templates():
-        item = by_id.get(t.templateId)
+    for e in _read_index():
+        tid, version, name = e["templateId"], e["version"], e.get("name") or ""
+        item = by_id.get(tid)
         if item is None:
-            item = TemplateListItem(templateId=t.templateId, name=t.name, versions=[])
-            by_id[t.templateId] = item
-        if t.version not in item.versions:
-            item.versions.append(t.version)
-        if t.name:
-            prev = best_name_by_id.get(t.templateId)
-            if prev is None or t.version > prev[0]:
-                best_name_by_id[t.templateId] = (t.version, t.name)
+            item = TemplateListItem(templateId=tid, name=name, versions=[])
+            by_id[tid] = item
+        if version not in item.versions:
+            item.versions.append(version)
+        if name:
+            prev = best_name_by_id.get(tid)
+            if prev is None or version > prev[0]:
+                best_name_by_id[tid] = (version, name)
     out = list(by_id.values())
     for x in out:
         best = best_name_by_id.get(x.templateId)
@@ -257,10 +368,38 @@ def list_template_index() -> List[TemplateListItem]:
     return out
 
 
+def _meta(entry: Dict[str, Any]) -> TemplateMeta:
+    return TemplateMeta(
+        templateId=entry["templateId"],
+        name=entry.get("name") or entry["templateId"],
+        version=entry["version"],
+        signature=entry.get("signature") or "",
+    )
+
+
+def get_template_meta(template_id: str, version: Optional[str] = None) -> Optional[TemplateMeta]:
+    """Metadata of one version (the latest when version is None), read from the index without loading blocks."""
+    entries = _read_index()
+    if version is None:
+        e = _latest_entries(entries).get(template_id)
+        return _meta(e) if e is not None else None
+    for e in entries:
+        if e["templateId"] == template_id and e["version"] == version:
+            return _meta(e)
+    return None
+
+
+def get_template_list_item(template_id: str) -> Optional[TemplateListItem]:
+    for item in list_template_index():
+        if item.templateId == template_id:
+            return item
+    return None
+
+
 def get_template(template_id: str, version: str) -> Optional[TemplateSnapshot]:
-    for t in list_templates():
-        if t.templateId == template_id and t.version == version:
-            return t
+    for e in _read_index():
+        if e["templateId"] == template_id and e["version"] == version:
+            return _load_shard(e)
     return None
 
 
@@ -268,50 +407,69 @@ def upsert_template(snapshot: TemplateSnapshot) -> None:
     snapshot.templateId = _validate_template_id(snapshot.templateId)
     snapshot.version = _validate_version(snapshot.version)
     snapshot.name = (snapshot.name or "").strip() or snapshot.templateId
+    payload = snapshot.model_dump()
+    fingerprint = _fingerprint(snapshot.blocks)
+    if _use_sqlite():
+        sqlite_store.put_template(payload, fingerprint=fingerprint)
+        return
     ensure_templates_file()
-    path = _templates_file_path()
-    with _exclusive_lock(path):
-        with open(path, "r", encoding="utf-8") as f:
-            payload = json.load(f)
-        items = payload.get("templates", [])
-        replaced = False
-        for i, x in enumerate(items):
-            if x.get("templateId") == snapshot.templateId and x.get("version") == snapshot.version:
-                items[i] = snapshot.model_dump()
-                replaced = True
-                break
-        if not replaced:
-            items.append(snapshot.model_dump())
-        payload["templates"] = items
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, path)
+    path = _index_file_path()
+    with exclusive_lock(path):
+        others = [e for e in _read_index() if e["templateId"] == snapshot.templateId and e["version"] != snapshot.version]
+        changes = _materialize_dependents(snapshot.version, others)
+        shard = _encode_shard(payload, snapshot.blocks, others)
+        entry = _index_entry(shard)
+        _write_json(os.path.join(_templates_dir(), entry["path"]), shard)
+        _write_json(os.path.join(_templates_dir(), _fingerprint_rel_path(snapshot.templateId, snapshot.version)), fingerprint)
+        changes.append((_entry_key(snapshot.templateId, snapshot.version), entry))
+        _index_journal.apply(path, changes, locked=True)
+
+
+# A version is stored as a delta against the template's latest version unless that would make a
+# chain of more than _DELTA_MAX_CHAIN deltas, or the delta exceeds _DELTA_MAX_RATIO of the full
+# block list; such versions are written in full and start a new chain.
+_DELTA_MAX_CHAIN = 10
+_DELTA_MAX_RATIO = 0.5
+
+
+def _encode_shard(payload: Dict[str, Any], blocks: List[Block], others: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Shard payload for a new version, full or delta-encoded. Caller holds exclusive_lock on the index."""
+    base_entry = _latest_entries(others).get(payload["templateId"])
+    if base_entry is None or int(base_entry.get("depth") or 0) >= _DELTA_MAX_CHAIN:
+        return payload
+    base = _load_json_shard(base_entry)
+    if base is None:
+        return payload
+    delta = encode_delta(base.blocks, blocks)
+    if len(json.dumps(delta, ensure_ascii=False)) > _DELTA_MAX_RATIO * len(json.dumps(payload["blocks"], ensure_ascii=False)):
+        return payload
+    shard = {k: v for k, v in payload.items() if k != "blocks"}
+    shard["baseVersion"] = base_entry["version"]
+    shard["deltaDepth"] = int(base_entry.get("depth") or 0) + 1
+    shard["delta"] = delta
+    return shard
+
+
+def _materialize_dependents(version: str, others: List[Dict[str, Any]]) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+    """Before a version is overwritten, rewrite the deltas based on it as full versions; returns their index changes."""
+    changes: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+    for e in others:
+        if e.get("base") != version:
+            continue
+        t = _load_json_shard(e)
+        if t is None:
+            continue
+        full = t.model_dump()
+        _write_json(os.path.join(_templates_dir(), e["path"]), full)
+        changes.append((_entry_key(e["templateId"], e["version"]), {**_index_entry(full), "name": e.get("name")}))
+    return changes
 
 
 def rename_template(template_id: str, name: str) -> bool:
-    ensure_templates_file()
-    path = _templates_file_path()
-    with _exclusive_lock(path):
-        with open(path, "r", encoding="utf-8") as f:
-            payload = json.load(f)
-        items = payload.get("templates", [])
-        matched = False
-        changed = False
-        for i, x in enumerate(items):
-            if x.get("templateId") != template_id:
-                continue
-            matched = True
-            if x.get("name") != name:
-                x["name"] = name
-                items[i] = x
-                changed = True
-        if changed:
-            payload["templates"] = items
-            tmp = path + ".tmp"
-            with open(tmp, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
-            os.replace(tmp, path)
+    if _use_sqlite():
+        matched = sqlite_store.rename_template(template_id, name)
+    else:
+        matched = _rename_json_template(template_id, name)
     if matched:
         rs = get_ruleset(template_id)
         if rs is not None and rs.name != name:
@@ -320,53 +478,224 @@ def rename_template(template_id: str, name: str) -> bool:
     return matched
 
 
+def _rename_json_template(template_id: str, name: str) -> bool:
+    ensure_templates_file()
+    path = _index_file_path()
+    with exclusive_lock(path):
+        entries = [e for e in _read_index() if e["templateId"] == template_id]
+        changes = [(_entry_key(template_id, e["version"]), {**e, "name": name}) for e in entries if e.get("name") != name]
+        _index_journal.apply(path, changes, locked=True)
+    return bool(entries)
+
+
 def delete_template(template_id: str) -> bool:
+    if _use_sqlite():
+        if not sqlite_store.delete_templates(template_id):
+            return False
+        _delete_assets(template_id)
+        delete_ruleset(template_id)
+        return True
     ensure_templates_file()
-    path = _templates_file_path()
-    with _exclusive_lock(path):
-        with open(path, "r", encoding="utf-8") as f:
-            payload = json.load(f)
-        items = payload.get("templates", [])
-        next_items = [x for x in items if x.get("templateId") != template_id]
-        if len(next_items) == len(items):
+    path = _index_file_path()
+    with exclusive_lock(path):
+        entries = _read_index()
+        removed = [e for e in entries if e["templateId"] == template_id]
+        if not removed:
             return False
-        payload["templates"] = next_items
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, path)
+        _index_journal.apply(path, [(_entry_key(template_id, e["version"]), None) for e in removed], locked=True)
+        for e in removed:
+            for rel in (e["path"], _fingerprint_rel_path(template_id, e["version"])):
+                try:
+                    os.remove(os.path.join(_templates_dir(), rel))
+                except FileNotFoundError:
+                    pass
+        for d in ("_fp", ""):
+            try:
+                os.rmdir(os.path.join(_templates_dir(), _safe_segment(template_id), d))
+            except OSError:
+                pass
+    _delete_assets(template_id)
     delete_ruleset(template_id)
     return True
 
 
+def _delete_assets(template_id: str) -> None:
+    blob_store.release_refs(f"template/{_safe_segment(template_id)}/")
+    _remove_legacy_assets(template_id)
+
+
 def get_latest_template(template_id: str) -> Optional[TemplateSnapshot]:
-    candidates = [t for t in list_templates() if t.templateId == template_id]
-    if not candidates:
-        return None
-    candidates.sort(key=lambda x: x.version)
-    return candidates[-1]
+    e = _latest_entries(_read_index()).get(template_id)
+    return _load_shard(e) if e is not None else None
+
+
+def _fingerprint(blocks: List[Block]) -> Dict[str, List[str]]:
+    _, tokens = compute_signature(blocks)
+    return {"outline": _extract_outline_tokens(blocks), "tokens": tokens}
+
+
+def _load_fingerprints(entries: List[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, List[str]]]:
+    """
+    Fingerprints are written by upsert_template; versions stored before they existed are
+    computed from their shard once and written back.
+    """
+    if _use_sqlite():
+        found = sqlite_store.template_fingerprints()
+    else:
+        found = {}
+        for e in entries:
+            try:
+                path = os.path.join(_templates_dir(), _fingerprint_rel_path(e["templateId"], e["version"]))
+                found[(e["templateId"], e["version"])] = _fingerprint_cache.get(path, _parse_fingerprint)
+            except FileNotFoundError:
+                pass
+    out: Dict[Tuple[str, str], Dict[str, List[str]]] = {}
+    for e in entries:
+        key = (e["templateId"], e["version"])
+        fp = found.get(key)
+        if fp is None:
+            t = _load_shard(e)
+            if t is None:
+                continue
+            fp = _fingerprint(t.blocks)
+            _backfill_fingerprint(e, fp)
+        out[key] = fp
+    return out
+
+
+def _backfill_fingerprint(entry: Dict[str, Any], fp: Dict[str, List[str]]) -> None:
+    """Written back only if the version is still the one fp was computed from (a save or delete may have raced)."""
+    if _use_sqlite():
+        sqlite_store.backfill_fingerprint(entry["templateId"], entry["version"], entry.get("signature") or "", fp)
+        return
+    path = _index_file_path()
+    fp_path = os.path.join(_templates_dir(), _fingerprint_rel_path(entry["templateId"], entry["version"]))
+    with exclusive_lock(path):
+        if _index_journal.items(path).get(_entry_key(entry["templateId"], entry["version"])) != entry:
+            return
+        if os.path.exists(fp_path):
+            return
+        _write_json(fp_path, fp)
+
+
+def _parse_fingerprint(path: str) -> Dict[str, List[str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+_fingerprint_cache = FileCache()
+
+
+class _TokenIndex:
+    """
+    Inverted index over token sequences. For a target it scores only the sequences that can still
+    reach the top k: 2 * |multiset overlap| / (len(a) + len(b)) bounds SequenceMatcher.ratio() from
+    above, so candidates are scored in bound order and the scan stops once the bound drops below the
+    k-th best exact score. The result is the same top k as scoring everything.
+    """
+
+    def __init__(self, seqs: List[Optional[List[str]]]):
+        self.seqs = seqs
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for i, seq in enumerate(seqs):
+            if seq is None:
+                continue
+            for tok, n in Counter(seq).items():
+                self.postings.setdefault(tok, []).append((i, n))
+
+    def top(self, target: Sequence[str], k: int) -> List[Tuple[float, int]]:
+        overlap: Dict[int, int] = {}
+        for tok, c in Counter(target).items():
+            for i, n in self.postings.get(tok, ()):
+                overlap[i] = overlap.get(i, 0) + min(c, n)
+        bounds: List[Tuple[float, int]] = []
+        for i, seq in enumerate(self.seqs):
+            if seq is None:
+                continue
+            denom = len(seq) + len(target)
+            bounds.append((2.0 * overlap.get(i, 0) / denom if denom else 1.0, i))
+        bounds.sort(key=lambda x: (-x[0], x[1]))
+        best: List[Tuple[float, int]] = []
+        for bound, i in bounds:
+            if len(best) >= k and bound < best[0][0]:
+                break
+            score = SequenceMatcher(None, self.seqs[i], list(target)).ratio()
+            if len(best) < k:
+                heapq.heappush(best, (score, -i))
+            elif (score, -i) > best[0]:
+                heapq.heapreplace(best, (score, -i))
+        return sorted(((score, -neg) for score, neg in best), key=lambda x: (-x[0], x[1]))
+
+
+class _MatchIndex:
+    def __init__(self, items: List[Tuple[Dict[str, Any], Dict[str, List[str]]]]):
+        self.entries = [e for e, _ in items]
+        self.outline = _TokenIndex([fp["outline"] if len(fp.get("outline") or []) >= 2 else None for _, fp in items])
+        self.tokens = _TokenIndex([list(fp.get("tokens") or []) for _, fp in items])
+
+    def item(self, i: int, score: float) -> TemplateMatchItem:
+        e = self.entries[i]
+        return TemplateMatchItem(templateId=e["templateId"], name=e.get("name") or "", version=e["version"], score=float(score))
+
+
+_match_index_lock = threading.Lock()
+_match_index_state: Dict[str, Any] = {"revision": None, "index": None}
+
+
+def _templates_revision() -> Tuple[Any, ...]:
+    if _use_sqlite():
+        return ("sqlite", sqlite_store.db_path(), sqlite_store.templates_revision())
+    ensure_templates_file()
+    return ("json",) + _index_journal.revision(_index_file_path())
+
+
+def _match_index() -> _MatchIndex:
+    """Rebuilt only when the template index changes (upsert, rename, delete)."""
+    revision = _templates_revision()
+    with _match_index_lock:
+        if _match_index_state["revision"] == revision:
+            return _match_index_state["index"]
+    latest = list(_latest_entries(_read_index()).values())
+    fingerprints = _load_fingerprints(latest)
+    index = _MatchIndex([(e, fingerprints[(e["templateId"], e["version"])]) for e in latest if (e["templateId"], e["version"]) in fingerprints])
+    with _match_index_lock:
+        _match_index_state["revision"] = revision
+        _match_index_state["index"] = index
+    return index
 
 
 def match_templates(blocks: List[Block], top_n: int = 5) -> TemplateMatchResponse:
-    latest_templates = _latest_templates_by_id()
+    index = _match_index()
+    k = max(1, int(top_n))
+
+    outline_match = _match_outline(index, _extract_outline_tokens(blocks), k)
+    if outline_match is not None:
+        return outline_match
+
+    _, target_tokens = compute_signature(blocks)
+    candidates = [index.item(i, score) for score, i in index.tokens.top(target_tokens, k)]
+    best = candidates[0] if candidates else None
+    return TemplateMatchResponse(best=best, candidates=candidates)
 
-    target_outline = _extract_outline_tokens(blocks)
-    outline_candidates: List[TemplateMatchItem] = []
+
+def match_templates_docx(path: str, top_n: int = 5) -> TemplateMatchResponse:
+    """
+    match_templates for a .docx on disk. The outline decides most matches and only needs the
+    first outline entries, so the document is read with DocService.iter_outline_blocks, which
+    stops once _extract_outline_tokens has enough; the full parse only runs when the outline is
+    not conclusive and the signature tokens are needed; it reuses the already opened document.
+    """
+    doc = DocService.open_docx(path)
+    outline_match = _match_outline(_match_index(), _extract_outline_tokens(DocService.iter_outline_blocks(path, doc)), max(1, int(top_n)))
+    if outline_match is not None:
+        return outline_match
+    return match_templates(DocService.parse_docx(path, doc), top_n)
+
+
+def _match_outline(index: _MatchIndex, target_outline: List[str], k: int) -> Optional[TemplateMatchResponse]:
+    """The outline-based answer, or None when the outline does not single out one template."""
     if len(target_outline) >= 2:
-        for t in latest_templates:
-            tpl_outline = _extract_outline_tokens(t.blocks)
-            if len(tpl_outline) < 2:
-                continue
-            score = SequenceMatcher(None, tpl_outline, target_outline).ratio()
-            outline_candidates.append(
-                TemplateMatchItem(
-                    templateId=t.templateId,
-                    name=t.name,
-                    version=t.version,
-                    score=float(score),
-                )
-            )
-        outline_candidates.sort(key=lambda x: x.score, reverse=True)
+        outline_candidates = [index.item(i, score) for score, i in index.outline.top(target_outline, max(k, 2))]
         best = outline_candidates[0] if outline_candidates else None
         second = outline_candidates[1] if len(outline_candidates) > 1 else None
         if best and best.score >= settings.TEMPLATE_MATCH_OUTLINE_MIN_SCORE and (
@@ -384,23 +713,6 @@ def match_templates(blocks: List[Block], top_n: int = 5) -> TemplateMatchRespons
                         score=s,
                     )
                 )
-            trimmed = boosted[: max(1, int(top_n))]
+            trimmed = boosted[:k]
             return TemplateMatchResponse(best=trimmed[0] if trimmed else None, candidates=trimmed)
-
-    _, target_tokens = compute_signature(blocks)
-    candidates: List[TemplateMatchItem] = []
-    for t in latest_templates:
-        _, tpl_tokens = compute_signature(t.blocks)
-        score = SequenceMatcher(None, tpl_tokens, target_tokens).ratio()
-        candidates.append(
-            TemplateMatchItem(
-                templateId=t.templateId,
-                name=t.name,
-                version=t.version,
-                score=float(score),
-            )
-        )
-    candidates.sort(key=lambda x: x.score, reverse=True)
-    best = candidates[0] if candidates else None
-    trimmed = candidates[: max(1, int(top_n))]
-    return TemplateMatchResponse(best=best, candidates=trimmed)
+    return None
@@ -0,0 +1,81 @@
+"""
+Compare template identification from a .docx with and without the outline-only parse.
+
+    python -m app.tools.bench_match_docx path/to/a.docx path/to/b.docx --repeat 10
+
+Runs in a temporary data directory. Every given file is also stored as a template, so each match
+is a realistic hit. "fullMs" is what the UI path used to cost, DocService.parse_docx followed by
+match_templates; "outlineMs" is match_templates_docx. A synthetic 300-clause contract is always
+added to show the early stop once the outline limit is reached.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+from app.models import TemplateSnapshot
+
+
+def _ms(fn: Callable[[], object], repeat: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return round((time.perf_counter() - t0) / repeat * 1000.0, 1)
+
+
+def _long_contract(path: str, clauses: int) -> None:
+    from docx import Document
+
+    doc = Document()
+    for i in range(clauses):
+        doc.add_heading(f"{i + 1}. 条款{chr(0x4E00 + i)}", level=1)
+        for j in range(3):
+            doc.add_paragraph(f"{i + 1}.{j + 1} 双方就本条第{j + 1}项事宜约定如下：付款、交货、验收与违约责任按本合同执行。")
+    doc.save(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark outline-only template matching")
+    parser.add_argument("docx", nargs="*")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--clauses", type=int, default=300, help="clauses in the synthetic contract")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DOC_COMPARISON_DATA_DIR"] = tmp
+        from app.services.doc_service import DocService
+        from app.services.template_store import compute_signature, match_templates, match_templates_docx, upsert_template
+
+        synthetic = os.path.join(tmp, "synthetic.docx")
+        _long_contract(synthetic, args.clauses)
+        paths = [os.path.abspath(p) for p in args.docx] + [synthetic]
+        for i, path in enumerate(paths):
+            blocks = DocService.parse_docx(path)
+            upsert_template(TemplateSnapshot(templateId=f"tpl_{i}", name=os.path.basename(path), version="v1", signature=compute_signature(blocks)[0], blocks=blocks))
+
+        report = []
+        for i, path in enumerate(paths):
+            full = match_templates(DocService.parse_docx(path))
+            fast = match_templates_docx(path)
+            full_ms = _ms(lambda: match_templates(DocService.parse_docx(path)), args.repeat)
+            outline_ms = _ms(lambda: match_templates_docx(path), args.repeat)
+            report.append(
+                {
+                    "file": os.path.basename(path),
+                    "best": fast.best.templateId if fast.best else None,
+                    "sameResult": fast == full,
+                    "fullMs": full_ms,
+                    "outlineMs": outline_ms,
+                    "ratio": round(outline_ms / full_ms, 2) if full_ms else None,
+                }
+            )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if all(r["sameResult"] for r in report) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Contention benchmark for the store locks.
+
+    python -m app.tools.bench_store_locks --processes 4 --threads 8 --iterations 50 --read-ratio 0.8
+
+Every worker thread (in each of several processes) repeatedly reads or read-modify-writes a counter
+file while holding the lock, with a short sleep inside the critical section standing in for file
+I/O. "legacy" is the O_EXCL lock file the stores used before app.services.file_lock: every access is
+exclusive and waiters poll every 50 ms. "rw" is file_lock's shared/exclusive flock. The counter must
+equal the number of writes in both modes; CPU time includes all worker processes.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from app.services.file_lock import exclusive_lock, shared_lock
+
+
+@contextmanager
+def _legacy_lock(target_path: str, timeout_s: float = 10.0, stale_s: float = 60.0):
+    lock_path = target_path + ".lock"
+    start = time.monotonic()
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_RDWR)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_s:
+                    os.remove(lock_path)
+                    continue
+            except Exception:
+                pass
+            if time.monotonic() - start >= timeout_s:
+                raise RuntimeError(f"timeout acquiring lock: {lock_path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+def _read(path: str) -> int:
+    with open(path, "r", encoding="utf-8") as f:
+        return int(f.read() or "0")
+
+
+def _thread_main(mode: str, path: str, iterations: int, read_ratio: float, hold_s: float, seed: int, out: List[int]) -> None:
+    rng = random.Random(seed)
+    writes = 0
+    for _ in range(iterations):
+        write = rng.random() >= read_ratio
+        if mode == "legacy":
+            lock = _legacy_lock(path, timeout_s=120.0)
+        else:
+            lock = exclusive_lock(path, timeout_s=120.0) if write else shared_lock(path, timeout_s=120.0)
+        with lock:
+            value = _read(path)
+            time.sleep(hold_s)
+            if write:
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(str(value + 1))
+                os.replace(tmp, path)
+                writes += 1
+    out.append(writes)
+
+
+def _process_main(mode: str, path: str, threads: int, iterations: int, read_ratio: float, hold_s: float, seed: int, queue) -> None:
+    counts: List[int] = []
+    workers = [
+        threading.Thread(target=_thread_main, args=(mode, path, iterations, read_ratio, hold_s, seed * 1000 + i, counts))
+        for i in range(threads)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    queue.put(sum(counts))
+
+
+def _run(mode: str, args: argparse.Namespace) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "counter.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("0")
+        ctx = multiprocessing.get_context("fork") if hasattr(os, "fork") else multiprocessing.get_context()
+        queue = ctx.Queue()
+        usage0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+        t0 = time.perf_counter()
+        procs = [
+            ctx.Process(
+                target=_process_main,
+                args=(mode, path, args.threads, args.iterations, args.read_ratio, args.hold_ms / 1000.0, p, queue),
+            )
+            for p in range(args.processes)
+        ]
+        for p in procs:
+            p.start()
+        writes = sum(queue.get() for _ in procs)
+        for p in procs:
+            p.join()
+        wall = time.perf_counter() - t0
+        usage1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+        ops = args.processes * args.threads * args.iterations
+        return {
+            "wallS": round(wall, 3),
+            "opsPerS": round(ops / wall, 1),
+            "cpuS": round((usage1.ru_utime - usage0.ru_utime) + (usage1.ru_stime - usage0.ru_stime), 3),
+            "writes": writes,
+            "counter": _read(path),
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark store lock contention")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="threads per process")
+    parser.add_argument("--iterations", type=int, default=50, help="lock acquisitions per thread")
+    parser.add_argument("--read-ratio", type=float, default=0.8)
+    parser.add_argument("--hold-ms", type=float, default=1.0, help="time spent inside the critical section")
+    args = parser.parse_args(argv)
+
+    report = {
+        "processes": args.processes,
+        "threadsPerProcess": args.threads,
+        "iterationsPerThread": args.iterations,
+        "readRatio": args.read_ratio,
+        "legacy": _run("legacy", args),
+        "rw": _run("rw", args),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if all(report[m]["writes"] == report[m]["counter"] for m in ("legacy", "rw")) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Measure store write latency as the library grows.
+
+    python -m app.tools.bench_store_writes --sizes 100,1000,5000 --repeat 20
+
+For each size a fresh data directory is seeded with that many template index entries and rulesets,
+then upsert_ruleset, rename_template and upsert_template are timed. "rewriteMs" is the previous
+write path for the same change: load the whole store file, replace one item and rewrite it.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.models import Block, BlockKind, BlockMeta, Ruleset, TemplateSnapshot
+
+
+def _ms(fn: Callable[[int], Any], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return round((time.perf_counter() - t0) / repeat * 1000.0, 3)
+
+
+def _ruleset(i: int) -> Dict[str, Any]:
+    return Ruleset(templateId=f"tpl_{i:05d}", name=f"模板 {i}", version="v1", referenceData={}, points=[]).model_dump()
+
+
+def _rewrite(path: str, key: str, item: Dict[str, Any]) -> None:
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    items = [x for x in payload[key] if x.get("templateId") != item["templateId"]] + [item]
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({key: items}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _bench_size(n: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DOC_COMPARISON_DATA_DIR"] = tmp
+        from app.services import ruleset_store, template_store as ts
+
+        store = os.path.join(tmp, "store")
+        os.makedirs(os.path.join(store, "templates"), exist_ok=True)
+        entries = [
+            {"templateId": f"tpl_{i:05d}", "version": "v1", "name": f"模板 {i}", "signature": "sig", "path": f"tpl_{i:05d}/v1.json"}
+            for i in range(n)
+        ]
+        with open(os.path.join(store, "templates", "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"templates": entries}, f, ensure_ascii=False)
+        with open(os.path.join(store, "rulesets.json"), "w", encoding="utf-8") as f:
+            json.dump({"rulesets": [_ruleset(i) for i in range(n)]}, f, ensure_ascii=False, indent=2)
+        baseline = os.path.join(tmp, "baseline.json")
+        with open(baseline, "w", encoding="utf-8") as f:
+            json.dump({"rulesets": [_ruleset(i) for i in range(n)]}, f, ensure_ascii=False, indent=2)
+        ruleset_store.list_rulesets()
+        ts.list_template_index()
+
+        block = Block(blockId="b1", kind=BlockKind.PARAGRAPH, structurePath="body.p[0]", stableKey="b1", text="一、总则", htmlFragment="<p>一、总则</p>", meta=BlockMeta())
+        return {
+            "upsertRuleset": {
+                "journalMs": _ms(lambda i: ruleset_store.upsert_ruleset(Ruleset.model_validate(_ruleset(i))), repeat),
+                "rewriteMs": _ms(lambda i: _rewrite(baseline, "rulesets", _ruleset(i)), repeat),
+            },
+            "renameTemplate": {"journalMs": _ms(lambda i: ts.rename_template(f"tpl_{i:05d}", f"新名称 {i}"), repeat)},
+            "upsertTemplate": {
+                "journalMs": _ms(
+                    lambda i: ts.upsert_template(TemplateSnapshot(templateId=f"new_{i}", name="新模板", version="v1", signature="s", blocks=[block])),
+                    repeat,
+                )
+            },
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure store write latency against library size")
+    parser.add_argument("--sizes", default="100,1000,5000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    report = {str(n): _bench_size(n, args.repeat) for n in (int(x) for x in args.sizes.split(",") if x.strip())}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
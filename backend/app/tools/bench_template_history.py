@@ -0,0 +1,112 @@
+"""
+Storage report for delta-encoded template versions.
+
+    python -m app.tools.bench_template_history --versions 50 --blocks 200 --edits 3
+
+Builds a synthetic history in a temporary data directory: every version edits a few clauses of the
+previous one (rewording, inserting and deleting), and each version is stored through upsert_template.
+"fullBytes" is what the shards took when every version held all of its blocks; "storedBytes" is the
+size of the shard files actually written. Read timings cover rebuilding every version from its base
+with a cold cache and again with a warm one.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from app.models import Block, BlockKind, BlockMeta, TemplateSnapshot
+
+
+def _block(i: int, text: str) -> Block:
+    return Block(
+        blockId=f"b{i}",
+        kind=BlockKind.PARAGRAPH,
+        structurePath=f"body.p[{i}]",
+        stableKey=f"k{abs(hash(text))}",
+        text=text,
+        htmlFragment=f"<p><span style=\"font-family:SimSun\">{text}</span></p>",
+        meta=BlockMeta(),
+    )
+
+
+def _history(versions: int, n_blocks: int, edits: int, seed: int) -> List[TemplateSnapshot]:
+    rng = random.Random(seed)
+    texts = [f"第{j + 1}条 双方就第{j + 1}项事宜约定如下：付款、交货、验收与违约责任按本合同执行。" for j in range(n_blocks)]
+    out = []
+    for v in range(versions):
+        if v:
+            for _ in range(edits):
+                op = rng.random()
+                j = rng.randrange(len(texts))
+                if op < 0.6:
+                    texts[j] = texts[j] + f"（第{v}版修订）"
+                elif op < 0.8:
+                    texts.insert(j, f"新增条款 v{v}：双方另行约定的补充事项。")
+                elif len(texts) > 1:
+                    del texts[j]
+        blocks = [_block(i, t) for i, t in enumerate(texts)]
+        out.append(TemplateSnapshot(templateId="tpl_history", name="历史模板", version=f"v{v:03d}", signature=f"s{v}", blocks=blocks))
+    return out
+
+
+def _dir_bytes(root: str) -> int:
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != "_fp"]
+        total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report storage for delta-encoded template versions")
+    parser.add_argument("--versions", type=int, default=50)
+    parser.add_argument("--blocks", type=int, default=200, help="blocks in the first version")
+    parser.add_argument("--edits", type=int, default=3, help="clause edits per version")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    history = _history(args.versions, args.blocks, args.edits, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DOC_COMPARISON_DATA_DIR"] = tmp
+        from app.services import template_store as ts
+
+        for snap in history:
+            ts.upsert_template(snap.model_copy(deep=True))
+        root = os.path.join(tmp, "store", "templates", "tpl_history")
+        full_bytes = sum(len(json.dumps(s.model_dump(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")) for s in history)
+        stored_bytes = _dir_bytes(root)
+        bases = sum(1 for e in ts._read_index() if not e.get("base"))
+
+        ts._shard_cache.invalidate()
+        t0 = time.perf_counter()
+        rebuilt = [ts.get_template("tpl_history", s.version) for s in history]
+        cold_ms = (time.perf_counter() - t0) * 1000.0
+        t0 = time.perf_counter()
+        for s in history:
+            ts.get_template("tpl_history", s.version)
+        warm_ms = (time.perf_counter() - t0) * 1000.0
+        ok = all(r is not None and r.blocks == s.blocks for r, s in zip(rebuilt, history))
+
+    report = {
+        "versions": args.versions,
+        "blocksFirst": args.blocks,
+        "blocksLast": len(history[-1].blocks),
+        "editsPerVersion": args.edits,
+        "fullBytes": full_bytes,
+        "storedBytes": stored_bytes,
+        "reduction": round(1 - stored_bytes / full_bytes, 3),
+        "fullVersions": bases,
+        "readAllColdMs": round(cold_ms, 1),
+        "readAllWarmMs": round(warm_ms, 1),
+        "roundTripOk": ok,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
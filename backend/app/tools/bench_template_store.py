@@ -0,0 +1,127 @@
+"""
+Benchmark the template store against the single-file layout it replaced.
+
+    python -m app.tools.bench_template_store --templates 500 --blocks 150
+
+Runs in a temporary data directory. The "monolithic" numbers reproduce what every call used to do
+with one templates.json: load and validate the whole file (reads) or also rewrite it (writes). The
+"exhaustive" match numbers load every template and score it with SequenceMatcher, which is what
+match_templates did before fingerprints were persisted and indexed.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from difflib import SequenceMatcher
+from typing import Callable, Dict, List, Optional
+
+from app.models import Block, BlockKind, BlockMeta, TemplateSnapshot
+
+
+_SYLLABLES = "甲乙丙丁戊己庚辛壬癸子丑寅卯辰巳午未申酉戌亥"
+_WORDS = [a + b for a in _SYLLABLES for b in _SYLLABLES]
+
+
+def _snapshot(i: int, n_blocks: int) -> TemplateSnapshot:
+    rng = random.Random(i)
+    blocks = []
+    for j in range(n_blocks):
+        text = f"{j + 1}、{rng.choice(_WORDS)}{rng.choice(_WORDS)}条款：包括付款、交货、验收与违约责任等约定。"
+        blocks.append(
+            Block(
+                blockId=f"b{j}",
+                kind=BlockKind.PARAGRAPH,
+                structurePath=f"body.p[{j}]",
+                stableKey=f"k{j}",
+                text=text,
+                htmlFragment=f"<p><span style=\"font-family:SimSun\">{text}</span></p>",
+                meta=BlockMeta(),
+            )
+        )
+    return TemplateSnapshot(templateId=f"tpl_{i:04d}", name=f"模板 {i}", version="2026-01-01", signature=f"sig{i}", blocks=blocks)
+
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000.0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the sharded template store")
+    parser.add_argument("--templates", type=int, default=500)
+    parser.add_argument("--blocks", type=int, default=150, help="blocks per template")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DOC_COMPARISON_DATA_DIR"] = tmp
+        from app.services import template_store as ts
+
+        snapshots = [_snapshot(i, args.blocks) for i in range(args.templates)]
+        mono_path = os.path.join(tmp, "monolithic.json")
+        with open(mono_path, "w", encoding="utf-8") as f:
+            json.dump({"templates": [s.model_dump() for s in snapshots]}, f, ensure_ascii=False, indent=2)
+
+        def _mono_read() -> List[TemplateSnapshot]:
+            with open(mono_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            return [TemplateSnapshot.model_validate(x) for x in payload["templates"]]
+
+        def _mono_write() -> None:
+            items = [s.model_dump() for s in _mono_read()]
+            with open(mono_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"templates": items}, f, ensure_ascii=False, indent=2)
+            os.replace(mono_path + ".tmp", mono_path)
+
+        t0 = time.perf_counter()
+        for s in snapshots:
+            ts.upsert_template(s)
+        populate_s = time.perf_counter() - t0
+
+        target = snapshots[len(snapshots) // 2]
+        probe = target.blocks[: max(1, len(target.blocks) - 5)]
+
+        def _exhaustive_match() -> None:
+            _, probe_tokens = ts.compute_signature(probe)
+            for e in ts._latest_entries(ts._read_index()).values():
+                t = ts._load_shard(e)
+                ts._extract_outline_tokens(t.blocks)
+                SequenceMatcher(None, ts.compute_signature(t.blocks)[1], probe_tokens).ratio()
+
+        ts.match_templates(probe)
+        results: Dict[str, Dict[str, float]] = {
+            "list": {
+                "monolithicMs": _time(_mono_read, args.repeat),
+                "shardedMs": _time(ts.list_template_index, args.repeat),
+            },
+            "getLatest": {
+                "monolithicMs": _time(_mono_read, args.repeat),
+                "shardedMs": _time(lambda: ts.get_latest_template(target.templateId), args.repeat),
+            },
+            "match": {
+                "exhaustiveMs": _time(_exhaustive_match, max(1, args.repeat // 2)),
+                "indexedMs": _time(lambda: ts.match_templates(probe), args.repeat),
+            },
+            "upsert": {
+                "monolithicMs": _time(_mono_write, max(1, args.repeat // 2)),
+                "shardedMs": _time(lambda: ts.upsert_template(target), args.repeat),
+            },
+        }
+        report = {
+            "templates": args.templates,
+            "blocksPerTemplate": args.blocks,
+            "monolithicFileBytes": os.path.getsize(mono_path),
+            "shardedPopulateS": round(populate_s, 3),
+            "results": {k: {kk: round(vv, 3) for kk, vv in v.items()} for k, v in results.items()},
+        }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
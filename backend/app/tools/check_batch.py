@@ -0,0 +1,56 @@
+"""
+Check many .docx contracts against one ruleset from the command line.
+
+    python -m app.tools.check_batch --template-id sales_contract_cn contracts/ extra.docx
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List, Tuple
+
+from app.services.check_service import CheckService
+
+
+def _collect_files(inputs: List[str]) -> List[Tuple[str, str]]:
+    out: List[Tuple[str, str]] = []
+    for p in inputs:
+        if os.path.isdir(p):
+            for root, _, names in os.walk(p):
+                for name in sorted(names):
+                    if name.lower().endswith(".docx") and not name.startswith("~$"):
+                        full = os.path.join(root, name)
+                        out.append((os.path.relpath(full, p), full))
+        elif os.path.isfile(p):
+            out.append((os.path.basename(p), p))
+        else:
+            raise SystemExit(f"not found: {p}")
+    return out
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run one ruleset over many .docx files")
+    parser.add_argument("paths", nargs="+", help=".docx files or directories containing them")
+    parser.add_argument("--template-id", required=True)
+    parser.add_argument("--ai", action="store_true", help="enable AI confirmation")
+    parser.add_argument("--workers", type=int, default=0, help="parse/evaluate processes (default: CPU count)")
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    files = _collect_files(args.paths)
+    if not files:
+        print("no .docx files found", file=sys.stderr)
+        return 1
+
+    result = CheckService().run_batch(args.template_id, files, args.ai, workers=args.workers or None)
+    text = json.dumps(result.model_dump(), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0 if result.summary.get("failed", 0) == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
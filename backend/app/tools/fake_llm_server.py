@@ -0,0 +1,328 @@
+"""
+OpenAI-compatible stand-in for /v1/chat/completions, for offline load and latency testing.
+
+    python -m app.tools.fake_llm_server --port 8900 --latency-ms 800 --latency-jitter-ms 400 --error-rate 0.02
+    LLM_API_KEY=fake LLM_BASE_URL=http://127.0.0.1:8900/v1 LLM_MODEL=fake uvicorn app.main:app
+
+Answers are schema-valid for the check_point, check_points_batch, global_review (single, section and
+reduce) and analyze prompts. Latency, error and rate-limit injection, streaming and token accounting
+are configurable; tests can also queue per-request (status, delay_s) overrides in `script`.
+Prefix caching is simulated: when every message but the last has been seen before, its tokens are
+reported as prompt_tokens_details.cached_tokens.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FakeLLMConfig:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        latency_jitter_ms: float = 0.0,
+        latency_dist: str = "uniform",
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        chars_per_token: float = 2.0,
+        stream_chunk_chars: int = 16,
+        stream_chunk_delay_ms: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.latency_dist = latency_dist
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.chars_per_token = max(0.1, chars_per_token)
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self.stream_chunk_delay_ms = stream_chunk_delay_ms
+        self.rng = random.Random(seed)
+
+
+def _tokens(text: str, chars_per_token: float) -> int:
+    return int(math.ceil(len(text or "") / chars_per_token))
+
+
+def _loads(s: str) -> Any:
+    try:
+        return json.loads(s)
+    except Exception:
+        return None
+
+
+def _first_block_ids(payload: Any, n: int = 2) -> List[str]:
+    blocks = ((payload or {}).get("input") or {}).get("blocks") or []
+    return [str(b.get("blockId")) for b in blocks[:n] if isinstance(b, dict) and b.get("blockId")]
+
+
+def answer_for(messages: List[Dict[str, Any]]) -> str:
+    """A schema-valid answer for whichever prompt shape the messages carry."""
+    system = str((messages[0] or {}).get("content") or "") if messages else ""
+    user_messages = [str(m.get("content") or "") for m in messages[1:] if m.get("role") == "user"]
+    user_text = "\n".join(user_messages)
+    user = _loads(user_messages[-1]) if user_messages else None
+
+    if isinstance(user, dict) and isinstance(user.get("points"), list):
+        results = []
+        for p in user["points"]:
+            rule_status = str(((p.get("rule") or {}) or {}).get("status") or "")
+            status = "fail" if rule_status == "fail" else "pass"
+            results.append({"pointId": p.get("pointId"), "status": status, "summary": "fake review", "confidence": 0.9})
+        return json.dumps({"results": results}, ensure_ascii=False)
+
+    if isinstance(user, dict) and "instruction" in user:
+        rule_status = str(((user.get("rule") or {}) or {}).get("status") or "")
+        return json.dumps({"status": "fail" if rule_status == "fail" else "pass", "summary": "fake review", "confidence": 0.9})
+
+    if "overallRiskLevel" in system:
+        ids = _first_block_ids(user)
+        section = ((user or {}).get("input") or {}).get("section") or {}
+        out: Dict[str, Any] = {
+            "overallRiskLevel": "medium",
+            "summary": f"fake review {section.get('title') or ''}".strip(),
+            "keyFindings": [{"title": "fake finding", "detail": "generated by fake_llm_server", "evidenceIds": ids}],
+            "improvementSuggestions": [{"title": "fake suggestion", "detail": "", "priority": "medium"}],
+            "missingInformation": [],
+            "confidence": 0.8,
+        }
+        if ids:
+            out["blockReviews"] = [{"blockId": ids[0], "riskLevel": "medium", "issues": ["fake issue"], "suggestions": []}]
+        return json.dumps(out, ensure_ascii=False)
+
+    ids = re.findall(r"<block id='([^']+)'>", user_text)[:2]
+    cites = " ".join(f"[{x}]" for x in ids)
+    return f"Fake risk analysis. {cites}".strip()
+
+
+class FakeLLMServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[FakeLLMConfig] = None):
+        self.config = config or FakeLLMConfig()
+        self.script: List[Tuple[int, float]] = []
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._connections: set = set()
+        self._prefixes: "OrderedDict[str, None]" = OrderedDict()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server._connections.add(self.connection)
+
+            def finish(self) -> None:
+                with server._lock:
+                    server._connections.discard(self.connection)
+                super().finish()
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = _loads(self.rfile.read(length).decode("utf-8") if length else "") or {}
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                    return
+                status, delay_s = server._next_outcome()
+                if delay_s > 0:
+                    time.sleep(delay_s)
+                if status != 200:
+                    headers = {"Retry-After": "0"} if status == 429 else {}
+                    self._json(status, {"error": {"message": "injected failure", "type": "server_error"}}, headers)
+                    return
+                server._respond(self, body)
+
+            def _json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+                raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(raw)))
+                    for k, v in (headers or {}).items():
+                        self.send_header(k, v)
+                    self.end_headers()
+                    self.wfile.write(raw)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _next_outcome(self) -> Tuple[int, float]:
+        cfg = self.config
+        with self._lock:
+            self.requests += 1
+            if self.script:
+                return self.script.pop(0)
+            r = cfg.rng.random()
+            if cfg.latency_dist == "lognormal" and cfg.latency_ms > 0:
+                sigma = max(0.01, cfg.latency_jitter_ms / max(cfg.latency_ms, 1.0))
+                latency_ms = cfg.rng.lognormvariate(math.log(cfg.latency_ms), sigma)
+            else:
+                latency_ms = cfg.latency_ms + cfg.rng.uniform(-cfg.latency_jitter_ms, cfg.latency_jitter_ms)
+        if r < cfg.rate_limit_rate:
+            return 429, 0.0
+        if r < cfg.rate_limit_rate + cfg.error_rate:
+            return 500, max(0.0, latency_ms) / 1000.0
+        return 200, max(0.0, latency_ms) / 1000.0
+
+    def _cached_prefix_tokens(self, messages: List[Dict[str, Any]]) -> int:
+        prefix = messages[:-1]
+        if not prefix:
+            return 0
+        key = hashlib.sha256(json.dumps(prefix, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+        with self._lock:
+            hit = key in self._prefixes
+            self._prefixes[key] = None
+            self._prefixes.move_to_end(key)
+            while len(self._prefixes) > 1024:
+                self._prefixes.popitem(last=False)
+        return _tokens("".join(str(m.get("content") or "") for m in prefix), self.config.chars_per_token) if hit else 0
+
+    def _usage(self, messages: List[Dict[str, Any]], content: str) -> Dict[str, Any]:
+        prompt = "".join(str(m.get("content") or "") for m in messages)
+        p = _tokens(prompt, self.config.chars_per_token)
+        c = _tokens(content, self.config.chars_per_token)
+        cached = min(p, self._cached_prefix_tokens(messages))
+        return {"prompt_tokens": p, "completion_tokens": c, "total_tokens": p + c, "prompt_tokens_details": {"cached_tokens": cached}}
+
+    def _respond(self, handler: BaseHTTPRequestHandler, body: Dict[str, Any]) -> None:
+        messages = body.get("messages") or []
+        model = str(body.get("model") or "fake")
+        content = answer_for(messages)
+        cid = f"chatcmpl-fake-{int(time.time() * 1000)}"
+        usage = self._usage(messages, content)
+
+        if not body.get("stream"):
+            handler._json(
+                200,
+                {
+                    "id": cid,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": usage,
+                },
+            )
+            return
+
+        include_usage = bool(((body.get("stream_options") or {}) or {}).get("include_usage"))
+        try:
+            handler.send_response(200)
+            handler.send_header("Content-Type", "text/event-stream")
+            handler.send_header("Cache-Control", "no-cache")
+            handler.send_header("Transfer-Encoding", "chunked")
+            handler.end_headers()
+
+            def _send(obj: Any) -> None:
+                data = ("data: " + (obj if isinstance(obj, str) else json.dumps(obj, ensure_ascii=False)) + "\n\n").encode("utf-8")
+                handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                handler.wfile.flush()
+
+            def _chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> Dict[str, Any]:
+                return {
+                    "id": cid,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                }
+
+            _send(_chunk({"role": "assistant", "content": ""}))
+            step = self.config.stream_chunk_chars
+            for i in range(0, len(content), step):
+                if self.config.stream_chunk_delay_ms > 0:
+                    time.sleep(self.config.stream_chunk_delay_ms / 1000.0)
+                _send(_chunk({"content": content[i : i + step]}))
+            _send(_chunk({}, "stop"))
+            if include_usage:
+                _send({"id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model, "choices": [], "usage": usage})
+            _send("[DONE]")
+            handler.wfile.write(b"0\r\n\r\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        # Keep-alive connections outlive shutdown(); close them so no handler keeps serving.
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        with self._lock:
+            conns = list(self._connections)
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="median response latency")
+    parser.add_argument("--latency-jitter-ms", type=float, default=200.0, help="uniform +/- jitter, or lognormal spread")
+    parser.add_argument("--latency-dist", choices=["uniform", "lognormal"], default="uniform")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 429")
+    parser.add_argument("--chars-per-token", type=float, default=2.0, help="token accounting granularity")
+    parser.add_argument("--stream-chunk-chars", type=int, default=16)
+    parser.add_argument("--stream-chunk-delay-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config = FakeLLMConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        latency_dist=args.latency_dist,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        chars_per_token=args.chars_per_token,
+        stream_chunk_chars=args.stream_chunk_chars,
+        stream_chunk_delay_ms=args.stream_chunk_delay_ms,
+        seed=args.seed,
+    )
+    server = FakeLLMServer(args.host, args.port, config)
+    print(f"fake LLM server listening on {server.base_url}", file=sys.stderr)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""
+Import the JSON-file stores into the SQLite store backend.
+
+    python -m app.tools.import_sqlite_store [--replace] [--runs]
+
+Copies templates, rulesets and prompts from store/*.json into store/store.sqlite3 (the backend
+does this once by itself on an empty database; run this to pick up later changes made to the JSON
+files). --runs also moves check-run payload files into the check-run index database. Set
+DOC_COMPARISON_STORE_BACKEND=sqlite afterwards.
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from app.services import run_store, sqlite_store
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import JSON stores into the SQLite store backend")
+    parser.add_argument("--replace", action="store_true", help="overwrite rows that already exist in the database")
+    parser.add_argument("--runs", action="store_true", help="also move check-run payload files into SQLite")
+    args = parser.parse_args(argv)
+
+    counts = sqlite_store.import_json_stores(replace=args.replace)
+    if args.runs:
+        counts["runs"] = run_store.import_run_payloads()
+    print(json.dumps({"database": sqlite_store.db_path(), "imported": counts}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
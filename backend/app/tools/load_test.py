@@ -0,0 +1,182 @@
+"""
+Drive /api/check/run with AI enabled and report throughput and latency percentiles.
+
+    python -m app.tools.load_test --requests 200 --concurrency 16
+    python -m app.tools.load_test --api http://127.0.0.1:8000 --requests 500 --concurrency 32 contract.docx
+
+Without --api the app is served in-process (uvicorn) against a local fake_llm_server, so no provider
+key is needed; the fake server's latency and error options are passed through. Identical concurrent
+LLM requests are coalesced (LLM_SINGLE_FLIGHT), so the in-process mode turns coalescing off unless
+--single-flight is given, otherwise every request after the first would share one provider call.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.tools.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+_DEFAULT_DOCX = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "买卖合同(销售).docx"))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = min(len(s) - 1, max(0, int(round(q / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def _serve_in_process(fake: FakeLLMServer, single_flight: bool) -> str:
+    from app.core.config import settings
+
+    settings.LLM_API_KEY = "fake"
+    settings.LLM_BASE_URL = fake.base_url
+    settings.LLM_MODEL = "fake"
+    settings.LLM_SINGLE_FLIGHT = single_flight
+
+    import uvicorn
+
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="load-test-api", daemon=True).start()
+    deadline = time.monotonic() + 15.0
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise SystemExit("in-process API did not start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def _run(api: str, body: Dict[str, Any], total: int, concurrency: int, timeout_s: float) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    ai_items = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=api, timeout=timeout_s, limits=limits) as client:
+
+        async def _one() -> None:
+            nonlocal ai_items
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    res = await client.post("/api/check/run", json=body)
+                except Exception as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                    return
+                dt = time.perf_counter() - t0
+                if res.status_code != 200:
+                    errors[str(res.status_code)] = errors.get(str(res.status_code), 0) + 1
+                    return
+                latencies.append(dt)
+                ai_items += sum(1 for it in res.json().get("items") or [] if it.get("ai"))
+
+        t_start = time.perf_counter()
+        await asyncio.gather(*(_one() for _ in range(total)))
+        wall = time.perf_counter() - t_start
+
+        llm: Optional[Dict[str, Any]] = None
+        try:
+            llm = (await client.get("/api/metrics/llm")).json()
+        except Exception:
+            pass
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": errors,
+        "wallS": round(wall, 3),
+        "throughputRps": round(len(latencies) / wall, 3) if wall > 0 else 0.0,
+        "latencyS": {
+            "p50": round(_percentile(latencies, 50), 4),
+            "p95": round(_percentile(latencies, 95), 4),
+            "p99": round(_percentile(latencies, 99), 4),
+            "max": round(max(latencies), 4) if latencies else 0.0,
+        },
+        "aiItems": ai_items,
+        "llm": llm,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test /api/check/run with AI enabled")
+    parser.add_argument("docx", nargs="?", default=_DEFAULT_DOCX, help="contract to check (default: the sales contract sample)")
+    parser.add_argument("--template-id", default="sales_contract_cn")
+    parser.add_argument("--api", help="base URL of a running API; omit to serve in-process against the fake LLM server")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout-s", type=float, default=300.0)
+    parser.add_argument("--single-flight", action="store_true", help="keep LLM request coalescing on (in-process mode)")
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="fake LLM median latency (in-process mode)")
+    parser.add_argument("--latency-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--latency-dist", choices=["uniform", "lognormal"], default="uniform")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.docx):
+        raise SystemExit(f"not found: {args.docx}")
+
+    from app.services.doc_service import DocService
+
+    blocks = DocService.parse_docx(args.docx)
+    body = {
+        "templateId": args.template_id,
+        "rightBlocks": [b.model_dump(mode="json") for b in blocks],
+        "aiEnabled": True,
+    }
+
+    fake: Optional[FakeLLMServer] = None
+    api = args.api
+    if not api:
+        fake = FakeLLMServer(
+            config=FakeLLMConfig(
+                latency_ms=args.latency_ms,
+                latency_jitter_ms=args.latency_jitter_ms,
+                latency_dist=args.latency_dist,
+                error_rate=args.error_rate,
+                rate_limit_rate=args.rate_limit_rate,
+                seed=args.seed,
+            )
+        ).start()
+        api = _serve_in_process(fake, args.single_flight)
+
+    try:
+        report = asyncio.run(_run(api.rstrip("/"), body, max(1, args.requests), max(1, args.concurrency), args.timeout_s))
+        if fake is not None:
+            report["fakeProviderCalls"] = fake.requests
+    finally:
+        if fake is not None:
+            fake.stop()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0 if not report["errors"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
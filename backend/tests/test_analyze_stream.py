@@ -0,0 +1,87 @@
+import json
+import unittest
+from unittest import mock
+
+
+def _parse_sse(text: str):
+    events = []
+    for chunk in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in chunk.splitlines() if ": " in line)
+        events.append((lines.get("event"), json.loads(lines.get("data") or "null")))
+    return events
+
+
+def _fake_stream(parts):
+    async def _astream_text(messages, **kwargs):
+        for p in parts:
+            yield "cmpl_1", p
+
+    return _astream_text
+
+
+class AnalyzeStreamTests(unittest.TestCase):
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.services.llm_client import get_llm_service
+
+        self.client = TestClient(app)
+        self.svc = get_llm_service()
+        self.body = {
+            "templateId": "t_stream",
+            "rightBlocks": [
+                {"blockId": "b1", "kind": "paragraph", "structurePath": "body.p[1]", "stableKey": "b1", "text": "付款期限：30日", "htmlFragment": "<p>付款期限：30日</p>", "meta": {}}
+            ],
+            "promptOverride": "review",
+        }
+
+    def test_global_stream_forwards_deltas_and_validates_result(self):
+        doc = {"overallRiskLevel": "low", "summary": "ok", "keyFindings": [], "improvementSuggestions": [], "missingInformation": [], "confidence": 0.8}
+        text = json.dumps(doc)
+        parts = [text[:10], text[10:30], text[30:]]
+        with mock.patch.object(self.svc, "_configured", return_value=True), mock.patch.object(self.svc, "_astream_text", _fake_stream(parts)):
+            res = self.client.post("/api/analyze/global/stream", json=self.body)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.headers["content-type"].startswith("text/event-stream"))
+        events = _parse_sse(res.text)
+        self.assertEqual([e for e, _ in events], ["delta", "delta", "delta", "done"])
+        self.assertEqual("".join(d["text"] for e, d in events if e == "delta"), text)
+        done = events[-1][1]
+        self.assertTrue(done["valid"])
+        self.assertEqual(done["result"]["overallRiskLevel"], "low")
+
+    def test_global_stream_reports_invalid_result(self):
+        with mock.patch.object(self.svc, "_configured", return_value=True), mock.patch.object(self.svc, "_astream_text", _fake_stream(["not", " json"])):
+            res = self.client.post("/api/analyze/global/stream", json=self.body)
+        done = _parse_sse(res.text)[-1]
+        self.assertEqual(done[0], "done")
+        self.assertFalse(done[1]["valid"])
+        self.assertEqual(done[1]["raw"], "not json")
+        self.assertTrue(done[1]["error"])
+
+    def test_analyze_stream_assembles_analysis(self):
+        with mock.patch.object(self.svc, "_configured", return_value=True), mock.patch.object(self.svc, "_astream_text", _fake_stream(["风险", "较低 [b1]"])):
+            res = self.client.post("/api/analyze/stream", json={"blocks": self.body["rightBlocks"], "query": "风险?"})
+        event, done = _parse_sse(res.text)[-1]
+        self.assertEqual(event, "done")
+        self.assertEqual((done["analysis"], done["trace_id"]), ("风险较低 [b1]", "cmpl_1"))
+        self.assertIn("usage", done)
+
+    def test_llm_loop_relays_async_generators(self):
+        import asyncio
+        import threading
+        from app.services.llm_client import iterate_on_llm_loop
+
+        async def _gen():
+            for i in range(3):
+                await asyncio.sleep(0)
+                yield threading.current_thread().name, i
+
+        async def _collect():
+            return [x async for x in iterate_on_llm_loop(_gen())]
+
+        self.assertEqual(asyncio.run(_collect()), [("llm-loop", 0), ("llm-loop", 1), ("llm-loop", 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -17,6 +17,8 @@ class ApiRoutesTests(unittest.TestCase):
             "/api/skills/import",
             "/api/check/rulesets",
             "/api/check/run",
+            "/api/check/runs",
+            "/api/metrics/llm",
             "/api/health",
         }
         missing = sorted(expected - paths)
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app.models import Block, BlockKind, BlockMeta, TemplateSnapshot
+from app.services import blob_store, template_store
+
+
+def _blocks():
+    return [Block(blockId="b1", kind=BlockKind.PARAGRAPH, structurePath="body.p[0]", stableKey="b1", text="一、总则", htmlFragment="<p>一、总则</p>", meta=BlockMeta())]
+
+
+class BlobStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+
+    def tearDown(self) -> None:
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def test_identical_assets_share_one_blob(self):
+        p1 = template_store.save_template_docx("t1", "v1", b"PK docx")
+        p2 = template_store.save_template_docx("t1", "v2", b"PK docx")
+        p3 = template_store.save_template_docx("skill_x", "1.0.0", b"PK docx")
+        self.assertEqual(p1, p2)
+        self.assertEqual(p1, p3)
+        self.assertEqual(blob_store.refcounts(), {blob_store.sha256_bytes(b"PK docx"): 3})
+        with open(template_store.get_template_docx_path("t1", "v2"), "rb") as f:
+            self.assertEqual(f.read(), b"PK docx")
+
+    def test_delete_template_collects_unreferenced_blobs(self):
+        shared = template_store.save_template_docx("t1", "v1", b"shared")
+        own = template_store.save_template_docx("t1", "v2", b"own")
+        template_store.save_template_docx("t2", "v1", b"shared")
+        for tid in ("t1", "t2"):
+            template_store.upsert_template(TemplateSnapshot(templateId=tid, name=tid, version="v1", signature="s", blocks=_blocks()))
+
+        self.assertTrue(template_store.delete_template("t1"))
+        self.assertFalse(os.path.exists(own))
+        self.assertTrue(os.path.exists(shared))
+        self.assertIsNone(template_store.get_template_docx_path("t1", "v1"))
+
+        self.assertTrue(template_store.delete_template("t2"))
+        self.assertFalse(os.path.exists(shared))
+        self.assertEqual(blob_store.refcounts(), {})
+
+    def test_overwriting_a_version_releases_the_old_blob(self):
+        old = template_store.save_template_docx("t1", "v1", b"old")
+        template_store.save_template_docx("t1", "v1", b"new")
+        self.assertFalse(os.path.exists(old))
+        self.assertEqual(list(blob_store.refcounts().values()), [1])
+
+    def test_legacy_asset_path_is_read_then_replaced(self):
+        legacy = os.path.join(self._tmp.name, "assets", "template_assets", "t1", "v1", "template.docx")
+        os.makedirs(os.path.dirname(legacy))
+        with open(legacy, "wb") as f:
+            f.write(b"legacy")
+        self.assertEqual(template_store.get_template_docx_path("t1", "v1"), legacy)
+        p = template_store.save_template_docx("t1", "v1", b"legacy")
+        self.assertEqual(template_store.get_template_docx_path("t1", "v1"), p)
+        self.assertFalse(os.path.exists(os.path.dirname(os.path.dirname(legacy))))
+
+    def test_parse_cache_is_keyed_by_content(self):
+        paths = []
+        for name in ("a.docx", "b.docx"):
+            paths.append(os.path.join(self._tmp.name, name))
+            with open(paths[-1], "wb") as f:
+                f.write(b"same bytes")
+        parse = mock.Mock(side_effect=lambda p: _blocks())
+        first = blob_store.parse_cached(paths[0], parse)
+        first[0].text = "changed"
+        second = blob_store.parse_cached(paths[1], parse)
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(second[0].text, "一、总则")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,395 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from app.models import Block, BlockKind, BlockMeta, CheckPoint, CheckRule, PointAnchor, AnchorType, RuleType, Ruleset
+from app.services.check_service import CheckService, RUN_STATE_COMPLETED, RUN_STATE_RUNNING
+from app.services.ruleset_store import upsert_ruleset
+
+
+def _make_block(block_id: str, text: str) -> Block:
+    return Block(
+        blockId=block_id,
+        kind=BlockKind.PARAGRAPH,
+        structurePath=f"body.p[{block_id}]",
+        stableKey=block_id,
+        text=text,
+        htmlFragment=f"<p>{text}</p>",
+        meta=BlockMeta(),
+    )
+
+
+def _ruleset() -> Ruleset:
+    return Ruleset(
+        templateId="t_runs",
+        name="Runs",
+        version="v1",
+        referenceData={},
+        points=[
+            CheckPoint(
+                pointId="p.delivery",
+                title="交货地点",
+                anchor=PointAnchor(type=AnchorType.TEXT_REGEX, value="交货地点"),
+                rules=[CheckRule(type=RuleType.REQUIRED_AFTER_COLON, params={"labelRegex": "交货地点"})],
+            ),
+            CheckPoint(
+                pointId="p.sign_date",
+                title="签订日期",
+                anchor=PointAnchor(type=AnchorType.TEXT_REGEX, value="签订日期"),
+                rules=[CheckRule(type=RuleType.DATE_MONTH, params={})],
+            ),
+        ],
+    )
+
+
+class CheckRunTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+        upsert_ruleset(_ruleset())
+        self.blocks = [_make_block("b1", "交货地点：上海"), _make_block("b2", "签订日期：2026年")]
+
+    def tearDown(self) -> None:
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def _wait_completed(self, svc: CheckService, run_id: str, timeout_s: float = 5.0) -> dict:
+        deadline = time.monotonic() + timeout_s
+        while True:
+            payload = svc.get_run(run_id)
+            if payload is not None and payload["summary"].get("state") != RUN_STATE_RUNNING:
+                return payload
+            if time.monotonic() >= deadline:
+                self.fail("async run did not complete")
+            time.sleep(0.02)
+
+    def test_sync_run_is_persisted_as_completed(self):
+        svc = CheckService()
+        resp = svc.run("t_runs", self.blocks, ai_enabled=False)
+        self.assertEqual(resp.summary["state"], RUN_STATE_COMPLETED)
+        self.assertEqual(resp.summary["counts"]["pass"], 1)
+        self.assertEqual(resp.summary["counts"]["fail"], 1)
+        stored = svc.get_run(resp.runId)
+        self.assertIsNotNone(stored)
+        self.assertEqual(stored["runId"], resp.runId)
+
+    def test_async_run_returns_rules_first_then_fills_ai(self):
+        svc = CheckService()
+        resp = svc.start_run("t_runs", self.blocks, ai_enabled=True)
+        self.assertEqual(resp.summary["state"], RUN_STATE_RUNNING)
+        self.assertEqual(resp.summary["ai"], {"total": 1, "done": 0})
+        self.assertTrue(all(x.ai is None for x in resp.items))
+
+        payload = self._wait_completed(svc, resp.runId)
+        self.assertEqual(payload["summary"]["state"], RUN_STATE_COMPLETED)
+        self.assertEqual(payload["summary"]["ai"], {"total": 1, "done": 1})
+        by_id = {x["pointId"]: x for x in payload["items"]}
+        self.assertIsNotNone(by_id["p.sign_date"]["ai"])
+        self.assertIsNone(by_id["p.delivery"]["ai"])
+
+    def test_async_run_without_ai_completes_immediately(self):
+        svc = CheckService()
+        resp = svc.start_run("t_runs", self.blocks, ai_enabled=False)
+        self.assertEqual(resp.summary["state"], RUN_STATE_COMPLETED)
+        self.assertNotIn("ai", resp.summary)
+
+    def test_incremental_run_reuses_unchanged_points(self):
+        from unittest import mock
+        from app.models import CheckAiResult
+
+        svc = CheckService()
+        seen = []
+
+        def _fake_batch(points, definitions=None):
+            seen.extend(p["pointId"] for p in points)
+            return {p["pointId"]: CheckAiResult(summary="ok") for p in points}
+
+        with mock.patch.object(svc.llm, "acheck_points_batch", side_effect=_fake_batch):
+            first = svc.run("t_runs", self.blocks, ai_enabled=True)
+            self.assertEqual(seen, ["p.sign_date"])
+
+            seen.clear()
+            same = svc.run("t_runs", self.blocks, ai_enabled=True, base_run_id=first.runId)
+            self.assertEqual(seen, [])
+            self.assertEqual(same.summary["incremental"]["reused"], 2)
+            self.assertEqual(same.summary["incremental"]["changedBlocks"], 0)
+            self.assertEqual([x.model_dump() for x in same.items], [x.model_dump() for x in first.items])
+
+            fixed = [self.blocks[0], _make_block("b2", "签订日期：2026年3月")]
+            second = svc.run("t_runs", fixed, ai_enabled=True, base_run_id=same.runId)
+            self.assertEqual(seen, [])
+            self.assertEqual(second.summary["incremental"]["reused"], 1)
+            self.assertEqual(second.summary["incremental"]["reevaluated"], 1)
+            self.assertEqual(second.summary["incremental"]["changedBlocks"], 1)
+            self.assertEqual(second.summary["counts"]["pass"], 2)
+
+        self.assertNotIn("inputs", svc.get_run(second.runId))
+        with self.assertRaises(ValueError):
+            svc.run("t_runs", fixed, ai_enabled=False, base_run_id="chk_missing")
+
+    def test_incremental_run_retries_failed_ai_points(self):
+        from unittest import mock
+        from app.models import CheckAiResult
+
+        svc = CheckService()
+        seen = []
+        replies = [CheckAiResult(raw="AI failed: APITimeoutError()"), CheckAiResult(summary="ok")]
+
+        def _fake_batch(points, definitions=None):
+            seen.extend(p["pointId"] for p in points)
+            reply = replies.pop(0)
+            return {p["pointId"]: reply for p in points}
+
+        with mock.patch.object(svc.llm, "acheck_points_batch", side_effect=_fake_batch):
+            first = svc.run("t_runs", self.blocks, ai_enabled=True)
+            second = svc.run("t_runs", self.blocks, ai_enabled=True, base_run_id=first.runId)
+        self.assertEqual(seen, ["p.sign_date", "p.sign_date"])
+        self.assertEqual(second.summary["incremental"]["reused"], 1)
+        self.assertEqual({x.pointId: x.ai.summary for x in second.items if x.ai}, {"p.sign_date": "ok"})
+
+    def test_incremental_run_tells_blocks_with_a_shared_stable_key_apart(self):
+        dup = [
+            _make_block("b1", "交货地点：上海").model_copy(update={"stableKey": "dup"}),
+            self.blocks[1],
+            _make_block("b3", "交货地点：见附件").model_copy(update={"stableKey": "dup"}),
+        ]
+        svc = CheckService()
+        first = svc.run("t_runs", dup, ai_enabled=False)
+        emptied = [dup[0].model_copy(update={"text": "交货地点：", "htmlFragment": "<p>交货地点：</p>"}), dup[1], dup[2]]
+        second = svc.run("t_runs", emptied, ai_enabled=False, base_run_id=first.runId)
+        by_id = {x.pointId: x for x in second.items}
+        self.assertEqual(second.summary["incremental"]["reevaluated"], 1)
+        self.assertEqual(second.summary["incremental"]["changedBlocks"], 1)
+        self.assertEqual(by_id["p.delivery"].status.value, "fail")
+
+    def test_run_events_stream_ends_with_done(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = TestClient(app)
+        res = client.post(
+            "/api/check/run",
+            json={"templateId": "t_runs", "rightBlocks": [b.model_dump() for b in self.blocks], "aiEnabled": True, "asyncMode": True},
+        )
+        self.assertEqual(res.status_code, 200)
+        run_id = res.json()["runId"]
+        with client.stream("GET", f"/api/check/run/{run_id}/events") as stream:
+            body = "".join(stream.iter_text())
+        self.assertIn("event: progress", body)
+        self.assertIn("event: done", body)
+
+
+class RunStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+
+    def tearDown(self) -> None:
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def _payload(self, run_id: str, template_id: str, state: str = "completed") -> dict:
+        return {
+            "runId": run_id,
+            "templateId": template_id,
+            "templateVersion": "v1",
+            "summary": {"state": state, "counts": {"pass": 1}},
+            "items": [],
+        }
+
+    def test_list_runs_filters_by_template_and_state(self):
+        from app.services.run_store import get_run, list_runs, save_run
+
+        save_run(self._payload("chk_a", "t1"))
+        save_run(self._payload("chk_b", "t2"))
+        save_run(self._payload("chk_c", "t1", state="running"))
+
+        self.assertEqual({x.runId for x in list_runs(template_id="t1")}, {"chk_a", "chk_c"})
+        self.assertEqual([x.runId for x in list_runs(template_id="t1", state="running")], ["chk_c"])
+        self.assertEqual(list_runs(since="2999-01-01T00:00:00Z"), [])
+        self.assertEqual(get_run("chk_b")["templateId"], "t2")
+        self.assertIsNone(get_run("chk_missing"))
+
+    def test_resave_updates_index_state(self):
+        from app.services.run_store import list_runs, save_run
+
+        save_run(self._payload("chk_a", "t1", state="running"))
+        save_run(self._payload("chk_a", "t1", state="completed"))
+        runs = list_runs()
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(runs[0].state, "completed")
+
+    def test_prune_keeps_newest_per_template(self):
+        from app.core.config import settings
+        from app.services import run_store
+
+        prev = settings.CHECK_RUN_MAX_PER_TEMPLATE
+        settings.CHECK_RUN_MAX_PER_TEMPLATE = 2
+        try:
+            for i in range(4):
+                run_store.save_run(self._payload(f"chk_{i}", "t1"))
+                time.sleep(0.01)
+            run_store.prune_runs()
+            self.assertEqual([x.runId for x in run_store.list_runs(template_id="t1")], ["chk_3", "chk_2"])
+            self.assertIsNone(run_store.get_run("chk_0"))
+        finally:
+            settings.CHECK_RUN_MAX_PER_TEMPLATE = prev
+
+
+    def test_prune_by_age_spares_running_runs(self):
+        from unittest import mock
+        from app.core.config import settings
+        from app.services import run_store
+
+        run_store.save_run(self._payload("chk_done", "t1"))
+        run_store.save_run(self._payload("chk_live", "t1", state="running"))
+        with mock.patch.object(settings, "CHECK_RUN_RETENTION_DAYS", 1), mock.patch.object(settings, "CHECK_RUN_STALE_S", 0):
+            self.assertEqual(run_store.prune_runs(now=time.time() + 3 * 86400), 1)
+        self.assertIsNone(run_store.get_run("chk_done"))
+        self.assertEqual(run_store.get_run("chk_live")["summary"]["state"], "running")
+
+    def test_prune_fails_stale_running_runs(self):
+        from unittest import mock
+        from app.core.config import settings
+        from app.services import run_store
+
+        run_store.save_run(self._payload("chk_lost", "t1", state="running"))
+        with mock.patch.object(settings, "CHECK_RUN_STALE_S", 3600), mock.patch.object(settings, "CHECK_RUN_RETENTION_DAYS", 1):
+            self.assertEqual(run_store.prune_runs(now=time.time() + 60), 0)
+            self.assertEqual(run_store.list_runs(state="running")[0].runId, "chk_lost")
+            self.assertEqual(run_store.prune_runs(now=time.time() + 7200), 0)
+            run = run_store.get_run("chk_lost")
+            self.assertEqual(run["summary"]["state"], "failed")
+            self.assertIn("stale", run["summary"]["error"])
+            self.assertEqual([x.runId for x in run_store.list_runs(state="failed")], ["chk_lost"])
+            self.assertEqual(run_store.prune_runs(now=time.time() + 3 * 86400), 1)
+        self.assertIsNone(run_store.get_run("chk_lost"))
+
+    def test_legacy_run_files_are_imported_once(self):
+        from unittest import mock
+        from app.services import run_store
+
+        root = run_store._primary_check_runs_dir()
+        legacy = os.path.join(self._tmp.name, "legacy_check_runs")
+        os.makedirs(legacy)
+        old = self._payload("chk_old", "t1")
+        old["summary"]["generatedAt"] = "2025-01-02T03:04:05+00:00"
+        with open(os.path.join(root, "chk_old.json"), "w", encoding="utf-8") as f:
+            json.dump(old, f)
+        with open(os.path.join(legacy, "chk_older.json"), "w", encoding="utf-8") as f:
+            json.dump(self._payload("chk_older", "t2", state="failed"), f)
+
+        with mock.patch.object(run_store, "_legacy_check_runs_dir", return_value=legacy):
+            self.assertEqual({x.runId for x in run_store.list_runs()}, {"chk_old", "chk_older"})
+            self.assertEqual(run_store.get_run("chk_older")["summary"]["state"], "failed")
+            self.assertEqual(run_store.list_runs(template_id="t1")[0].createdAt, "2025-01-02T03:04:05+00:00")
+            self.assertTrue(os.path.exists(os.path.join(root, "20250102", "chk_old.json.gz")))
+            self.assertFalse(os.path.exists(os.path.join(root, "chk_old.json")))
+            self.assertFalse(os.path.exists(os.path.join(legacy, "chk_older.json")))
+
+            # Lookups no longer probe the directories, and the import does not run again.
+            with open(os.path.join(root, "chk_late.json"), "w", encoding="utf-8") as f:
+                json.dump(self._payload("chk_late", "t1"), f)
+            run_store._schema_ready.clear()
+            self.assertIsNone(run_store.get_run("chk_late"))
+            self.assertTrue(os.path.exists(os.path.join(root, "chk_late.json")))
+
+    def test_schema_runs_once_per_index(self):
+        from unittest import mock
+        from app.services import run_store
+
+        run_store.save_run(self._payload("chk_a", "t1"))
+        calls = []
+        real_connect = run_store.sqlite3.connect
+
+        def _connect(*args, **kwargs):
+            conn = real_connect(*args, **kwargs)
+            conn.set_trace_callback(calls.append)
+            return conn
+
+        with mock.patch.object(run_store.sqlite3, "connect", side_effect=_connect):
+            run_store.save_run(self._payload("chk_b", "t1"))
+            run_store.list_runs()
+        self.assertFalse([c for c in calls if "CREATE TABLE" in c or "journal_mode" in c])
+
+
+class BatchCheckTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+        upsert_ruleset(_ruleset())
+
+    def tearDown(self) -> None:
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def _docx(self, name: str, lines: list) -> str:
+        from docx import Document
+
+        p = os.path.join(self._tmp.name, name)
+        doc = Document()
+        for line in lines:
+            doc.add_paragraph(line)
+        doc.save(p)
+        return p
+
+    def test_batch_aggregates_per_document_runs(self):
+        from app.services.run_store import get_run
+
+        good = self._docx("good.docx", ["交货地点：上海", "签订日期：2026年3月"])
+        bad = self._docx("bad.docx", ["交货地点：", "签订日期：2026年"])
+        broken = os.path.join(self._tmp.name, "broken.docx")
+        with open(broken, "wb") as f:
+            f.write(b"PK not a zip")
+
+        files = [("good.docx", good), ("bad.docx", bad), ("broken.docx", broken)]
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                res = CheckService().run_batch("t_runs", files, ai_enabled=False, workers=workers)
+                self.assertEqual(res.summary["documents"], 3)
+                self.assertEqual(res.summary["succeeded"], 2)
+                self.assertEqual(res.summary["documentsWithFailures"], 1)
+                self.assertEqual(res.summary["failingPoints"], {"p.delivery": 1, "p.sign_date": 1})
+                by_name = {x.filename: x for x in res.items}
+                self.assertFalse(by_name["broken.docx"].ok)
+                stored = get_run(by_name["good.docx"].runId)
+                self.assertEqual(stored["summary"]["batchId"], res.batchId)
+
+
+class BlockFeatureCacheTests(unittest.TestCase):
+    def test_placeholder_scan_runs_once_per_block_per_run(self):
+        from unittest import mock
+        from app.services import check_service
+
+        rs = _ruleset()
+        rs.points.append(
+            CheckPoint(
+                pointId="p.delivery_again",
+                title="交货地点（重复）",
+                anchor=PointAnchor(type=AnchorType.TEXT_REGEX, value="交货地点"),
+                rules=[
+                    CheckRule(type=RuleType.REQUIRED_AFTER_COLON, params={"labelRegex": "交货地点"}),
+                    CheckRule(type=RuleType.FILL_OR_STRIKE, params={}),
+                ],
+            )
+        )
+        blocks = [_make_block("b1", "交货地点：____"), _make_block("b2", "签订日期：")]
+        calls = []
+        real = check_service._has_underline_placeholder
+
+        def _counting(html_fragment):
+            calls.append(html_fragment)
+            return real(html_fragment)
+
+        with mock.patch.object(check_service, "_has_underline_placeholder", _counting):
+            items, _, _ = CheckService()._evaluate(rs, blocks, ai_enabled=False)
+        self.assertEqual(len(items), 3)
+        self.assertEqual(len(calls), len(set(calls)))
@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.models import Block
+from app.services.llm_service import LLMService
+from app.services.llm_usage import collect_usage
+from app.tools.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+
+def _block(i: int, text: str) -> Block:
+    return Block(
+        blockId=f"b{i}",
+        kind="paragraph",
+        structurePath=f"body.p[{i}]",
+        stableKey=f"b{i}",
+        text=text,
+        htmlFragment=f"<p>{text}</p>",
+        meta={},
+    )
+
+
+class FakeLLMServerTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeLLMServer(config=FakeLLMConfig(seed=0, stream_chunk_chars=8)).start()
+        self.svc = LLMService(client=AsyncOpenAI(api_key="fake", base_url=self.server.base_url, max_retries=0))
+        self.svc.model = "fake"
+        self.patches = [
+            mock.patch.object(settings, "LLM_BACKOFF_BASE_S", 0.01),
+            mock.patch.object(settings, "LLM_BACKOFF_MAX_S", 0.02),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.server.stop()
+
+    def test_check_prompts_get_schema_valid_answers(self):
+        one = self.svc.check_point("付款", "检查付款期限", "30日内付款", "fail", "missing")
+        self.assertEqual(one.status, "fail")
+        points = [
+            {"pointId": "p1", "title": "t", "instruction": "i", "evidence": "e", "rule": {"status": "pass", "message": ""}},
+            {"pointId": "p2", "title": "t", "instruction": "i", "evidence": "e", "rule": {"status": "fail", "message": ""}},
+        ]
+        res = self.svc.check_points_batch(points)
+        self.assertEqual(res["p1"].status, "pass")
+        self.assertEqual(res["p2"].status, "fail")
+
+    def test_global_review_is_valid_and_reports_tokens(self):
+        payload = {"templateId": "t", "blocks": [{"blockId": "b1", "text": "付款期限：30日"}], "diffRows": [], "checkRun": None}
+        with collect_usage() as usage:
+            raw = self.svc.global_review(payload, "review")
+        result, error = self.svc.parse_global_review(raw)
+        self.assertIsNone(error)
+        self.assertEqual(result.keyFindings[0]["evidenceIds"], ["b1"])
+        self.assertGreater(usage.summary()["promptTokens"], 0)
+
+    def test_streaming_global_review(self):
+        payload = {"templateId": "t", "blocks": [{"blockId": "b1", "text": "付款期限：30日"}], "diffRows": [], "checkRun": None}
+
+        async def _collect():
+            return [ev async for ev in self.svc.astream_global_review(payload, "review")]
+
+        events = asyncio.run(_collect())
+        deltas = [d for kind, d in events if kind == "delta"]
+        self.assertGreater(len(deltas), 1)
+        kind, done = events[-1]
+        self.assertEqual(kind, "done")
+        self.assertTrue(done["valid"])
+
+    def test_analyze_cites_blocks(self):
+        res = self.svc.analyze_risk([_block(1, "付款期限：30日"), _block(2, "违约金：5%")], "付款风险")
+        self.assertIn("[b1]", res["analysis"])
+
+    def test_injected_errors_are_retried(self):
+        self.server.script = [(429, 0.0), (500, 0.0)]
+        with mock.patch.object(settings, "LLM_MAX_RETRIES", 3):
+            one = self.svc.check_point("t", "i", "e", "pass", "")
+        self.assertEqual(one.status, "pass")
+        self.assertEqual(self.server.requests, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
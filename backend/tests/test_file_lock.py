@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
+
+from app.services.file_lock import RWLock, exclusive_lock, shared_lock
+
+
+def _hold_exclusive(path, held, release):
+    with exclusive_lock(path):
+        held.set()
+        release.wait(10)
+
+
+class FileLockTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "store.json")
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_readers_share_the_lock(self):
+        both_inside = threading.Barrier(2, timeout=5)
+        errors = []
+
+        def _reader():
+            try:
+                with shared_lock(self.path, timeout_s=5):
+                    both_inside.wait()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=_reader) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+    def test_writer_excludes_readers_until_timeout(self):
+        with exclusive_lock(self.path):
+            errors = []
+            t = threading.Thread(target=lambda: errors.append(self._try_shared()))
+            t.start()
+            t.join()
+            self.assertIsInstance(errors[0], RuntimeError)
+        with shared_lock(self.path, timeout_s=0.1):
+            pass
+
+    def _try_shared(self):
+        try:
+            with shared_lock(self.path, timeout_s=0.1):
+                return None
+        except RuntimeError as e:
+            return e
+
+    def test_exclusive_across_processes(self):
+        ctx = multiprocessing.get_context("fork")
+        held, release = ctx.Event(), ctx.Event()
+        proc = ctx.Process(target=_hold_exclusive, args=(self.path, held, release))
+        proc.start()
+        try:
+            self.assertTrue(held.wait(5))
+            with self.assertRaises(RuntimeError):
+                with exclusive_lock(self.path, timeout_s=0.2):
+                    pass
+        finally:
+            release.set()
+            proc.join(5)
+        with exclusive_lock(self.path, timeout_s=5):
+            self.assertTrue(os.path.exists(self.path + ".lock"))
+
+    def test_reads_inside_own_write_lock_do_not_deadlock(self):
+        with exclusive_lock(self.path, timeout_s=1):
+            with shared_lock(self.path, timeout_s=1):
+                pass
+            with exclusive_lock(self.path, timeout_s=1):
+                pass
+        with shared_lock(self.path, timeout_s=1):
+            with self.assertRaises(RuntimeError):
+                with exclusive_lock(self.path, timeout_s=1):
+                    pass
+
+    def test_waiting_writer_blocks_new_readers(self):
+        lock = RWLock()
+        self.assertTrue(lock.acquire_read())
+        writer = threading.Thread(target=lambda: lock.acquire_write(5) and lock.release_write())
+        writer.start()
+        while not lock._waiting_writers:
+            threading.Event().wait(0.01)
+        self.assertFalse(lock.acquire_read(timeout_s=0.05))
+        lock.release_read()
+        writer.join(5)
+        self.assertTrue(lock.acquire_read(timeout_s=1))
+        lock.release_read()
+
+
+if __name__ == "__main__":
+    unittest.main()
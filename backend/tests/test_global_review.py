@@ -0,0 +1,181 @@
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.core.config import settings
+from app.services.global_review import split_sections
+
+
+def _payload(n_sections: int = 30, clauses: int = 9):
+    blocks, rows, items = [], [], []
+    i = 0
+    for s in range(1, n_sections + 1):
+        for c in range(clauses + 1):
+            i += 1
+            text = f"第{s}条：总则" if c == 0 else f"{s}.{c} 甲方应当在约定期限内履行第{s}条项下的义务。" * 6
+            bid = f"b_{i:04d}"
+            blocks.append({"blockId": bid, "kind": "paragraph", "text": text})
+            rows.append({"rowId": f"r_{i}", "kind": "changed" if c == 1 else "matched", "leftBlockId": bid, "rightBlockId": bid, "rightDiffHtml": text})
+            if c == 2:
+                items.append({"pointId": f"p{s}", "status": "fail", "evidence": {"rightBlockId": bid}})
+    rows.insert(5, {"rowId": "r_del", "kind": "deleted", "leftBlockId": "l_1", "rightBlockId": None})
+    items.append({"pointId": "p_missing", "status": "fail", "evidence": {}})
+    return {"templateId": "t", "blocks": blocks, "diffRows": rows, "checkRun": {"summary": {"counts": {"fail": 31}}, "items": items}}
+
+
+def _response(content: str):
+    return SimpleNamespace(id="cmpl", choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class GlobalReviewSplitTests(unittest.TestCase):
+    def test_sections_cover_every_block_once_and_fit_the_budget(self):
+        payload = _payload()
+        sections = split_sections(payload, 8000)
+        self.assertGreater(len(sections), 1)
+        seen = [b["blockId"] for sec in sections for b in sec["blocks"]]
+        self.assertEqual(seen, [b["blockId"] for b in payload["blocks"]])
+        for sec in sections:
+            self.assertLessEqual(len(json.dumps(sec, ensure_ascii=False)), 8000)
+            ids = {b["blockId"] for b in sec["blocks"]}
+            self.assertTrue(all(r.get("rightBlockId") in ids or r["kind"] == "deleted" for r in sec["diffRows"]))
+            self.assertTrue(all(it["evidence"]["rightBlockId"] in ids for it in sec["checkRun"]["items"]))
+        self.assertIn("r_del", [r["rowId"] for r in sections[0]["diffRows"]])
+        self.assertTrue(sections[1]["blocks"][0]["text"].startswith("第"))
+
+
+class GlobalReviewMapReduceTests(unittest.TestCase):
+    def _service(self):
+        from app.services.llm_service import LLMService
+
+        svc = LLMService()
+        svc._configured = lambda: True
+        return svc
+
+    def test_map_reduce_reviews_sections_then_merges(self):
+        svc = self._service()
+        calls = []
+
+        async def _fake_create(messages, **kwargs):
+            user = json.loads(messages[-1]["content"])
+            calls.append(user["input"])
+            if "sections" in user["input"]:
+                return _response(json.dumps({"overallRiskLevel": "high", "summary": "merged", "keyFindings": [{"title": "k"}], "improvementSuggestions": [], "missingInformation": [], "confidence": 0.7}))
+            first = user["input"]["blocks"][0]["blockId"]
+            return _response(
+                json.dumps(
+                    {
+                        "overallRiskLevel": "medium",
+                        "summary": f"section {first}",
+                        "keyFindings": [{"title": f"f {first}", "detail": "", "evidenceIds": [first]}],
+                        "improvementSuggestions": [],
+                        "missingInformation": [],
+                        "confidence": 0.8,
+                        "blockReviews": [{"blockId": first, "riskLevel": "medium", "issues": ["x"], "suggestions": []}],
+                    }
+                )
+            )
+
+        with mock.patch.object(settings, "GLOBAL_REVIEW_SECTION_MAX_CHARS", 8000), mock.patch.object(svc, "_acreate", _fake_create):
+            raw = svc.global_review(_payload(), "review")
+
+        out = json.loads(raw)
+        n_sections = out["mapReduce"]["sections"]
+        self.assertGreater(n_sections, 1)
+        self.assertEqual(len(calls), n_sections + 1)
+        self.assertEqual(out["summary"], "merged")
+        self.assertEqual(len(out["sections"]), n_sections)
+        self.assertEqual(len(out["blockReviews"]), n_sections)
+        self.assertEqual(calls[-1]["checkRun"]["unplacedItems"][0]["pointId"], "p_missing")
+        self.assertIsNotNone(svc.parse_global_review(raw)[0])
+
+    def test_reduce_prompt_stays_within_budget_for_many_sections(self):
+        svc = self._service()
+        reduce_inputs = []
+
+        async def _fake_create(messages, **kwargs):
+            user = json.loads(messages[-1]["content"])
+            if "sections" in user["input"]:
+                reduce_inputs.append(user["input"]["sections"])
+                return _response(json.dumps({"overallRiskLevel": "high", "summary": "merged"}))
+            first = user["input"]["blocks"][0]["blockId"]
+            finding = {"title": f"f {first}", "detail": "逾期交货的违约责任约定不明确，" * 40, "evidenceIds": [first]}
+            return _response(json.dumps({"overallRiskLevel": "medium", "summary": "本节风险较高。" * 60, "keyFindings": [finding] * 10}))
+
+        with mock.patch.object(settings, "GLOBAL_REVIEW_SECTION_MAX_CHARS", 4000), mock.patch.object(svc, "_acreate", _fake_create):
+            out = json.loads(svc.global_review(_payload(60, 2), "review"))
+
+        sections = reduce_inputs[0]
+        self.assertGreater(len(sections), 10)
+        self.assertEqual(len(sections), out["mapReduce"]["sections"])
+        self.assertLessEqual(len(json.dumps(sections, ensure_ascii=False)), 4000)
+        self.assertTrue(all(s["title"] and s["overallRiskLevel"] == "medium" for s in sections))
+        self.assertEqual(out["summary"], "merged")
+
+    def test_stream_map_reduces_long_payloads_with_section_progress(self):
+        import asyncio
+
+        svc = self._service()
+        calls = []
+
+        async def _fake_create(messages, **kwargs):
+            user = json.loads(messages[-1]["content"])
+            calls.append(user["input"])
+            if "sections" in user["input"]:
+                return _response(json.dumps({"overallRiskLevel": "high", "summary": "merged"}))
+            return _response(json.dumps({"overallRiskLevel": "medium", "summary": "s", "keyFindings": [{"title": "f"}]}))
+
+        async def _stream_not_used(*args, **kwargs):
+            raise AssertionError("single prompt streamed")
+            yield
+
+        async def _drain():
+            return [e async for e in svc.astream_global_review(_payload(), "review")]
+
+        payload_chars = len(json.dumps(_payload(), ensure_ascii=False))
+        with mock.patch.object(settings, "GLOBAL_REVIEW_SECTION_MAX_CHARS", 8000), mock.patch.object(
+            svc, "_acreate", _fake_create
+        ), mock.patch.object(svc, "_astream_text", _stream_not_used):
+            self.assertGreater(payload_chars, 8000)
+            events = asyncio.run(_drain())
+
+        progress = [d for e, d in events if e == "section"]
+        self.assertEqual([e for e, _ in events], ["section"] * len(progress) + ["done"])
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(sorted(d["index"] for d in progress), list(range(len(progress))))
+        self.assertTrue(all(d["ok"] and d["total"] == len(progress) for d in progress))
+        self.assertEqual(len(calls), len(progress) + 1)
+        done = events[-1][1]
+        self.assertTrue(done["valid"])
+        self.assertEqual(done["result"]["summary"], "merged")
+        self.assertEqual(json.loads(done["raw"])["mapReduce"]["sections"], len(progress))
+
+    def test_invalid_reduce_falls_back_to_local_merge(self):
+        svc = self._service()
+
+        async def _fake_create(messages, **kwargs):
+            user = json.loads(messages[-1]["content"])
+            if "sections" in user["input"]:
+                return _response("not json")
+            return _response(json.dumps({"overallRiskLevel": "low", "summary": "s", "keyFindings": [{"title": "f"}], "confidence": 0.5}))
+
+        with mock.patch.object(settings, "GLOBAL_REVIEW_MODE", "map_reduce"), mock.patch.object(svc, "_acreate", _fake_create):
+            out = json.loads(svc.global_review(_payload(3, 2), "review"))
+        self.assertEqual(out["overallRiskLevel"], "low")
+        self.assertEqual(len(out["keyFindings"]), out["mapReduce"]["sections"])
+
+    def test_short_payload_uses_single_prompt(self):
+        svc = self._service()
+        calls = []
+
+        async def _fake_create(messages, **kwargs):
+            calls.append(messages)
+            return _response("{}")
+
+        with mock.patch.object(svc, "_acreate", _fake_create):
+            self.assertEqual(svc.global_review(_payload(2, 2), "review"), "{}")
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app.core.config import settings
+from app.models import Ruleset
+from app.services import ruleset_store
+from app.services.journal import JournaledMap
+from app.services.store_cache import file_key
+
+
+def _map() -> JournaledMap:
+    return JournaledMap(lambda p: dict(p.get("items") or {}), lambda items: {"items": items})
+
+
+class JournaledMapTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "store.json")
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"items": {"a": 1}}, f)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_writes_append_without_rewriting_the_snapshot(self):
+        m = _map()
+        before = file_key(self.path)
+        m.apply(self.path, [("b", 2), ("a", None)])
+        self.assertEqual(file_key(self.path), before)
+        self.assertEqual(m.items(self.path), {"b": 2})
+        with open(m.journal_path(self.path), encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+
+    def test_other_readers_catch_up_incrementally(self):
+        writer, reader = _map(), _map()
+        self.assertEqual(reader.items(self.path), {"a": 1})
+        writer.apply(self.path, [("b", 2)])
+        with mock.patch.object(reader, "_reload", side_effect=AssertionError("snapshot reloaded")):
+            self.assertEqual(reader.items(self.path), {"a": 1, "b": 2})
+
+    def test_compaction_is_idempotent_after_a_crash(self):
+        m = _map()
+        m.apply(self.path, [("b", 2), ("c", 3)])
+        with open(m.journal_path(self.path), "rb") as f:
+            journal = f.read()
+        m.compact(self.path)
+        with open(self.path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        self.assertEqual(snapshot["journalSeq"], 2)
+        self.assertEqual(os.path.getsize(m.journal_path(self.path)), 0)
+        # Crash between writing the snapshot and resetting the journal: old records replay as no-ops.
+        with open(m.journal_path(self.path), "wb") as f:
+            f.write(journal)
+        self.assertEqual(_map().items(self.path), {"a": 1, "b": 2, "c": 3})
+
+    def test_torn_tail_is_ignored_then_truncated(self):
+        m = _map()
+        m.apply(self.path, [("b", 2)])
+        with open(m.journal_path(self.path), "ab") as f:
+            f.write(b'{"seq":2,"key":"x","val')
+        self.assertEqual(_map().items(self.path), {"a": 1, "b": 2})
+        other = _map()
+        other.apply(self.path, [("c", 3)])
+        self.assertEqual(_map().items(self.path), {"a": 1, "b": 2, "c": 3})
+
+    def test_background_compaction(self):
+        m = _map()
+        with mock.patch.object(settings, "STORE_JOURNAL_COMPACT_RECORDS", 3):
+            for i in range(3):
+                m.apply(self.path, [(f"k{i}", i)])
+            deadline = time.monotonic() + 5
+            while os.path.getsize(m.journal_path(self.path)) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(os.path.getsize(m.journal_path(self.path)), 0)
+        self.assertEqual(_map().items(self.path), {"a": 1, "k0": 0, "k1": 1, "k2": 2})
+
+
+class JournaledStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+
+    def tearDown(self) -> None:
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def test_ruleset_upsert_only_appends(self):
+        ruleset_store.ensure_rulesets_file()
+        path = ruleset_store._rulesets_file_path()
+        before = file_key(path)
+        ruleset_store.upsert_ruleset(Ruleset(templateId="t1", name="T1", version="v1", referenceData={}, points=[]))
+        ruleset_store.delete_ruleset("sales_contract_cn")
+        self.assertEqual(file_key(path), before)
+        self.assertEqual([x.templateId for x in ruleset_store.list_rulesets()], ["t1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import unittest
+
+from app.services.llm_client import get_llm_service, run_on_llm_loop, run_sync
+
+
+class LLMClientTests(unittest.TestCase):
+    def test_service_is_shared(self):
+        from app.api.routers import documents, prompts
+        from app.api.routers.checks import check_service
+
+        svc = get_llm_service()
+        self.assertIs(documents.llm_service, svc)
+        self.assertIs(prompts.llm_service, svc)
+        self.assertIs(check_service.llm, svc)
+
+    def test_calls_from_threads_and_loops_share_one_loop(self):
+        async def _loop_name():
+            await asyncio.sleep(0)
+            return threading.current_thread().name
+
+        self.assertEqual(run_sync(_loop_name()), "llm-loop")
+        self.assertEqual(asyncio.run(run_on_llm_loop(_loop_name())), "llm-loop")
+
+        async def _nested():
+            coro = _loop_name()
+            try:
+                run_sync(coro)
+            finally:
+                coro.close()
+
+        with self.assertRaises(RuntimeError):
+            run_sync(_nested())
+
+    def test_unconfigured_service_skips_ai(self):
+        from app.services.llm_service import LLMService
+
+        svc = LLMService()
+        svc.api_key = ""
+        res = svc.check_points_batch([{"pointId": "p1"}])
+        self.assertIn("AI skipped", res["p1"].raw or "")
+
+
+if __name__ == "__main__":
+    unittest.main()
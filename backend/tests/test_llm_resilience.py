@@ -0,0 +1,236 @@
+import time
+import unittest
+from unittest import mock
+
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.services.llm_resilience import CircuitOpenError, ResilientCaller
+from app.services.llm_service import LLMService
+from app.tools.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+
+def _provider() -> FakeLLMServer:
+    return FakeLLMServer(config=FakeLLMConfig(seed=0)).start()
+
+
+def _points(n: int):
+    return [{"pointId": f"p{i}", "title": "t", "instruction": "i", "evidence": "e", "rule": {"status": "pass"}} for i in range(n)]
+
+
+class LLMResilienceTests(unittest.TestCase):
+    def setUp(self):
+        self.provider = _provider()
+        self.patches = [
+            mock.patch.object(settings, "LLM_BACKOFF_BASE_S", 0.01),
+            mock.patch.object(settings, "LLM_BACKOFF_MAX_S", 0.02),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.provider.stop()
+
+    def _service(self) -> LLMService:
+        client = AsyncOpenAI(api_key="test", base_url=self.provider.base_url, max_retries=0)
+        return LLMService(client=client)
+
+    def test_retries_rate_limited_calls(self):
+        self.provider.script = [(429, 0.0), (503, 0.0)]
+        with mock.patch.object(settings, "LLM_MAX_RETRIES", 3):
+            res = self._service().check_points_batch(_points(2))
+        self.assertEqual(self.provider.requests, 3)
+        self.assertEqual(res["p1"].status, "pass")
+
+    def test_breaker_opens_and_skips_without_calling_provider(self):
+        self.provider.config.error_rate = 1.0
+        with mock.patch.object(settings, "LLM_MAX_RETRIES", 0), mock.patch.object(settings, "LLM_BREAKER_FAILURES", 2):
+            svc = self._service()
+            for _ in range(2):
+                with self.assertRaises(Exception):
+                    svc.check_points_batch(_points(1))
+            calls = self.provider.requests
+            res = svc.check_points_batch(_points(1))
+            self.assertEqual(self.provider.requests, calls)
+            self.assertTrue((res["p0"].raw or "").startswith("AI skipped"))
+
+            svc.resilience.breaker.reset_s = 0.0
+            self.provider.config.error_rate = 0.0
+            res = svc.check_points_batch(_points(1))
+            self.assertEqual(res["p0"].status, "pass")
+            self.assertEqual(svc.resilience.breaker.state, "closed")
+
+    def test_hedges_slow_call_after_p95(self):
+        self.provider.script = [(200, 2.0)]
+        with mock.patch.object(settings, "LLM_HEDGE_ENABLED", True), mock.patch.object(settings, "LLM_HEDGE_MIN_SAMPLES", 1):
+            svc = self._service()
+            for _ in range(5):
+                svc.resilience.latency.record(0.05)
+            t0 = time.monotonic()
+            res = svc.check_points_batch(_points(1))
+            elapsed = time.monotonic() - t0
+        self.assertEqual(res["p0"].status, "pass")
+        self.assertEqual(self.provider.requests, 2)
+        self.assertLess(elapsed, 1.5)
+
+    def test_check_run_skips_per_point_fallback_when_provider_is_failing(self):
+        from app.models import CheckResultItem, CheckStatus
+        from app.services.check_service import CheckService
+        from app.services.llm_client import run_sync
+
+        self.provider.config.error_rate = 1.0
+        with mock.patch.object(settings, "LLM_MAX_RETRIES", 1), mock.patch.object(settings, "LLM_BREAKER_FAILURES", 100):
+            svc = CheckService(llm=self._service())
+            chunk = _points(5)
+            items = {
+                p["pointId"]: CheckResultItem(pointId=p["pointId"], title="t", severity="medium", status=CheckStatus.PASS, message="")
+                for p in chunk
+            }
+            run_sync(svc._afill_ai([(chunk, items)]))
+        self.assertEqual(self.provider.requests, 2)
+        self.assertTrue(all((x.ai.raw or "").startswith("AI failed") for x in items.values()))
+
+
+class HalfOpenProbeTests(unittest.TestCase):
+    def _open_caller(self) -> ResilientCaller:
+        caller = ResilientCaller()
+        caller.breaker.failures = 1
+        caller.breaker.reset_s = 0.0
+        caller.breaker.record_failure()
+        self.assertEqual(caller.breaker.state, "open")
+        return caller
+
+    async def _ok(self):
+        return "ok"
+
+    def test_non_retryable_probe_closes_the_breaker(self):
+        import asyncio
+
+        caller = self._open_caller()
+
+        async def _bad_request():
+            raise ValueError("unparseable response")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(caller.call(_bad_request))
+        self.assertEqual(caller.breaker.state, "closed")
+        self.assertEqual(asyncio.run(caller.call(self._ok)), "ok")
+
+    def test_cancelled_probe_lets_the_next_call_probe(self):
+        import asyncio
+
+        caller = self._open_caller()
+
+        async def _cancel_probe():
+            task = asyncio.ensure_future(caller.call(lambda: asyncio.sleep(10)))
+            await asyncio.sleep(0.01)
+            self.assertEqual(caller.breaker.state, "half_open")
+            with self.assertRaises(CircuitOpenError):
+                await caller.call(self._ok)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return await caller.call(self._ok)
+
+        self.assertEqual(asyncio.run(_cancel_probe()), "ok")
+        self.assertEqual(caller.breaker.state, "closed")
+
+
+class ModelRoutingTests(unittest.TestCase):
+    def setUp(self):
+        self.provider = _provider()
+        self.svc = LLMService(client=AsyncOpenAI(api_key="test", base_url=self.provider.base_url, max_retries=0))
+        self.svc.model = "default-model"
+
+    def tearDown(self):
+        self.provider.stop()
+
+    def test_tasks_use_their_configured_models(self):
+        from app.services.llm_usage import collect_usage
+
+        payload = {"templateId": "t", "blocks": [{"blockId": "b1", "text": "x"}], "diffRows": [], "checkRun": None}
+        with mock.patch.object(settings, "LLM_MODEL_CHECK_BATCH", "small"), mock.patch.object(
+            settings, "LLM_MODEL_GLOBAL_REVIEW", "large"
+        ), mock.patch.object(settings, "GLOBAL_REVIEW_MODE", "single"), collect_usage() as usage:
+            self.svc.check_points_batch(_points(2))
+            self.svc.global_review(payload, "review")
+            self.svc.check_point("t", "i", "e", "pass", "")
+        self.assertEqual(usage.summary()["models"], {"small": 1, "large": 1, "default-model": 1})
+        self.assertEqual(set(self.svc.metrics_snapshot()["models"]), {"small", "large", "default-model"})
+
+    def test_streamed_tasks_record_time_to_first_token_for_their_model(self):
+        import asyncio
+
+        from app.models import Block, BlockKind, BlockMeta
+
+        blocks = [Block(blockId="b1", kind=BlockKind.PARAGRAPH, structurePath="body.p[0]", stableKey="b1", text="付款期限：30日", htmlFragment="", meta=BlockMeta())]
+
+        async def _drain():
+            return [e async for e in self.svc.astream_analyze_risk(blocks, "付款")]
+
+        with mock.patch.object(settings, "LLM_MODEL_ANALYZE", "streamer"):
+            events = asyncio.run(_drain())
+        self.assertEqual(events[-1][0], "done")
+        self.assertEqual(self.svc.resilience.latency_for("streamer").count(), 1)
+
+    def test_slow_model_falls_back_until_probe(self):
+        with mock.patch.object(settings, "LLM_MODEL_CHECK_BATCH", "small"), mock.patch.object(
+            settings, "LLM_MODEL_FALLBACK", "backup"
+        ), mock.patch.object(settings, "LLM_FALLBACK_P95_S", 1.0), mock.patch.object(
+            settings, "LLM_FALLBACK_MIN_SAMPLES", 3
+        ), mock.patch.object(settings, "LLM_FALLBACK_PROBE_S", 60.0):
+            self.assertEqual(self.svc.model_for("check_batch"), "small")
+            for _ in range(3):
+                self.svc.resilience.latency_for("small").record(5.0)
+            self.assertEqual(self.svc.model_for("check_batch"), "small")
+            self.assertEqual(self.svc.model_for("check_batch"), "backup")
+            self.assertEqual(self.svc.model_for("check_batch"), "backup")
+            self.assertEqual(self.svc.model_for("analyze"), "default-model")
+            self.svc._primary_probe_at["small"] -= 61.0
+            self.assertEqual(self.svc.model_for("check_batch"), "small")
+        self.assertEqual(self.svc.metrics_snapshot()["modelFallbacks"], 2)
+
+
+class SingleFlightTests(unittest.TestCase):
+    def setUp(self):
+        self.provider = _provider()
+        self.provider.config.latency_ms = 300.0
+
+    def tearDown(self):
+        self.provider.stop()
+
+    def test_identical_concurrent_requests_share_one_call(self):
+        import asyncio
+
+        svc = LLMService(client=AsyncOpenAI(api_key="test", base_url=self.provider.base_url, max_retries=0))
+
+        async def _burst():
+            same = [svc.acheck_points_batch(_points(2)) for _ in range(5)]
+            other = svc.acheck_points_batch(_points(3))
+            return await asyncio.gather(*same, other)
+
+        results = asyncio.run(_burst())
+        self.assertEqual(self.provider.requests, 2)
+        self.assertTrue(all(r["p1"].status == "pass" for r in results))
+        snap = svc.metrics_snapshot()
+        self.assertEqual(snap["coalesced"], 4)
+        self.assertEqual(snap["requests"], 6)
+        self.assertEqual(snap["providerCalls"], 2)
+        self.assertEqual(snap["inFlight"], 0)
+
+        svc.check_points_batch(_points(2))
+        self.assertEqual(self.provider.requests, 3)
+
+    def test_metrics_endpoint(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        res = TestClient(app).get("/api/metrics/llm")
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("breakerState", res.json())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.services.llm_service import LLMService
+from app.services.llm_usage import collect_usage, usage_totals
+
+
+class _FakeCompletions:
+    def __init__(self, delay_s: float = 0.0):
+        self.delay_s = delay_s
+        self.calls = 0
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay_s)
+        user = json.loads(messages[-1]["content"])
+        points = user.get("points") or []
+        content = json.dumps({"results": [{"pointId": p["pointId"], "status": "pass", "summary": "ok"} for p in points]}) if points else "{}"
+        return SimpleNamespace(
+            id="cmpl",
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30),
+        )
+
+
+def _service(delay_s: float = 0.0) -> LLMService:
+    completions = _FakeCompletions(delay_s)
+    return LLMService(client=SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+
+class LLMUsageTests(unittest.TestCase):
+    def test_collectors_nest_and_coalesced_calls_cost_nothing(self):
+        svc = _service(delay_s=0.1)
+        points = [{"pointId": "p1"}]
+
+        async def _burst():
+            with collect_usage() as outer:
+                with collect_usage() as inner:
+                    await asyncio.gather(svc.acheck_points_batch(points), svc.acheck_points_batch(points))
+                await svc.acheck_point("t", "i", "e", "pass", "")
+            return outer.summary(), inner.summary()
+
+        outer, inner = asyncio.run(_burst())
+        self.assertEqual(inner["calls"], 2)
+        self.assertEqual(inner["coalesced"], 1)
+        self.assertEqual(inner["promptTokens"], 120)
+        self.assertEqual(inner["tasks"]["check_batch"]["calls"], 2)
+        self.assertEqual(outer["calls"], 3)
+        self.assertEqual(outer["totalTokens"], 300)
+        self.assertEqual(outer["tasks"]["check_point"]["completionTokens"], 30)
+
+    def test_check_run_summary_carries_llm_usage(self):
+        from app.services.check_service import CheckService
+        from app.services.ruleset_store import upsert_ruleset
+        from test_check_runs import _make_block, _ruleset
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {"DOC_COMPARISON_DATA_DIR": tmp}):
+            upsert_ruleset(_ruleset())
+            blocks = [_make_block("b1", "交货地点：上海"), _make_block("b2", "签订日期：2026年")]
+            resp = CheckService(llm=_service()).run("t_runs", blocks, ai_enabled=True)
+        usage = resp.summary["llmUsage"]
+        self.assertEqual(usage["calls"], 1)
+        self.assertEqual(usage["promptTokens"], 120)
+        self.assertEqual(sum(usage["models"].values()), 1)
+
+    def test_global_analyze_reports_usage_and_endpoint_totals(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.services.llm_client import get_llm_service
+
+        svc = get_llm_service()
+        fake = _service()._client
+        with mock.patch.object(svc, "_client", fake):
+            res = TestClient(app).post(
+                "/api/analyze/global",
+                json={"templateId": "t", "rightBlocks": [], "promptOverride": "review"},
+            )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["usage"]["calls"], 1)
+        self.assertEqual(res.json()["usage"]["tasks"]["global_review"]["promptTokens"], 120)
+        endpoint = usage_totals()["endpoints"]["/api/analyze/global"]
+        self.assertGreaterEqual(endpoint["calls"], 1)
+        metrics = TestClient(app).get("/api/metrics/llm").json()
+        self.assertIn("/api/analyze/global", metrics["usage"]["endpoints"])
+
+
+class _BrokenStream:
+    def __init__(self, fail_open: bool):
+        self.fail_open = fail_open
+        self.kwargs = None
+
+    async def create(self, **kwargs):
+        self.kwargs = kwargs
+        if self.fail_open:
+            raise ValueError("bad request")
+        return self
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        yield SimpleNamespace(id="cmpl", usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content="部分"))])
+        raise ConnectionError("stream cut")
+
+    async def close(self):
+        pass
+
+
+class StreamUsageTests(unittest.TestCase):
+    def _drain(self, svc: LLMService):
+        async def _run():
+            with collect_usage() as agg:
+                try:
+                    async for _ in svc._astream_text([{"role": "user", "content": "x"}], task="analyze"):
+                        pass
+                except Exception:
+                    pass
+            return agg.summary()
+
+        return asyncio.run(_run())
+
+    def test_streamed_calls_request_and_record_usage(self):
+        from openai import AsyncOpenAI
+        from app.tools.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+        provider = FakeLLMServer(config=FakeLLMConfig(seed=0)).start()
+        try:
+            svc = LLMService(client=AsyncOpenAI(api_key="test", base_url=provider.base_url, max_retries=0))
+            summary = self._drain(svc)
+        finally:
+            provider.stop()
+        self.assertEqual(summary["calls"], 1)
+        self.assertEqual(summary["failed"], 0)
+        self.assertGreater(summary["promptTokens"], 0)
+        self.assertGreater(summary["completionTokens"], 0)
+
+    def test_failed_streams_are_recorded_as_failed(self):
+        for fail_open in (True, False):
+            completions = _BrokenStream(fail_open)
+            svc = LLMService(client=SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+            summary = self._drain(svc)
+            self.assertEqual((summary["calls"], summary["failed"]), (1, 1), fail_open)
+            self.assertEqual(completions.kwargs["stream_options"], {"include_usage": True})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import unittest
+
+from openai import AsyncOpenAI
+
+from app.services.check_service import CheckService
+from app.services.llm_service import LLMService
+from app.services.llm_usage import collect_usage
+from app.tools.fake_llm_server import FakeLLMConfig, FakeLLMServer
+from test_check_runs import _ruleset
+
+
+def _prefix_bytes(messages) -> bytes:
+    return json.dumps(messages[:-1], ensure_ascii=False).encode("utf-8")
+
+
+def _task(point_id: str, evidence: str, status: str):
+    return {"pointId": point_id, "title": "t", "instruction": "i", "evidence": evidence, "rule": {"status": status, "message": ""}}
+
+
+class PromptPrefixTests(unittest.TestCase):
+    def setUp(self):
+        self.svc = LLMService(client=object())
+
+    def test_batch_chunks_share_ruleset_prefix(self):
+        definitions = CheckService(llm=self.svc)._ai_definitions(_ruleset())
+        self.assertEqual(definitions, CheckService(llm=self.svc)._ai_definitions(_ruleset()))
+        a = self.svc._check_points_batch_messages([_task("p.delivery", "交货地点：上海", "pass")], definitions)
+        b = self.svc._check_points_batch_messages([_task("p.sign_date", "签订日期：2026年", "fail")], definitions)
+        self.assertEqual(_prefix_bytes(a), _prefix_bytes(b))
+        self.assertNotEqual(a[-1]["content"], b[-1]["content"])
+        self.assertNotIn("交货地点：上海", _prefix_bytes(a).decode("utf-8"))
+        self.assertNotIn("title", json.loads(a[-1]["content"])["points"][0])
+
+    def test_undefined_points_carry_their_own_instruction(self):
+        msgs = self.svc._check_points_batch_messages([_task("p.other", "x", "warn")], [{"pointId": "p.delivery", "title": "t", "instruction": "i"}])
+        self.assertEqual(json.loads(msgs[-1]["content"])["points"][0]["instruction"], "i")
+
+    def test_global_review_prefix_is_document_independent(self):
+        doc1 = {"templateId": "t", "blocks": [{"blockId": "b1", "text": "甲"}], "diffRows": [], "checkRun": None}
+        doc2 = {"templateId": "t", "blocks": [{"blockId": "b9", "text": "乙"}], "diffRows": [], "checkRun": None}
+        a = self.svc._global_review_messages(doc1, "审阅要点")
+        b = self.svc._global_review_messages(doc2, "审阅要点")
+        self.assertEqual(_prefix_bytes(a), _prefix_bytes(b))
+        self.assertEqual(
+            _prefix_bytes(self.svc._global_reduce_messages(doc1, "审阅要点")),
+            _prefix_bytes(self.svc._global_reduce_messages(doc2, "审阅要点")),
+        )
+
+
+class CachedTokenReportingTests(unittest.TestCase):
+    def test_cached_tokens_are_reported(self):
+        with FakeLLMServer(config=FakeLLMConfig(seed=0)) as server:
+            svc = LLMService(client=AsyncOpenAI(api_key="fake", base_url=server.base_url, max_retries=0))
+            definitions = CheckService(llm=svc)._ai_definitions(_ruleset())
+            with collect_usage() as usage:
+                svc.check_points_batch([_task("p.delivery", "交货地点：上海", "pass")], definitions)
+                svc.check_points_batch([_task("p.sign_date", "签订日期：2026年", "fail")], definitions)
+        summary = usage.summary()
+        self.assertGreater(summary["cachedTokens"], 0)
+        self.assertGreater(summary["cacheHitRatio"], 0)
+        self.assertEqual(summary["tasks"]["check_batch"]["cachedTokens"], summary["cachedTokens"])
+
+
+if __name__ == "__main__":
+    unittest.main()
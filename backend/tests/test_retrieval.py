@@ -0,0 +1,81 @@
+import unittest
+from unittest import mock
+
+from app.core.config import settings
+from app.models import Block, BlockKind, BlockMeta
+from app.services import retrieval
+from app.services.retrieval import get_block_index, select_blocks, tokenize
+
+
+def _block(i: int, text: str) -> Block:
+    return Block(
+        blockId=f"b_{i:04d}",
+        kind=BlockKind.PARAGRAPH,
+        structurePath=f"body.p[{i}]",
+        stableKey=f"b_{i:04d}",
+        text=text,
+        htmlFragment=f"<p>{text}</p>",
+        meta=BlockMeta(),
+    )
+
+
+def _contract(n: int = 60):
+    blocks = [_block(i, f"第{i}条 双方应当按照本合同约定履行义务，不得擅自变更。") for i in range(n)]
+    blocks[30] = _block(30, "第30条 违约责任：乙方逾期交货的，每日按合同总价的0.5%支付违约金。")
+    blocks[45] = _block(45, "第45条 付款方式：甲方应在验收合格后30日内支付货款，账户 6222 0000 1234。")
+    return blocks
+
+
+class RetrievalTests(unittest.TestCase):
+    def test_tokenize_mixes_cjk_bigrams_and_words(self):
+        self.assertEqual(tokenize("违约金 0.5% Net-30"), ["违约", "约金", "0.5", "net-30"])
+        self.assertEqual(tokenize("甲"), ["甲"])
+
+    def test_selects_top_hits_with_neighbours_in_document_order(self):
+        blocks = _contract()
+        with mock.patch.object(settings, "ANALYZE_RETRIEVAL_TOP_K", 2), mock.patch.object(settings, "ANALYZE_RETRIEVAL_NEIGHBORS", 1):
+            picked = [b.blockId for b in select_blocks(blocks, "逾期交货的违约金怎么计算？付款期限呢")]
+        self.assertEqual(picked, ["b_0029", "b_0030", "b_0031", "b_0044", "b_0045", "b_0046"])
+
+    def test_short_documents_keep_all_blocks_and_unmatched_queries_are_capped(self):
+        blocks = _contract()[:10]
+        self.assertEqual(len(select_blocks(blocks, "违约金")), 10)
+        blocks = _contract()
+        with mock.patch.object(settings, "ANALYZE_RETRIEVAL_TOP_K", 4), mock.patch.object(settings, "ANALYZE_RETRIEVAL_NEIGHBORS", 1):
+            self.assertEqual(select_blocks(blocks, "zzz"), blocks[:12])
+
+    def test_index_is_cached_per_document(self):
+        retrieval._index_cache.clear()
+        blocks = _contract()
+        idx = get_block_index(blocks)
+        self.assertIs(get_block_index(list(blocks)), idx)
+        changed = list(blocks)
+        changed[0] = _block(0, "第0条 变更后的条款")
+        self.assertIsNot(get_block_index(changed), idx)
+
+    def test_analyze_prompt_keeps_block_ids_of_retrieved_blocks(self):
+        from app.services.llm_service import LLMService
+
+        messages = LLMService()._analyze_messages(_contract(), "违约金")
+        user = messages[-1]["content"]
+        self.assertIn("<block id='b_0030'>", user)
+        self.assertNotIn("<block id='b_0010'>", user)
+
+    def test_analyze_builds_the_prompt_off_the_event_loop(self):
+        import asyncio
+
+        from app.services.llm_service import LLMService
+
+        loops = []
+
+        def _select(blocks, query):
+            loops.append(asyncio._get_running_loop())
+            return blocks[:1]
+
+        with mock.patch("app.services.llm_service.select_blocks", side_effect=_select):
+            LLMService().analyze_risk(_contract(), "违约金")
+        self.assertEqual(loops, [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
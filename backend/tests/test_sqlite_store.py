@@ -0,0 +1,104 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from app.core.config import settings
+from app.models import GlobalPromptConfig
+from app.services import prompt_store, run_store, ruleset_store, sqlite_store
+from app.services import template_store as ts
+from test_template_store import _snapshot
+
+
+class SqliteStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+        self._backend = mock.patch.object(settings, "STORE_BACKEND", "sqlite")
+        self._backend.start()
+
+    def tearDown(self) -> None:
+        self._backend.stop()
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def test_template_ruleset_prompt_roundtrip(self):
+        ts.upsert_template(_snapshot("t1", "v1"))
+        ts.upsert_template(_snapshot("t1", "v2", "二、价格"))
+        self.assertEqual(ts.get_latest_template("t1").blocks[0].text, "二、价格")
+        self.assertEqual([x.versions for x in ts.list_template_index()], [["v1", "v2"]])
+        self.assertTrue(ts.rename_template("t1", "Renamed"))
+        self.assertEqual(ts.get_template("t1", "v1").name, "Renamed")
+
+        self.assertIsNotNone(ruleset_store.get_ruleset("sales_contract_cn"))
+        prompt_store.upsert_global_prompt_config(GlobalPromptConfig(defaultPrompt="d", byTemplateId={"t1": "p1"}))
+        prompt_store.upsert_global_prompt_config(GlobalPromptConfig(defaultPrompt="d", byTemplateId={"t2": "p2"}))
+        self.assertEqual(prompt_store.get_global_prompt_config().byTemplateId, {"t2": "p2"})
+
+        self.assertTrue(ts.delete_template("t1"))
+        self.assertIsNone(ts.get_latest_template("t1"))
+        self.assertFalse(os.path.exists(os.path.join(self._tmp.name, "store", "templates", "t1")))
+
+    def test_fingerprint_backfill_skips_a_version_deleted_meanwhile(self):
+        import sqlite3
+
+        ts.upsert_template(_snapshot("t1", "v1"))
+        with sqlite3.connect(sqlite_store.db_path()) as conn:
+            conn.execute("DELETE FROM template_fingerprints")
+        real = ts._fingerprint
+
+        def _fingerprint_then_delete(blocks):
+            fp = real(blocks)
+            ts.delete_template("t1")
+            return fp
+
+        with mock.patch.object(ts, "_fingerprint", side_effect=_fingerprint_then_delete):
+            ts.match_templates(_snapshot("doc", "v1").blocks)
+        self.assertEqual(sqlite_store.template_fingerprints(), {})
+
+    def test_listing_reads_metadata_columns_only(self):
+        ts.upsert_template(_snapshot("t1", "v1"))
+        with mock.patch.object(sqlite_store, "load_template", side_effect=AssertionError("payload loaded")):
+            self.assertEqual(ts.list_template_index()[0].versions, ["v1"])
+            self.assertEqual(ts.get_template_meta("t1").name, "T1")
+
+    def test_imports_existing_json_stores(self):
+        with mock.patch.object(settings, "STORE_BACKEND", "json"):
+            ts.upsert_template(_snapshot("t1", "v1"))
+            ts.rename_template("t1", "From JSON")
+            prompt_store.upsert_global_prompt_config(GlobalPromptConfig(defaultPrompt="json", byTemplateId={}))
+        self.assertEqual(ts.get_latest_template("t1").name, "From JSON")
+        self.assertEqual(prompt_store.get_global_prompt_config().defaultPrompt, "json")
+        self.assertEqual([x.templateId for x in ruleset_store.list_rulesets()], ["sales_contract_cn"])
+        self.assertEqual(sqlite_store.import_json_stores()["templates"], 0)
+
+    def test_concurrent_writers(self):
+        errors = []
+
+        def _write(i: int) -> None:
+            try:
+                for j in range(5):
+                    ts.upsert_template(_snapshot(f"t{i}", f"v{j}"))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=_write, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(ts.list_template_index()), 8)
+
+    def test_run_payloads_live_in_the_index_database(self):
+        run_store.save_run({"runId": "chk_a", "templateId": "t1", "templateVersion": "v1", "summary": {"state": "completed"}})
+        self.assertEqual(run_store.get_run("chk_a")["templateId"], "t1")
+        root = run_store._primary_check_runs_dir()
+        self.assertEqual([p for p in os.listdir(root) if not p.startswith("index.sqlite3")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
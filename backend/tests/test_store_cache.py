@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app.models import GlobalPromptConfig
+from app.services import prompt_store, ruleset_store
+from app.services import template_store as ts
+from test_template_store import _snapshot
+
+
+class StoreCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+
+    def tearDown(self) -> None:
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def test_steady_state_reads_skip_parsing(self):
+        ts.upsert_template(_snapshot("t1", "v1"))
+        prompt_store.upsert_global_prompt_config(GlobalPromptConfig(defaultPrompt="p", byTemplateId={}))
+        self.assertIsNotNone(ts.get_latest_template("t1"))
+        self.assertIsNotNone(ruleset_store.get_ruleset("sales_contract_cn"))
+        prompt_store.get_global_prompt_config()
+        with mock.patch("json.load", side_effect=AssertionError("file parsed")), mock.patch.object(
+            GlobalPromptConfig, "model_validate", side_effect=AssertionError("prompts validated")
+        ):
+            self.assertEqual(ts.get_latest_template("t1").blocks[0].text, "一、总则")
+            self.assertEqual(ts.list_template_index()[0].templateId, "t1")
+            self.assertEqual(ruleset_store.get_ruleset("sales_contract_cn").templateId, "sales_contract_cn")
+            self.assertEqual(prompt_store.get_global_prompt_config().defaultPrompt, "p")
+
+    def test_writes_and_external_edits_are_picked_up(self):
+        ts.upsert_template(_snapshot("t1", "v1"))
+        self.assertEqual(ts.get_latest_template("t1").name, "T1")
+        self.assertTrue(ts.rename_template("t1", "Renamed"))
+        self.assertEqual(ts.get_latest_template("t1").name, "Renamed")
+
+        prompt_store.get_global_prompt_config()
+        path = prompt_store._prompts_file_path()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"defaultPrompt": "edited by hand", "byTemplateId": {}}, f)
+        self.assertEqual(prompt_store.get_global_prompt_config().defaultPrompt, "edited by hand")
+
+    def test_returned_objects_do_not_alias_the_cache(self):
+        ts.upsert_template(_snapshot("t1", "v1"))
+        rs = ruleset_store.get_ruleset("sales_contract_cn")
+        rs.points.clear()
+        self.assertTrue(ruleset_store.get_ruleset("sales_contract_cn").points)
+        t = ts.get_latest_template("t1")
+        t.blocks[0].text = "changed"
+        t.blocks.clear()
+        self.assertEqual(ts.get_latest_template("t1").blocks[0].text, "一、总则")
+        cfg = prompt_store.get_global_prompt_config()
+        cfg.byTemplateId["x"] = "y"
+        self.assertNotIn("x", prompt_store.get_global_prompt_config().byTemplateId)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,275 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from difflib import SequenceMatcher
+
+from app.models import Block, BlockKind, BlockMeta, TemplateSnapshot
+from app.services import template_store as ts
+from app.services.doc_service import DocService
+
+
+def _snapshot(template_id: str, version: str, text: str = "一、总则") -> TemplateSnapshot:
+    block = Block(
+        blockId="b1",
+        kind=BlockKind.PARAGRAPH,
+        structurePath="body.p[0]",
+        stableKey="b1",
+        text=text,
+        htmlFragment=f"<p>{text}</p>",
+        meta=BlockMeta(),
+    )
+    return TemplateSnapshot(templateId=template_id, name=template_id.upper(), version=version, signature="sig", blocks=[block])
+
+
+class ShardedTemplateStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+
+    def tearDown(self) -> None:
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def test_one_file_per_version(self):
+        ts.upsert_template(_snapshot("t1", "v1"))
+        ts.upsert_template(_snapshot("t1", "v2", "二、价格"))
+        ts.upsert_template(_snapshot("t2", "v1"))
+        root = os.path.join(self._tmp.name, "store", "templates")
+        self.assertTrue(os.path.exists(os.path.join(root, "t1", "v1.json")))
+        self.assertTrue(os.path.exists(os.path.join(root, "t1", "v2.json")))
+        self.assertEqual(ts.get_latest_template("t1").blocks[0].text, "二、价格")
+        self.assertEqual(ts.get_template("t1", "v1").blocks[0].text, "一、总则")
+        self.assertEqual([(x.templateId, x.versions) for x in ts.list_template_index()], [("t1", ["v1", "v2"]), ("t2", ["v1"])])
+
+    def test_metadata_operations_never_load_blocks(self):
+        ts.upsert_template(_snapshot("t1", "v1"))
+        ts.upsert_template(_snapshot("t1", "v2"))
+        with mock.patch.object(ts, "_load_shard", side_effect=AssertionError("shard opened")):
+            self.assertEqual(ts.list_template_index()[0].name, "T1")
+            self.assertTrue(ts.rename_template("t1", "Renamed"))
+            self.assertEqual(ts.get_template_meta("t1").version, "v2")
+            self.assertEqual(ts.get_template_meta("t1", "v1").name, "Renamed")
+            self.assertIsNone(ts.get_template_meta("t1", "v9"))
+            self.assertEqual(ts.get_template_list_item("t1").versions, ["v1", "v2"])
+
+    def test_rename_and_delete(self):
+        ts.upsert_template(_snapshot("t1", "v1"))
+        self.assertTrue(ts.rename_template("t1", "Renamed"))
+        self.assertEqual(ts.get_template("t1", "v1").name, "Renamed")
+        self.assertTrue(ts.delete_template("t1"))
+        self.assertIsNone(ts.get_latest_template("t1"))
+        self.assertFalse(os.path.exists(os.path.join(self._tmp.name, "store", "templates", "t1")))
+
+    def test_migrates_monolithic_file(self):
+        store = os.path.join(self._tmp.name, "store")
+        os.makedirs(store, exist_ok=True)
+        payload = {"templates": [_snapshot("t1", "v1").model_dump(), _snapshot("t1", "v2").model_dump()]}
+        with open(os.path.join(store, "templates.json"), "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        self.assertEqual(ts.list_template_index()[0].versions, ["v1", "v2"])
+        self.assertEqual(ts.get_latest_template("t1").version, "v2")
+        self.assertFalse(os.path.exists(os.path.join(store, "templates.json")))
+        self.assertTrue(os.path.exists(os.path.join(store, "templates.json.bak")))
+
+
+_HEADINGS = ["总则", "价格", "付款", "交货", "验收", "质量", "保密", "违约", "争议", "其他", "知识产权", "不可抗力", "通知", "期限"]
+
+
+def _clauses(version: str, texts) -> TemplateSnapshot:
+    blocks = [
+        Block(
+            blockId=f"b{i}",
+            kind=BlockKind.PARAGRAPH,
+            structurePath=f"body.p[{i}]",
+            stableKey=ts._sha1(t),
+            text=t,
+            htmlFragment=f"<p>{t}</p>",
+            meta=BlockMeta(),
+        )
+        for i, t in enumerate(texts)
+    ]
+    return TemplateSnapshot(templateId="t1", name="T1", version=version, signature=version, blocks=blocks)
+
+
+class DeltaVersionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+        self.texts = [f"第{i}条 甲方应当在合同签订后按约定履行第{i}项义务并承担相应责任。" for i in range(40)]
+
+    def tearDown(self) -> None:
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def _shard(self, version: str):
+        with open(os.path.join(self._tmp.name, "store", "templates", "t1", version + ".json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_small_edits_are_stored_as_deltas(self):
+        ts.upsert_template(_clauses("v1", self.texts))
+        edited = self.texts[:5] + ["新增条款：保密义务。"] + self.texts[5:20] + ["第20条 已修改。"] + self.texts[21:39]
+        ts.upsert_template(_clauses("v2", edited))
+        self.assertNotIn("delta", self._shard("v1"))
+        self.assertEqual(self._shard("v2")["baseVersion"], "v1")
+        ts._shard_cache.invalidate()
+        self.assertEqual(ts.get_template("t1", "v2"), _clauses("v2", edited))
+        self.assertEqual(ts.get_template("t1", "v1"), _clauses("v1", self.texts))
+        self.assertEqual(ts.read_json_templates()[1]["blocks"], _clauses("v2", edited).model_dump()["blocks"])
+
+    def test_delta_chains_are_capped(self):
+        for v in range(ts._DELTA_MAX_CHAIN + 2):
+            ts.upsert_template(_clauses(f"v{v:02d}", self.texts[: 40 - v]))
+        depths = [e.get("depth", 0) for e in sorted(ts._read_index(), key=lambda e: e["version"])]
+        self.assertEqual(depths, list(range(ts._DELTA_MAX_CHAIN + 1)) + [0])
+        ts._shard_cache.invalidate()
+        self.assertEqual(ts.get_template("t1", f"v{ts._DELTA_MAX_CHAIN:02d}"), _clauses(f"v{ts._DELTA_MAX_CHAIN:02d}", self.texts[: 40 - ts._DELTA_MAX_CHAIN]))
+
+    def test_large_changes_start_a_new_base(self):
+        ts.upsert_template(_clauses("v1", self.texts))
+        ts.upsert_template(_clauses("v2", [t + "（修订）" for t in self.texts]))
+        self.assertNotIn("delta", self._shard("v2"))
+
+    def test_overwriting_a_base_keeps_its_dependents(self):
+        ts.upsert_template(_clauses("v1", self.texts))
+        ts.upsert_template(_clauses("v2", self.texts[1:]))
+        ts.upsert_template(_clauses("v1", ["全新内容"]))
+        self.assertNotIn("delta", self._shard("v2"))
+        self.assertEqual(ts.get_template("t1", "v2"), _clauses("v2", self.texts[1:]))
+        self.assertEqual(ts.get_template("t1", "v1").blocks[0].text, "全新内容")
+
+
+def _library_snapshot(rng: random.Random, template_id: str) -> TemplateSnapshot:
+    blocks = []
+    for j, h in enumerate(rng.sample(_HEADINGS, rng.randint(3, 8))):
+        kind = BlockKind.HEADING if rng.random() < 0.5 else BlockKind.PARAGRAPH
+        blocks.append(Block(blockId=f"b{j}", kind=kind, structurePath=f"body.p[{j}]", stableKey=f"b{j}", text=f"第{j + 1}条 {h}", htmlFragment="<p></p>", meta=BlockMeta()))
+    return TemplateSnapshot(templateId=template_id, name=template_id, version="v1", signature="sig", blocks=blocks)
+
+
+class TemplateMatchIndexTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+
+    def tearDown(self) -> None:
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def test_shortlist_matches_exhaustive_scoring(self):
+        rng = random.Random(7)
+        library = [_library_snapshot(rng, f"t{i:02d}") for i in range(40)]
+        for t in library:
+            ts.upsert_template(t)
+        for _ in range(20):
+            target = _library_snapshot(rng, "doc").blocks
+            _, target_tokens = ts.compute_signature(target)
+            expected = sorted(
+                ((SequenceMatcher(None, ts.compute_signature(t.blocks)[1], target_tokens).ratio(), i) for i, t in enumerate(library)),
+                key=lambda x: (-x[0], x[1]),
+            )[:3]
+            got = ts._match_index().tokens.top(target_tokens, 3)
+            self.assertEqual([(round(s, 9), i) for s, i in got], [(round(s, 9), i) for s, i in expected])
+
+    def test_match_uses_persisted_fingerprints(self):
+        ts.upsert_template(_snapshot("t1", "v1"))
+        ts.match_templates(_snapshot("doc", "v1").blocks)
+        with mock.patch.object(ts, "_load_shard", side_effect=AssertionError("shard opened")):
+            self.assertEqual(ts.match_templates(_snapshot("doc", "v1").blocks).best.templateId, "t1")
+            ts.upsert_template(_snapshot("t2", "v1", "二、价格"))
+            self.assertEqual(ts.match_templates(_snapshot("doc", "v1", "二、价格").blocks).best.templateId, "t2")
+        self.assertTrue(os.path.exists(os.path.join(self._tmp.name, "store", "templates", "t1", "_fp", "v1.json")))
+
+
+    def test_fingerprint_backfill_skips_a_version_deleted_meanwhile(self):
+        ts.upsert_template(_snapshot("t1", "v1"))
+        fp_path = os.path.join(self._tmp.name, "store", "templates", "t1", "_fp", "v1.json")
+        os.remove(fp_path)
+        real = ts._fingerprint
+
+        def _fingerprint_then_delete(blocks):
+            fp = real(blocks)
+            ts.delete_template("t1")
+            return fp
+
+        with mock.patch.object(ts, "_fingerprint", side_effect=_fingerprint_then_delete):
+            ts.match_templates(_snapshot("doc", "v1").blocks)
+        self.assertFalse(os.path.exists(fp_path))
+        self.assertIsNone(ts.match_templates(_snapshot("doc", "v1").blocks).best)
+
+
+class MatchDocxTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["DOC_COMPARISON_DATA_DIR"] = self._tmp.name
+
+    def tearDown(self) -> None:
+        try:
+            os.environ.pop("DOC_COMPARISON_DATA_DIR", None)
+        finally:
+            self._tmp.cleanup()
+
+    def _docx(self, name: str, headings) -> str:
+        from docx import Document
+
+        doc = Document()
+        for i, h in enumerate(headings):
+            doc.add_heading(h, level=1)
+            doc.add_paragraph(f"{i + 1}. {h}的具体约定由双方协商确定，并作为本合同的组成部分。")
+        path = os.path.join(self._tmp.name, name)
+        doc.save(path)
+        return path
+
+    def test_outline_parse_matches_full_parse_outline(self):
+        repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+        paths = [os.path.join(repo_root, "standard-contracts", n) for n in ("purchase.docx", "sales.docx")]
+        paths = [p for p in paths if os.path.exists(p)] or [self._docx("a.docx", ["总则", "价格", "交付"])]
+        for path in paths:
+            with self.subTest(doc=os.path.basename(path)):
+                full = DocService.parse_docx(path)
+                self.assertEqual(ts._extract_outline_tokens(DocService.iter_outline_blocks(path)), ts._extract_outline_tokens(full))
+
+    def test_outline_parse_stops_at_the_outline_limit(self):
+        path = self._docx("long.docx", [f"条款{chr(0x4E00 + i)}" for i in range(200)])
+        nodes = []
+        real = DocService._iter_nodes
+
+        def _counting(doc, outline_only=False):
+            for n in real(doc, outline_only):
+                nodes.append(n)
+                yield n
+
+        with mock.patch.object(DocService, "_iter_nodes", side_effect=_counting):
+            self.assertEqual(len(ts._extract_outline_tokens(DocService.iter_outline_blocks(path))), 60)
+        self.assertLess(len(nodes), 130)
+
+    def test_match_docx_skips_the_full_parse_when_the_outline_decides(self):
+        headings = [["总则", "价格", "交付", "验收", "违约责任"], ["保密信息", "保密义务", "期限", "争议解决", "其他"]]
+        for i, hs in enumerate(headings):
+            path = self._docx(f"t{i}.docx", hs)
+            blocks = DocService.parse_docx(path)
+            ts.upsert_template(TemplateSnapshot(templateId=f"t{i}", name=f"T{i}", version="v1", signature=ts.compute_signature(blocks)[0], blocks=blocks))
+        doc = self._docx("doc.docx", headings[1])
+        expected = ts.match_templates(DocService.parse_docx(doc))
+        with mock.patch.object(DocService, "parse_docx", side_effect=AssertionError("full parse")):
+            self.assertEqual(ts.match_templates_docx(doc), expected)
+        self.assertEqual(expected.best.templateId, "t1")
+
+    def test_match_docx_falls_back_to_signature_tokens(self):
+        doc = self._docx("doc.docx", ["总则"])
+        with mock.patch.object(DocService, "parse_docx", wraps=DocService.parse_docx) as parse:
+            self.assertIsNone(ts.match_templates_docx(doc).best)
+        parse.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
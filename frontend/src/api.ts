@@ -466,6 +466,15 @@ export const api = {
       return out
     },
 
+    matchDocx: async (file: File, opts?: { signal?: AbortSignal }): Promise<TemplateMatchResponse> => {
+      const formData = new FormData()
+      formData.append('file', file)
+      const raw = await fetchJson('/api/templates/match_docx', { method: 'POST', body: formData, signal: opts?.signal }, { timeoutMs: 30_000 })
+      const out = asTemplateMatchResponse(raw)
+      if (!out) throw invalidResponseError('/api/templates/match_docx')
+      return out
+    },
+
     getLatest: async (templateId: string, opts?: { signal?: AbortSignal }): Promise<{ blocks: Block[]; name: string }> => {
       const init = opts?.signal ? { signal: opts.signal } : undefined
       const raw = await fetchJson(`/api/templates/${encodeURIComponent(templateId)}/latest`, init, { timeoutMs: 30_000 })
@@ -80,6 +80,9 @@ export const useCompareFlow = (p: Params) => {
       p.setLoading(true)
       p.setError('')
       try {
+        // The template match reads the uploaded file itself, so it runs alongside the parse.
+        const matchPromise =
+          side === 'right' ? api.templates.matchDocx(file, { signal: controller.signal }).catch(() => null) : null
         let blocks: Block[] = []
         try {
           blocks = await api.parseDoc(file, { signal: controller.signal })
@@ -95,7 +98,8 @@ export const useCompareFlow = (p: Params) => {
         else {
           p.setRightBlocks(blocks)
           try {
-            const obj: TemplateMatchResponse = await api.templates.match(blocks, { signal: controller.signal })
+            const obj: TemplateMatchResponse | null = await matchPromise
+            if (!obj) throw new Error('template match failed')
             const best = obj?.best || null
             const score = typeof best?.score === 'number' ? best.score : null
             const tid = typeof best?.templateId === 'string' ? best.templateId : ''